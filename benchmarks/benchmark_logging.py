@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Throughput benchmarks for the logging formats in stdlib_utils.
+
+Run from the root of the repository with ``python benchmarks/benchmark_logging.py``.
+"""
+import argparse
+import logging
+import tempfile
+from time import perf_counter
+from typing import List
+
+from stdlib_utils import configure_logging
+from stdlib_utils import create_logging_formatter
+from stdlib_utils import shutdown_queue_logging
+
+
+def _remove_root_handlers() -> None:
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
+
+
+def _report(name: str, elapsed_seconds: float, num_records: int) -> None:
+    records_per_second = num_records / elapsed_seconds
+    print(f"{name:<30} {elapsed_seconds:8.3f} s  {records_per_second:12,.0f} records/s")  # allow-print
+
+
+def benchmark_formatting(logging_formats: List[str], num_records: int) -> None:
+    """Compare formatting records that have already been created."""
+    print(f"\nformatting {num_records} records")  # allow-print
+    record = logging.LogRecord(
+        "benchmark", logging.INFO, __file__, 1, "well %s reading %d", ("A1", 12345), None
+    )
+    for logging_format in logging_formats:
+        formatter = create_logging_formatter(logging_format)
+        start = perf_counter()
+        for _ in range(num_records):
+            formatter.format(record)
+        _report(logging_format, perf_counter() - start, num_records)
+
+
+def benchmark_logging_calls(
+    logging_formats: List[str], num_records: int, use_queue_listener: bool, memory_mapped_log_file: bool
+) -> None:
+    """Compare the full cost of logging calls with each profile of configure_logging, written to a file.
+
+    With the queue listener, the time includes waiting for the background thread to write every record.
+    """
+    print(  # allow-print
+        f"\nlogging {num_records} records (use_queue_listener={use_queue_listener}, memory_mapped_log_file={memory_mapped_log_file})"
+    )
+    logger = logging.getLogger("benchmark")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for logging_format in logging_formats:
+            _remove_root_handlers()
+            configure_logging(
+                path_to_log_folder=tmp_dir,
+                log_file_prefix=logging_format,
+                logging_format=logging_format,
+                use_queue_listener=use_queue_listener,
+                memory_mapped_log_file=memory_mapped_log_file,
+            )
+            start = perf_counter()
+            for i in range(num_records):
+                logger.info("well %s reading %d", "A1", i)
+            shutdown_queue_logging()
+            _report(logging_format, perf_counter() - start, num_records)
+        _remove_root_handlers()
+        configure_logging()  # turn the caller lookup skipped by the fast profile back on
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=["formatting", "calls"], default=["formatting", "calls"]
+    )
+    parser.add_argument("--logging-formats", nargs="+", default=["standard", "json", "fast"])
+    parser.add_argument("--num-records", type=int, default=200000)
+    parser.add_argument("--use-queue-listener", action="store_true")
+    parser.add_argument("--memory-mapped-log-file", action="store_true")
+    args = parser.parse_args()
+    if "formatting" in args.benchmarks:
+        benchmark_formatting(args.logging_formats, args.num_records)
+    if "calls" in args.benchmarks:
+        benchmark_logging_calls(
+            args.logging_formats, args.num_records, args.use_queue_listener, args.memory_mapped_log_file
+        )
+
+
+if __name__ == "__main__":
+    main()
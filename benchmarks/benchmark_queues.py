@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Throughput benchmarks for the queues in stdlib_utils.
+
+Run from the root of the repository with ``python benchmarks/benchmark_queues.py``.
+"""
+import argparse
+import array
+import json
+import multiprocessing
+import os
+import queue
+import time
+from time import perf_counter
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+from stdlib_utils import DEFAULT_PICKLE_SERIALIZER
+from stdlib_utils import HIGHEST_PROTOCOL_PICKLE_SERIALIZER
+from stdlib_utils import MARSHAL_SERIALIZER
+from stdlib_utils import Serializer
+from stdlib_utils import SharedMemoryRingBuffer
+from stdlib_utils import SimpleMultiprocessingQueue
+from stdlib_utils import StructRecordQueue
+from stdlib_utils import StructSerializer
+
+
+def _produce_frames_into_simple_queue(
+    the_queue: SimpleMultiprocessingQueue, frame: Any, num_frames: int
+) -> None:
+    for _ in range(num_frames):
+        the_queue.put(frame)
+
+
+def _consume_frames_from_simple_queue(the_queue: SimpleMultiprocessingQueue, num_frames: int) -> None:
+    for _ in range(num_frames):
+        the_queue.get()
+
+
+def _produce_frames_into_ring_buffer(
+    ring_buffer: SharedMemoryRingBuffer, frame: bytes, num_frames: int
+) -> None:
+    num_sent = 0
+    while num_sent < num_frames:
+        try:
+            ring_buffer.put_nowait(frame)
+        except queue.Full:
+            time.sleep(0)  # yield the CPU to the consumer
+            continue
+        num_sent += 1
+    ring_buffer.close()
+
+
+def _consume_frames_from_ring_buffer(ring_buffer: SharedMemoryRingBuffer, num_frames: int) -> None:
+    num_received = 0
+    while num_received < num_frames:
+        try:
+            with ring_buffer.get_view_nowait():
+                num_received += 1
+        except queue.Empty:
+            time.sleep(0)  # yield the CPU to the producer
+            continue
+
+
+def _time_transfer(
+    producer: Callable[..., None],
+    consumer: Callable[[Any, int], None],
+    the_queue: Any,
+    frame: bytes,
+    num_frames: int,
+) -> float:
+    producer_process = multiprocessing.Process(target=producer, args=(the_queue, frame, num_frames))
+    start = perf_counter()
+    producer_process.start()
+    consumer(the_queue, num_frames)
+    elapsed_seconds = perf_counter() - start
+    producer_process.join()
+    return elapsed_seconds
+
+
+def _report(name: str, elapsed_seconds: float, frame_size: int, num_frames: int) -> None:
+    megabytes_per_second = frame_size * num_frames / elapsed_seconds / 2**20
+    frames_per_second = num_frames / elapsed_seconds
+    print(  # allow-print
+        f"{name:<30} {elapsed_seconds:8.3f} s  {frames_per_second:12,.0f} frames/s  {megabytes_per_second:10,.1f} MiB/s"
+    )
+
+
+def benchmark_frame_transfer(frame_sizes: List[int], num_frames: int) -> None:
+    """Compare moving bytes frames from a child process to the parent."""
+    for frame_size in frame_sizes:
+        frame = os.urandom(frame_size)
+        print(f"\n{num_frames} frames of {frame_size} bytes")  # allow-print
+
+        simple_queue = SimpleMultiprocessingQueue()
+        elapsed_seconds = _time_transfer(
+            _produce_frames_into_simple_queue,
+            _consume_frames_from_simple_queue,
+            simple_queue,
+            frame,
+            num_frames,
+        )
+        _report("SimpleMultiprocessingQueue", elapsed_seconds, frame_size, num_frames)
+
+        ring_buffer = SharedMemoryRingBuffer(capacity_bytes=max(2**22, 4 * (frame_size + 16)))
+        elapsed_seconds = _time_transfer(
+            _produce_frames_into_ring_buffer,
+            _consume_frames_from_ring_buffer,
+            ring_buffer,
+            frame,
+            num_frames,
+        )
+        _report("SharedMemoryRingBuffer", elapsed_seconds, frame_size, num_frames)
+        ring_buffer.unlink()
+
+
+def _get_serializers_and_messages() -> List[Tuple[Serializer, Any]]:
+    message = {
+        "command": "reading",
+        "timestamp": 1234567890123,
+        "well_index": 17,
+        "value": 0.8125,
+        "is_valid": True,
+    }
+    struct_serializer = StructSerializer("<7sqhd?")
+    struct_message = (b"reading", 1234567890123, 17, 0.8125, True)
+    return [
+        (DEFAULT_PICKLE_SERIALIZER, message),
+        (HIGHEST_PROTOCOL_PICKLE_SERIALIZER, message),
+        (MARSHAL_SERIALIZER, message),
+        (struct_serializer, struct_message),
+    ]
+
+
+def benchmark_serializers(num_messages: int) -> None:
+    """Compare the codecs available for SimpleMultiprocessingQueue.
+
+    The struct codec sends the same fields as a tuple instead of a dictionary.
+    """
+    print(f"\n{num_messages} small messages through SimpleMultiprocessingQueue")  # allow-print
+    for serializer, message in _get_serializers_and_messages():
+        message_size = len(serializer.dumps(message))
+        simple_queue = SimpleMultiprocessingQueue(serializer=serializer)
+        elapsed_seconds = _time_transfer(
+            _produce_frames_into_simple_queue,
+            _consume_frames_from_simple_queue,
+            simple_queue,
+            message,
+            num_messages,
+        )
+        _report(serializer.get_name(), elapsed_seconds, message_size, num_messages)
+
+
+def benchmark_compression(num_messages: int, compression_level: int) -> None:
+    """Compare sending a large, highly compressible message with and without compression."""
+    message = json.dumps(
+        [
+            {"well_name": f"A{i % 24}", "timestamp": i * 1000, "value": i % 7, "status": "ok"}
+            for i in range(40000)
+        ]
+    )
+    print(f"\n{num_messages} messages of {len(message)} bytes of JSON")  # allow-print
+    for compression_threshold_bytes in (None, 2**16):
+        simple_queue = SimpleMultiprocessingQueue(
+            compression_threshold_bytes=compression_threshold_bytes, compression_level=compression_level
+        )
+        elapsed_seconds = _time_transfer(
+            _produce_frames_into_simple_queue,
+            _consume_frames_from_simple_queue,
+            simple_queue,
+            message,
+            num_messages,
+        )
+        _report(simple_queue.get_serializer().get_name(), elapsed_seconds, len(message), num_messages)
+        if compression_threshold_bytes is not None:
+            # compression happens in the producer process, so only the decompression counters are available here
+            stats = simple_queue.get_serializer().get_stats()  # type: ignore[attr-defined]
+            print(  # allow-print
+                f"{'':<30} decompression CPU time: {stats['decompression_cpu_seconds']:.3f} s"
+            )
+
+
+def _produce_packed_records(the_queue: StructRecordQueue, records_per_message: int, num_records: int) -> None:
+    # every field is a double, so records can be filled directly into an array without packing tuples
+    records = array.array("d", [0.5] * (3 * records_per_message))
+    for _ in range(num_records // records_per_message):
+        the_queue.put_packed(records)
+
+
+def _consume_packed_records(the_queue: StructRecordQueue, num_records: int) -> None:
+    num_received = 0
+    while num_received < num_records:
+        values = the_queue.get_array()
+        num_received += len(values) // 3
+
+
+def benchmark_records(num_records: int, records_per_message: int) -> None:
+    """Compare sending small numeric records as pickled dictionaries and as packed structs."""
+    print(f"\n{num_records} records of (timestamp, channel, value)")  # allow-print
+    simple_queue = SimpleMultiprocessingQueue()
+    record = {"timestamp": 1234567890123, "channel": 17, "value": 0.8125}
+    elapsed_seconds = _time_transfer(
+        _produce_frames_into_simple_queue,
+        _consume_frames_from_simple_queue,
+        simple_queue,
+        record,
+        num_records,
+    )
+    _report("pickled dict per record", elapsed_seconds, 24, num_records)
+
+    record_queue = StructRecordQueue("<3d")
+    num_records -= num_records % records_per_message
+    elapsed_seconds = _time_transfer(
+        _produce_packed_records,
+        _consume_packed_records,
+        record_queue,
+        records_per_message,
+        num_records,
+    )
+    _report(f"StructRecordQueue ({records_per_message}/msg)", elapsed_seconds, 24, num_records)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        choices=["frames", "serializers", "compression", "records"],
+        default=["frames", "serializers", "compression", "records"],
+    )
+    parser.add_argument("--num-frames", type=int, default=20000)
+    parser.add_argument("--frame-sizes", type=int, nargs="+", default=[64, 4096, 65536, 1048576])
+    parser.add_argument("--num-messages", type=int, default=100000)
+    parser.add_argument("--num-large-messages", type=int, default=200)
+    parser.add_argument("--compression-level", type=int, default=1)
+    parser.add_argument("--num-records", type=int, default=1000000)
+    parser.add_argument("--records-per-message", type=int, default=4096)
+    args = parser.parse_args()
+    if "frames" in args.benchmarks:
+        benchmark_frame_transfer(args.frame_sizes, args.num_frames)
+    if "serializers" in args.benchmarks:
+        benchmark_serializers(args.num_messages)
+    if "compression" in args.benchmarks:
+        benchmark_compression(args.num_large_messages, args.compression_level)
+    if "records" in args.benchmarks:
+        benchmark_records(args.num_records, args.records_per_message)
+
+
+if __name__ == "__main__":
+    main()
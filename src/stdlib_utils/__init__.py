@@ -8,11 +8,20 @@ from . import misc
 from . import parallelism_utils
 from . import ports
 from . import queue_utils
+from . import serializers
+from . import shared_memory_queues
 from .checksum import compute_crc32_and_write_to_file_head
 from .checksum import compute_crc32_bytes_of_large_file
 from .checksum import compute_crc32_hex_of_large_file
 from .checksum import validate_file_head_crc32
+from .constants import INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE
+from .constants import LOG_BATCH_COMMUNICATION_TAG
+from .constants import LOG_COMMUNICATION_TAG
 from .constants import NANOSECONDS_PER_CENTIMILLISECOND
+from .constants import OVERFLOW_POLICY_BLOCK
+from .constants import OVERFLOW_POLICY_DROP_NEWEST
+from .constants import OVERFLOW_POLICY_DROP_OLDEST
+from .constants import OVERFLOW_POLICY_KEEP_EVERY_NTH
 from .constants import QUEUE_CHECK_TIMEOUT_SECONDS
 from .constants import SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
 from .constants import UnionOfThreadingAndMultiprocessingQueue
@@ -25,13 +34,27 @@ from .exceptions import LogFolderGivenWithoutFilePrefixError
 from .exceptions import MultipleMatchingXmlElementsError
 from .exceptions import NoMatchingXmlElementError
 from .exceptions import ParallelFrameworkStillNotStoppedError
+from .exceptions import PayloadTooLargeForQueueError
 from .exceptions import PortNotInUseError
 from .exceptions import PortUnavailableError
 from .exceptions import QueueNotEmptyError
 from .exceptions import QueueNotExpectedSizeError
 from .exceptions import QueueStillEmptyError
+from .exceptions import SubscriberOverrunError
+from .exceptions import TooManySubscribersError
 from .exceptions import UnrecognizedLoggingFormatError
+from .exceptions import UnrecognizedOverflowPolicyError
+from .loggers import BatchingFileHandler
+from .loggers import CachedTimestampFormatter
 from .loggers import configure_logging
+from .loggers import create_logging_formatter
+from .loggers import get_log_file_path
+from .loggers import get_logging_format_string
+from .loggers import iter_merged_log_entries
+from .loggers import JsonLinesFormatter
+from .loggers import MemoryMappedFileHandler
+from .loggers import merge_log_files
+from .loggers import shutdown_queue_logging
 from .misc import create_directory_if_not_exists
 from .misc import create_metrics_stats
 from .misc import get_current_file_abs_directory
@@ -46,22 +69,50 @@ from .misc import resource_path
 from .misc import sort_nested_dict
 from .multiprocessing_utils import InfiniteProcess
 from .parallelism_framework import InfiniteLoopingParallelismMixIn
+from .parallelism_framework import VirtualClock
 from .parallelism_utils import confirm_parallelism_is_stopped
+from .parallelism_utils import decode_log_communication
+from .parallelism_utils import install_log_collector_handler
 from .parallelism_utils import invoke_process_run_and_check_errors
+from .parallelism_utils import LogCollectorProcess
+from .parallelism_utils import LogCollectorQueueHandler
+from .parallelism_utils import LogMessageBuffer
 from .parallelism_utils import put_log_message_into_queue
 from .ports import confirm_port_available
 from .ports import confirm_port_in_use
 from .ports import is_port_in_use
+from .queue_utils import AsyncQueueAdapter
+from .queue_utils import BoundedMultiprocessingQueue
+from .queue_utils import BoundedQueue
 from .queue_utils import confirm_queue_is_eventually_empty
 from .queue_utils import confirm_queue_is_eventually_of_size
+from .queue_utils import DiskSpillingQueue
 from .queue_utils import drain_queue
+from .queue_utils import drain_queue_nowait
+from .queue_utils import InstrumentedQueue
 from .queue_utils import is_queue_eventually_empty
 from .queue_utils import is_queue_eventually_not_empty
 from .queue_utils import is_queue_eventually_of_size
+from .queue_utils import iter_queue_nowait
+from .queue_utils import MultiprocessingPriorityQueue
 from .queue_utils import put_object_into_queue_and_raise_error_if_eventually_still_empty
 from .queue_utils import safe_get
 from .queue_utils import SimpleMultiprocessingQueue
+from .queue_utils import StructRecordQueue
 from .queue_utils import TestingQueue
+from .queue_utils import wait_for_any
+from .serializers import CompressingSerializer
+from .serializers import DEFAULT_PICKLE_SERIALIZER
+from .serializers import HIGHEST_PROTOCOL_PICKLE_SERIALIZER
+from .serializers import MARSHAL_SERIALIZER
+from .serializers import MarshalSerializer
+from .serializers import PickleSerializer
+from .serializers import Serializer
+from .serializers import StructSerializer
+from .shared_memory_queues import BroadcastSubscriber
+from .shared_memory_queues import SharedMemoryBroadcastChannel
+from .shared_memory_queues import SharedMemoryQueue
+from .shared_memory_queues import SharedMemoryRingBuffer
 from .threading_utils import InfiniteThread
 from .xml import find_exactly_one_xml_element
 
@@ -129,4 +180,55 @@ __all__ = [
     "sort_nested_dict",
     "create_metrics_stats",
     "is_cpu_arm",
+    "INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE",
+    "drain_queue_nowait",
+    "iter_queue_nowait",
+    "shared_memory_queues",
+    "SharedMemoryRingBuffer",
+    "PayloadTooLargeForQueueError",
+    "SharedMemoryQueue",
+    "serializers",
+    "Serializer",
+    "PickleSerializer",
+    "MarshalSerializer",
+    "StructSerializer",
+    "DEFAULT_PICKLE_SERIALIZER",
+    "HIGHEST_PROTOCOL_PICKLE_SERIALIZER",
+    "MARSHAL_SERIALIZER",
+    "CompressingSerializer",
+    "InstrumentedQueue",
+    "MultiprocessingPriorityQueue",
+    "BoundedQueue",
+    "BoundedMultiprocessingQueue",
+    "UnrecognizedOverflowPolicyError",
+    "OVERFLOW_POLICY_BLOCK",
+    "OVERFLOW_POLICY_DROP_NEWEST",
+    "OVERFLOW_POLICY_DROP_OLDEST",
+    "OVERFLOW_POLICY_KEEP_EVERY_NTH",
+    "AsyncQueueAdapter",
+    "wait_for_any",
+    "VirtualClock",
+    "StructRecordQueue",
+    "SharedMemoryBroadcastChannel",
+    "BroadcastSubscriber",
+    "TooManySubscribersError",
+    "SubscriberOverrunError",
+    "DiskSpillingQueue",
+    "shutdown_queue_logging",
+    "get_log_file_path",
+    "get_logging_format_string",
+    "LogCollectorProcess",
+    "LogCollectorQueueHandler",
+    "install_log_collector_handler",
+    "BatchingFileHandler",
+    "JsonLinesFormatter",
+    "create_logging_formatter",
+    "LOG_COMMUNICATION_TAG",
+    "LOG_BATCH_COMMUNICATION_TAG",
+    "LogMessageBuffer",
+    "decode_log_communication",
+    "CachedTimestampFormatter",
+    "MemoryMappedFileHandler",
+    "iter_merged_log_entries",
+    "merge_log_files",
 ]
@@ -12,9 +12,23 @@ NANOSECONDS_PER_CENTIMILLISECOND = 10**4
 
 SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE = 0.05
 QUEUE_CHECK_TIMEOUT_SECONDS = 0.2
+INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE = 0.001
+
+OVERFLOW_POLICY_BLOCK = "block"
+OVERFLOW_POLICY_DROP_NEWEST = "drop_newest"
+OVERFLOW_POLICY_DROP_OLDEST = "drop_oldest"
+OVERFLOW_POLICY_KEEP_EVERY_NTH = "keep_every_nth"
+
+LOG_COMMUNICATION_TAG = "log"
+LOG_BATCH_COMMUNICATION_TAG = "log_batch"
 
 # Eli (11/12/20): not sure why this is needed even though __annotations__ is being imported everywhere, but unresolvable errors were occurring during importing of the package
 if TYPE_CHECKING:
+    from .queue_utils import BoundedMultiprocessingQueue
+    from .queue_utils import InstrumentedQueue
+    from .queue_utils import MultiprocessingPriorityQueue
+    from .shared_memory_queues import SharedMemoryQueue
+
     UnionOfThreadingAndMultiprocessingQueue = Union[
         Queue[  # pylint: disable=unsubscriptable-object # Eli (3/12/20) not sure why pylint doesn't recognize this type annotation
             Any
@@ -22,9 +36,17 @@ if TYPE_CHECKING:
         multiprocessing.queues.Queue[  # pylint: disable=unsubscriptable-object # Eli (3/12/20) not sure why pylint doesn't recognize this type annotation
             Any
         ],
+        SharedMemoryQueue,
+        InstrumentedQueue,
+        MultiprocessingPriorityQueue,
+        BoundedMultiprocessingQueue,
     ]
 else:
     UnionOfThreadingAndMultiprocessingQueue = Union[
         Queue,
         multiprocessing.queues.Queue,
+        "SharedMemoryQueue",  # a forward reference because shared_memory_queues imports from this module
+        "InstrumentedQueue",  # a forward reference because queue_utils imports from this module
+        "MultiprocessingPriorityQueue",
+        "BoundedMultiprocessingQueue",
     ]
@@ -102,3 +102,19 @@ class ParallelFrameworkStillNotStoppedError(Exception):
 
 class BadQueueTypeError(Exception):
     pass
+
+
+class PayloadTooLargeForQueueError(Exception):
+    pass
+
+
+class UnrecognizedOverflowPolicyError(Exception):
+    pass
+
+
+class TooManySubscribersError(Exception):
+    pass
+
+
+class SubscriberOverrunError(Exception):
+    pass
@@ -2,18 +2,175 @@
 """Helper utilities for logging."""
 from __future__ import annotations
 
+import atexit
+from collections import deque
+from contextlib import ExitStack
+import copy
 import datetime
+import gzip
+import heapq
+import json
+from json.encoder import encode_basestring as _encode_json_string
 import logging
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+import mmap
 import os
+import queue
+import re
+import shutil
 import sys
+import threading
 import time
 from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import TextIO
+from typing import Tuple
+import weakref
 
 from .exceptions import LogFolderDoesNotExistError
 from .exceptions import LogFolderGivenWithoutFilePrefixError
 from .exceptions import UnrecognizedLoggingFormatError
+from .misc import create_metrics_stats
+
+_queue_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+# the log file handlers that need to be adjusted in a forked child process
+_handlers_to_reinit_after_fork: weakref.WeakSet[Any] = weakref.WeakSet()
+_log_file_path: Optional[str] = None
+# logging looks up the file and line number of the caller of every logging call unless this is None
+_LOGGING_SRCFILE = logging._srcfile  # pylint: disable=protected-access # restored after the fast format
+
+
+# attributes every LogRecord has, anything else was added through the `extra` argument of the logging call
+_STANDARD_LOG_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+
+class CachedTimestampFormatter(logging.Formatter):
+    """Format records like logging.Formatter, but only convert the timestamp to a string once per second.
+
+    Records logged within the same second reuse the formatted date and time, so only the milliseconds are formatted for each record. Timestamps are always UTC and in the default format of logging.Formatter (e.g. 2022-07-25 12:34:56,123), so datefmt is not supported.
+
+    Args:
+        fmt: the format string, as in logging.Formatter
+    """
+
+    default_msec_format: str = "%s,%03d"
+
+    def __init__(self, fmt: Optional[str] = None) -> None:
+        super().__init__(fmt)
+        self.converter = time.gmtime
+        # the whole second that the date and time were last formatted for, and the formatted string
+        self._formatted_time_cache: Tuple[Optional[int], str] = (None, "")
+
+    def formatTime(  # pylint: disable=invalid-name # overrides logging.Formatter.formatTime
+        self, record: logging.LogRecord, datefmt: Optional[str] = None
+    ) -> str:
+        created_seconds = int(record.created)
+        cached_seconds, formatted_time = self._formatted_time_cache
+        if created_seconds != cached_seconds:
+            formatted_time = time.strftime(self.default_time_format, self.converter(created_seconds))
+            self._formatted_time_cache = (created_seconds, formatted_time)
+        return self.default_msec_format % (formatted_time, record.msecs)
+
+
+class JsonLinesFormatter(CachedTimestampFormatter):
+    """Format each record as a single line JSON object.
+
+    Every object has the keys time (UTC, ISO 8601), level, logger, process, file, line and message, followed by the given extra_fields and then any fields passed with the `extra` argument of the logging call (which should not reuse these key names). The exception traceback and stack info are added under the keys exception and stack when present.
+
+    Since the keys are fixed, the line is assembled from precompiled fragments with only the string values escaped, instead of going through a format string or building and encoding a dictionary. The constant extra_fields are encoded once up front, and the timestamp is only converted once per second (see CachedTimestampFormatter).
+
+    Args:
+        extra_fields: constant fields to add to every line (e.g. the name of the instrument)
+    """
+
+    default_time_format = "%Y-%m-%dT%H:%M:%S"
+    default_msec_format = "%s.%03dZ"
+
+    def __init__(self, extra_fields: Optional[Dict[str, Any]] = None) -> None:
+        super().__init__()
+        self._extra_fields = dict() if extra_fields is None else dict(extra_fields)
+        # non-ASCII characters are written as is and anything unexpected in the extra fields is written as its str
+        self._encode = json.JSONEncoder(
+            ensure_ascii=False, check_circular=False, separators=(",", ":"), default=str
+        ).encode
+        self._encoded_extra_fields = "".join(
+            f",{_encode_json_string(key)}:{self._encode(value)}" for key, value in self._extra_fields.items()
+        )
+
+    def get_extra_fields(self) -> Dict[str, Any]:
+        return dict(self._extra_fields)
+
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [
+            '{"time":"',
+            self.formatTime(record),
+            '","level":',
+            _encode_json_string(record.levelname),
+            ',"logger":',
+            _encode_json_string(record.name),
+            ',"process":',
+            _encode_json_string(str(record.processName)),
+            ',"file":',
+            _encode_json_string(record.filename),
+            ',"line":',
+            str(record.lineno),
+            ',"message":',
+            _encode_json_string(record.getMessage()),
+            self._encoded_extra_fields,
+        ]
+        record_dict = record.__dict__
+        for key in record_dict:
+            if key not in _STANDARD_LOG_RECORD_ATTRIBUTES:
+                parts.extend((",", _encode_json_string(key), ":", self._encode(record_dict[key])))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            parts.extend((',"exception":', _encode_json_string(record.exc_text)))
+        if record.stack_info:
+            parts.extend((',"stack":', _encode_json_string(self.formatStack(record.stack_info))))
+        parts.append("}")
+        return "".join(parts)
+
+
+def create_logging_formatter(logging_format: str = "standard") -> logging.Formatter:
+    """Create the formatter that configure_logging uses for the given logging_format, with UTC timestamps."""
+    if logging_format == "json":
+        return JsonLinesFormatter()
+    if logging_format == "fast":
+        return CachedTimestampFormatter(get_logging_format_string(logging_format))
+    logging_formatter = logging.Formatter(get_logging_format_string(logging_format))
+    logging_formatter.converter = time.gmtime
+    return logging_formatter
+
+
+def get_logging_format_string(logging_format: str = "standard") -> str:
+    """Get the format string that configure_logging uses for the given logging_format.
+
+    The 'json' format does not use a format string, see JsonLinesFormatter.
+    """
+    if logging_format == "standard":
+        return "[%(asctime)s UTC] %(name)s-{%(filename)s:%(lineno)d} %(levelname)s - %(message)s"
+    if logging_format == "notebook":
+        return "[%(asctime)s UTC] %(levelname)s - %(message)s"
+    if logging_format == "fast":
+        return "[%(asctime)s UTC] %(name)s %(levelname)s - %(message)s"
+    raise UnrecognizedLoggingFormatError(logging_format)
+
+
+def get_log_file_path() -> Optional[str]:
+    """Get the path of the log file created by the last call to configure_logging, if any.
+
+    Returns None if the log file is rotated or memory mapped, since records appended to it by anything else would be lost.
+    """
+    return _log_file_path
 
 
 def configure_logging(
@@ -22,6 +179,9 @@ def configure_logging(
     log_level: int = logging.INFO,
     logging_format: str = "standard",
     logging_formatter: Optional[logging.Formatter] = None,
+    use_queue_listener: bool = False,
+    log_file_handler_kwargs: Optional[Dict[str, Any]] = None,
+    memory_mapped_log_file: bool = False,
 ) -> None:
     """Apply standard configuration to logging.
 
@@ -29,9 +189,13 @@ def configure_logging(
         path_to_log_folder: optional path to an existing folder in which a log file will be created and used instead of stdout. log_file_prefix must also be specified if this argument is not None.
         log_file_prefix: if path_to_log_folder is specified, will write logs to file in the given log folder using this as the prefix of the filename.
         log_level: set the desired logging threshold level
-        logging_format: the desired format of logging output. 'standard' should be used in all cases except for when used in a notebook.
+        logging_format: the desired format of logging output. 'standard' should be used in all cases except for when used in a notebook, or 'json' to write one JSON object per line (see JsonLinesFormatter) for log shipping. 'fast' is the standard format without the file and line number, for processes that log at high rates: logging calls no longer walk the stack to find the caller (so %(filename)s and %(lineno)d are unavailable to any formatter while it is configured), the timestamp is formatted once per second (see CachedTimestampFormatter), and with use_queue_listener the message arguments are only merged into the message on the background thread.
         logging_formatter: optional custom formatter to set on each logging handler. Useful as a catch-all in situations where information must be redacted from log files.
+        use_queue_listener: if True, the root logger only puts records into a queue, and the file/stdout handler formats and writes them on a background thread. This keeps logging calls in time-sensitive loops from blocking on I/O. Call shutdown_queue_logging before exiting to make sure every queued record has been written (this is also done automatically when the interpreter exits normally). Processes forked afterwards do not have the background thread, so they write through the file/stdout handler directly.
+        log_file_handler_kwargs: if specified, the log file is written by a BatchingFileHandler created with these keyword arguments (e.g. max_bytes_per_file) instead of a logging.FileHandler, so records are written in batches and the file is rotated. If the file can be rotated, get_log_file_path then returns None and a LogCollectorProcess has to be given its own log_file_path.
+        memory_mapped_log_file: if True, the log file is written by a MemoryMappedFileHandler (created with log_file_handler_kwargs, if specified) for the lowest cost per record. Since nothing else can append to that file, get_log_file_path then returns None and a LogCollectorProcess has to be given its own log_file_path.
     """
+    global _log_file_path  # pylint: disable=global-statement # there is only one root logger to configure
     logging.Formatter.converter = time.gmtime  # ensure all logging timestamps are UTC
 
     handlers: List[Any] = list()
@@ -40,29 +204,634 @@ def configure_logging(
             raise LogFolderGivenWithoutFilePrefixError()
         if not os.path.isdir(path_to_log_folder):
             raise LogFolderDoesNotExistError(path_to_log_folder)
-        file_handler = logging.FileHandler(
-            os.path.join(
-                path_to_log_folder,
-                f'{log_file_prefix}__{datetime.datetime.utcnow().strftime("%Y_%m_%d_%H%M%S")}.txt',
+        if memory_mapped_log_file:
+            memory_mapped_file_handler = MemoryMappedFileHandler(
+                path_to_log_folder, log_file_prefix, **(log_file_handler_kwargs or dict())
             )
-        )
-        handlers.append(file_handler)
+            handlers.append(memory_mapped_file_handler)
+            # anything else appending to the file would write after the preallocated extent and be truncated away when the handler is closed
+            _log_file_path = None
+        elif log_file_handler_kwargs is not None:
+            batching_file_handler = BatchingFileHandler(
+                path_to_log_folder, log_file_prefix, **log_file_handler_kwargs
+            )
+            handlers.append(batching_file_handler)
+            # anything else appending to a file that is rotated would be writing to a file that is compressed and deleted
+            _log_file_path = (
+                None
+                if batching_file_handler.is_rotation_enabled()
+                else batching_file_handler.get_current_file_path()
+            )
+        else:
+            file_handler = logging.FileHandler(
+                os.path.join(
+                    path_to_log_folder,
+                    f'{log_file_prefix}__{datetime.datetime.utcnow().strftime("%Y_%m_%d_%H%M%S")}.txt',
+                )
+            )
+            handlers.append(file_handler)
+            _log_file_path = file_handler.baseFilename
     else:
         handlers.append(logging.StreamHandler(sys.stdout))
+        _log_file_path = None
 
-    if logging_format == "standard":
-        config_format = "[%(asctime)s UTC] %(name)s-{%(filename)s:%(lineno)d} %(levelname)s - %(message)s"
-    elif logging_format == "notebook":
-        config_format = "[%(asctime)s UTC] %(levelname)s - %(message)s"
+    if logging_format == "json":
+        if logging_formatter is None:
+            logging_formatter = JsonLinesFormatter()
+        # every handler is given the JSON formatter below, so the format string is never used
+        config_format = "%(message)s"
     else:
-        raise UnrecognizedLoggingFormatError(logging_format)
+        config_format = get_logging_format_string(logging_format)
+        if logging_format == "fast" and logging_formatter is None:
+            logging_formatter = CachedTimestampFormatter(config_format)
+    logging._srcfile = (  # pylint: disable=protected-access # this is the documented way to skip the lookup
+        None if logging_format == "fast" else _LOGGING_SRCFILE
+    )
 
     if logging_formatter is not None:
         for handler in handlers:
             handler.setFormatter(logging_formatter)
 
+    if use_queue_listener:
+        handlers = [
+            _start_queue_listener(
+                handlers,
+                logging_formatter or logging.Formatter(config_format),
+                defer_message_formatting=logging_format == "fast",
+                keep_exception_text=logging_format == "json",
+            )
+        ]
+
     logging.basicConfig(
         level=log_level,
         format=config_format,
         handlers=handlers,
     )
+
+
+class _DeferredFormattingQueueHandler(QueueHandler):
+    """Put records into the queue as is, leaving all formatting to the background thread.
+
+    Since the message arguments are only merged into the message when the record is written, mutable arguments should not be modified after logging them.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _ExceptionKeepingQueueHandler(QueueHandler):
+    """Merge the arguments into the message, but keep the traceback and stack info separate from it.
+
+    The default QueueHandler appends them to the message, which would leave formatters that write them under their own key (like JsonLinesFormatter) without them.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            # like QueueHandler, do not keep the frames of the traceback alive until the record is written
+            record.exc_info = None
+        return record
+
+
+def _start_queue_listener(
+    handlers: List[logging.Handler],
+    formatter: logging.Formatter,
+    defer_message_formatting: bool = False,
+    keep_exception_text: bool = False,
+) -> QueueHandler:
+    """Move the handlers onto a background thread and return the handler that feeds it.
+
+    If the root logger has the handler of a previous queue listener, it is replaced with the new one.
+    """
+    global _queue_listener, _queue_handler  # pylint: disable=global-statement # there is only one root logger to configure
+    root_logger = logging.getLogger()
+    is_replacing_queue_handler = _queue_handler is not None and _queue_handler in root_logger.handlers
+    shutdown_queue_logging()
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _queue_listener = QueueListener(log_queue, *handlers)
+    _queue_listener.start()
+    if defer_message_formatting:
+        _queue_handler = _DeferredFormattingQueueHandler(log_queue)
+    elif keep_exception_text:
+        _queue_handler = _ExceptionKeepingQueueHandler(log_queue)
+    else:
+        _queue_handler = QueueHandler(log_queue)
+        # only merge the arguments into the message in the logging thread, the full formatting is done in the background
+        _queue_handler.setFormatter(logging.Formatter())
+    if is_replacing_queue_handler:
+        # basicConfig does nothing while the root logger has any handlers
+        root_logger.addHandler(_queue_handler)
+    return _queue_handler
+
+
+def shutdown_queue_logging() -> None:
+    """Write all queued log records and stop the background logging thread.
+
+    Does nothing unless configure_logging was called with use_queue_listener=True. The handler feeding the queue is removed from the root logger, so records logged after this returns are handled as if logging had not been configured, instead of accumulating in the queue.
+    """
+    global _queue_listener, _queue_handler  # pylint: disable=global-statement # there is only one root logger to configure
+    if _queue_listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)  # type: ignore[arg-type] # always set together with the listener
+    _queue_listener.stop()
+    for handler in _queue_listener.handlers:
+        handler.flush()
+    _queue_listener = None
+    _queue_handler = None
+
+
+def _use_queue_listener_handlers_after_fork() -> None:
+    """Log directly through the handlers of the queue listener in a forked child process.
+
+    The listener thread is not copied into the child, so nothing would ever take the records out of the queue. Any records still in the child's copy of the queue are written by the parent.
+    """
+    global _queue_listener, _queue_handler  # pylint: disable=global-statement # there is only one root logger to configure
+    if _queue_listener is None:
+        return
+    root_logger = logging.getLogger()
+    if _queue_handler in root_logger.handlers:
+        root_logger.removeHandler(_queue_handler)
+        for handler in _queue_listener.handlers:
+            root_logger.addHandler(handler)
+    _queue_listener = None
+    _queue_handler = None
+
+
+def _create_unique_log_file_path(path_to_log_folder: str, log_file_prefix: str) -> str:
+    """Create a log file path named like the ones from configure_logging, that no file (or gzipped file) has."""
+    timestamp = datetime.datetime.utcnow().strftime("%Y_%m_%d_%H%M%S")
+    file_path = os.path.join(path_to_log_folder, f"{log_file_prefix}__{timestamp}.txt")
+    suffix = 1
+    # creating more than one file per second would otherwise reuse the name of a previous file
+    while os.path.exists(file_path) or os.path.exists(f"{file_path}.gz"):
+        file_path = os.path.join(path_to_log_folder, f"{log_file_prefix}__{timestamp}_{suffix}.txt")
+        suffix += 1
+    return file_path
+
+
+class BatchingFileHandler(logging.Handler):
+    """Write log records to a file in batches, rotating and compressing the files.
+
+    Formatted records are buffered and written with a single write once max_records_per_flush of them are buffered, or once flush_interval_seconds have passed since the last write (a background thread checks this, so records are not held indefinitely when nothing else is logged).
+
+    Files are named like the ones created by configure_logging (prefix__timestamp.txt). When writing the next batch would make the current file larger than max_bytes_per_file, or the file has been open for rotation_interval_seconds, a new file is started. Rotated files are gzipped on the background thread, so logging never waits on compression.
+
+    A process forked after the handler was created writes to a new file of its own, and writes every record immediately, since forked processes usually exit without flushing their log handlers.
+
+    Args:
+        path_to_log_folder: an existing folder in which the log files are created
+        log_file_prefix: the prefix of the filename of each log file
+        max_records_per_flush: the number of buffered records that triggers a write
+        flush_interval_seconds: the maximum amount of time records are buffered before being written
+        max_bytes_per_file: if specified, rotate to a new file before it grows past this size. A single batch larger than this is still written to one file
+        rotation_interval_seconds: if specified, rotate to a new file after this amount of time
+        compress_rotated_files: whether to gzip files after rotating away from them
+        clock_ns: returns the current time in nanoseconds, used for the flush/rotation intervals and the flush latency. Defaults to time.perf_counter_ns
+        max_flush_latency_samples: the number of most recent writes used for the flush latency statistics
+    """
+
+    def __init__(
+        self,
+        path_to_log_folder: str,
+        log_file_prefix: str,
+        max_records_per_flush: int = 100,
+        flush_interval_seconds: float = 0.5,
+        max_bytes_per_file: Optional[int] = None,
+        rotation_interval_seconds: Optional[float] = None,
+        compress_rotated_files: bool = True,
+        clock_ns: Optional[Callable[[], int]] = None,
+        max_flush_latency_samples: int = 10000,
+    ) -> None:
+        if not os.path.isdir(path_to_log_folder):
+            raise LogFolderDoesNotExistError(path_to_log_folder)
+        super().__init__()
+        self._path_to_log_folder = path_to_log_folder
+        self._log_file_prefix = log_file_prefix
+        self._max_records_per_flush = max_records_per_flush
+        self._flush_interval_ns = int(flush_interval_seconds * 10**9)
+        self._flush_interval_seconds = flush_interval_seconds
+        self._max_bytes_per_file = max_bytes_per_file
+        self._rotation_interval_ns = (
+            None if rotation_interval_seconds is None else int(rotation_interval_seconds * 10**9)
+        )
+        self._compress_rotated_files = compress_rotated_files
+        self._clock_ns = clock_ns
+        self._buffer: List[str] = list()
+        self._num_records_written = 0
+        self._bytes_written = 0
+        self._num_flushes = 0
+        self._num_files_rotated = 0
+        self._num_files_compressed = 0
+        self._flush_latencies_ns: Deque[int] = deque(maxlen=max_flush_latency_samples)
+        self._file: Optional[Any] = None
+        self._open_new_file()
+        self._last_flush_timepoint_ns = self._get_timepoint_ns()
+        self._start_background_thread()
+        _handlers_to_reinit_after_fork.add(self)
+
+    def _start_background_thread(self) -> None:
+        self._files_to_compress: queue.SimpleQueue[Optional[str]] = queue.SimpleQueue()
+        self._background_thread = threading.Thread(
+            target=self._run_background_thread, name="BatchingFileHandler", daemon=True
+        )
+        self._background_thread.start()
+
+    def _after_fork_in_child(self) -> None:
+        # the parent writes the records that were buffered when the process was forked
+        self._buffer = list()
+        if self._file is None:
+            return
+        # forked processes usually exit without running atexit handlers, so records cannot be left in the buffer
+        self._max_records_per_flush = 1
+        # rotating the file shared with the parent would compress and delete it while the parent is still writing to it
+        self._file.close()
+        self._open_new_file()
+        # the background thread was not copied into this process
+        self._start_background_thread()
+
+    def _get_timepoint_ns(self) -> int:
+        if self._clock_ns is None:
+            return time.perf_counter_ns()
+        return self._clock_ns()
+
+    def _open_new_file(self) -> None:
+        self._file_path = _create_unique_log_file_path(self._path_to_log_folder, self._log_file_prefix)
+        self._file = (
+            open(  # pylint: disable=consider-using-with # the file stays open until rotation or close
+                self._file_path, "ab"
+            )
+        )
+        self._file_size_bytes = 0
+        self._file_opened_timepoint_ns = self._get_timepoint_ns()
+
+    def get_current_file_path(self) -> str:
+        return self._file_path
+
+    def is_rotation_enabled(self) -> bool:
+        return self._max_bytes_per_file is not None or self._rotation_interval_ns is not None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # logging.Handler.handle holds self.lock while calling this
+        try:
+            self._buffer.append(self.format(record))
+            if (
+                len(self._buffer) >= self._max_records_per_flush
+                or self._get_timepoint_ns() - self._last_flush_timepoint_ns >= self._flush_interval_ns
+            ):
+                self._write_buffer()
+        except Exception:  # pylint: disable=broad-except # logging errors are reported the same way as logging.FileHandler
+            self.handleError(record)
+
+    def _should_rotate(self, num_bytes_to_write: int) -> bool:
+        if self._file_size_bytes == 0:
+            return False
+        if (
+            self._max_bytes_per_file is not None
+            and self._file_size_bytes + num_bytes_to_write > self._max_bytes_per_file
+        ):
+            return True
+        return (
+            self._rotation_interval_ns is not None
+            and self._get_timepoint_ns() - self._file_opened_timepoint_ns >= self._rotation_interval_ns
+        )
+
+    def _rotate(self, current_file: Any) -> None:
+        current_file.close()
+        self._num_files_rotated += 1
+        if self._compress_rotated_files:
+            self._files_to_compress.put(self._file_path)
+        self._open_new_file()
+
+    def _write_buffer(self) -> None:
+        start = self._get_timepoint_ns()
+        self._last_flush_timepoint_ns = start
+        if not self._buffer or self._file is None:
+            return
+        data = ("\n".join(self._buffer) + "\n").encode("utf-8")
+        if self._should_rotate(len(data)):
+            self._rotate(self._file)
+        self._file.write(data)
+        self._file.flush()
+        self._file_size_bytes += len(data)
+        self._num_records_written += len(self._buffer)
+        self._bytes_written += len(data)
+        self._num_flushes += 1
+        self._buffer.clear()
+        self._flush_latencies_ns.append(self._get_timepoint_ns() - start)
+
+    def flush(self) -> None:
+        """Write all buffered records to the file."""
+        self.acquire()
+        try:
+            self._write_buffer()
+        finally:
+            self.release()
+
+    def _flush_if_interval_elapsed(self) -> None:
+        self.acquire()
+        try:
+            if self._get_timepoint_ns() - self._last_flush_timepoint_ns >= self._flush_interval_ns:
+                self._write_buffer()
+        finally:
+            self.release()
+
+    def _run_background_thread(self) -> None:
+        while True:
+            try:
+                file_path = self._files_to_compress.get(timeout=self._flush_interval_seconds)
+            except queue.Empty:
+                self._flush_if_interval_elapsed()
+                continue
+            if file_path is None:
+                return
+            self._compress_file(file_path)
+            self._flush_if_interval_elapsed()
+
+    def _compress_file(self, file_path: str) -> None:
+        with open(file_path, "rb") as uncompressed_file, gzip.open(
+            f"{file_path}.gz", "wb"
+        ) as compressed_file:
+            shutil.copyfileobj(uncompressed_file, compressed_file)
+        os.remove(file_path)
+        self._num_files_compressed += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the amount of data written so far and how long each write has taken.
+
+        The flush latency (including rotating to a new file, but not compression) is included once there is more than one sample.
+        """
+        self.acquire()
+        try:
+            out_dict: Dict[str, Any] = {
+                "num_records_written": self._num_records_written,
+                "num_records_buffered": len(self._buffer),
+                "bytes_written": self._bytes_written,
+                "num_flushes": self._num_flushes,
+                "num_files_rotated": self._num_files_rotated,
+                "num_files_compressed": self._num_files_compressed,
+            }
+            if len(self._flush_latencies_ns) > 1:
+                out_dict["flush_latency_ns"] = create_metrics_stats(self._flush_latencies_ns)
+        finally:
+            self.release()
+        return out_dict
+
+    def close(self) -> None:
+        """Write all buffered records, close the file and wait for any rotated files to be compressed."""
+        self.acquire()
+        try:
+            self._write_buffer()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        finally:
+            self.release()
+        self._files_to_compress.put(None)
+        self._background_thread.join()
+        super().close()
+
+
+class MemoryMappedFileHandler(logging.Handler):
+    """Append log records to a file through a memory map, so each write is a copy into memory.
+
+    The file is named like the ones created by configure_logging (prefix__timestamp.txt) and preallocated in extents of extent_size_bytes, which are added whenever the next record does not fit. Written records are immediately visible to other processes reading the file, but the operating system decides when they reach the disk unless flush is called. This is done automatically once flush_interval_seconds have passed since the last flush (checked whenever a record is written) and when the handler is closed.
+
+    Closing the handler truncates the file to the records actually written. If the process ends without closing it, the rest of the last extent remains in the file as null bytes. The disk space for each extent is reserved when it is added (where os.posix_fallocate is available), so running out of space is reported as a logging error rather than crashing the process. No other process or handler should write to the file.
+
+    A process forked after the handler was created writes to a new file of its own, since the memory map is shared with the parent process.
+
+    Args:
+        path_to_log_folder: an existing folder in which the log file is created
+        log_file_prefix: the prefix of the filename of the log file
+        extent_size_bytes: the amount the file is grown by each time it is full
+        flush_interval_seconds: if specified, the maximum amount of time between flushes while records are being written
+        clock_ns: returns the current time in nanoseconds, used for the flush interval. Defaults to time.perf_counter_ns
+    """
+
+    def __init__(
+        self,
+        path_to_log_folder: str,
+        log_file_prefix: str,
+        extent_size_bytes: int = 2**24,
+        flush_interval_seconds: Optional[float] = 1,
+        clock_ns: Optional[Callable[[], int]] = None,
+    ) -> None:
+        if not os.path.isdir(path_to_log_folder):
+            raise LogFolderDoesNotExistError(path_to_log_folder)
+        super().__init__()
+        self._extent_size_bytes = extent_size_bytes
+        self._flush_interval_ns = (
+            None if flush_interval_seconds is None else int(flush_interval_seconds * 10**9)
+        )
+        self._clock_ns = clock_ns
+        self._path_to_log_folder = path_to_log_folder
+        self._log_file_prefix = log_file_prefix
+        self._file_path = ""
+        self._file_descriptor: Optional[int] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_size_bytes = 0
+        self._write_position = 0
+        self._num_records_written = 0
+        self._num_extents = 0
+        self._num_flushes = 0
+        self._open_new_file()
+        self._last_flush_timepoint_ns = self._get_timepoint_ns()
+        _handlers_to_reinit_after_fork.add(self)
+
+    def _after_fork_in_child(self) -> None:
+        if self._mmap is None:
+            return
+        # the map is shared with the parent, so writing to it from here would overwrite the parent's records and closing it would truncate the file under the parent
+        self._mmap.close()
+        self._mmap = None
+        os.close(self._file_descriptor)  # type: ignore[arg-type] # the file is open while the map is
+        self._mapped_size_bytes = 0
+        self._write_position = 0
+        self._num_records_written = 0
+        self._num_extents = 0
+        self._num_flushes = 0
+        self._open_new_file()
+
+    def _open_new_file(self) -> None:
+        self._file_path = _create_unique_log_file_path(self._path_to_log_folder, self._log_file_prefix)
+        # the file descriptor stays open to grow the file, since resizing the map in place is not supported on every platform
+        self._file_descriptor = os.open(self._file_path, os.O_RDWR | os.O_CREAT | os.O_EXCL)
+        self._map_size(self._extent_size_bytes)
+
+    def _get_timepoint_ns(self) -> int:
+        if self._clock_ns is None:
+            return time.perf_counter_ns()
+        return self._clock_ns()
+
+    def _map_size(self, size_bytes: int) -> None:
+        if hasattr(os, "posix_fallocate"):
+            # reserve the disk blocks, so a full disk raises an error here instead of crashing the process with SIGBUS when the map is written
+            os.posix_fallocate(
+                self._file_descriptor,  # type: ignore[arg-type] # only called while the file is open
+                self._mapped_size_bytes,
+                size_bytes - self._mapped_size_bytes,
+            )
+        else:  # pragma: no cover # not available on Windows or macOS
+            os.ftruncate(self._file_descriptor, size_bytes)  # type: ignore[arg-type] # only called while the file is open
+        # the current map stays usable if the file could not be grown
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mmap.mmap(self._file_descriptor, size_bytes)  # type: ignore[arg-type] # only called while the file is open
+        self._num_extents += (size_bytes - self._mapped_size_bytes) // self._extent_size_bytes
+        self._mapped_size_bytes = size_bytes
+
+    def get_current_file_path(self) -> str:
+        return self._file_path
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # logging.Handler.handle holds self.lock while calling this
+        try:
+            if self._mmap is None:
+                return
+            data = f"{self.format(record)}\n".encode("utf-8")
+            end = self._write_position + len(data)
+            if end > self._mapped_size_bytes:
+                num_extents_needed = -(-end // self._extent_size_bytes)
+                self._map_size(num_extents_needed * self._extent_size_bytes)
+            start = self._write_position
+            self._mmap[start:end] = data
+            self._write_position = end
+            self._num_records_written += 1
+            if (
+                self._flush_interval_ns is not None
+                and self._get_timepoint_ns() - self._last_flush_timepoint_ns >= self._flush_interval_ns
+            ):
+                self._flush_mmap()
+        except Exception:  # pylint: disable=broad-except # logging errors are reported the same way as logging.FileHandler
+            self.handleError(record)
+
+    def _flush_mmap(self) -> None:
+        self._last_flush_timepoint_ns = self._get_timepoint_ns()
+        if self._mmap is None:
+            return
+        self._mmap.flush()
+        self._num_flushes += 1
+
+    def flush(self) -> None:
+        """Write the records to disk."""
+        self.acquire()
+        try:
+            self._flush_mmap()
+        finally:
+            self.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        self.acquire()
+        try:
+            return {
+                "num_records_written": self._num_records_written,
+                "bytes_written": self._write_position,
+                "file_size_bytes": self._mapped_size_bytes,
+                "num_extents": self._num_extents,
+                "num_flushes": self._num_flushes,
+            }
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        """Write the records to disk and truncate the file to the records written."""
+        self.acquire()
+        try:
+            if self._mmap is not None:
+                self._flush_mmap()
+                self._mmap.close()
+                self._mmap = None
+            if self._file_descriptor is not None:
+                os.ftruncate(self._file_descriptor, self._write_position)
+                os.close(self._file_descriptor)
+                self._file_descriptor = None
+        finally:
+            self.release()
+        super().close()
+
+
+# the timestamp at the start of every line written with the standard, notebook and fast formats
+_LOG_LINE_TIMESTAMP_REGEX = re.compile(r"\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) UTC\]")
+
+
+def _iter_timestamped_log_entries(log_file: TextIO) -> Iterator[Tuple[str, str]]:
+    """Yield each log entry with its timestamp, keeping lines without a timestamp with the entry before them."""
+    timestamp = ""  # sorts any lines before the first timestamp in the file to the start
+    entry_lines: List[str] = list()
+    for line in log_file:
+        match = _LOG_LINE_TIMESTAMP_REGEX.match(line)
+        if match is not None:
+            if entry_lines:
+                yield timestamp, "".join(entry_lines)
+                entry_lines = list()
+            timestamp = match.group(1)
+        entry_lines.append(line)
+    if entry_lines:
+        entry = "".join(entry_lines)
+        yield timestamp, entry if entry.endswith("\n") else f"{entry}\n"
+
+
+def iter_merged_log_entries(log_file_paths: Sequence[str]) -> Iterator[str]:
+    """Merge log files (e.g. one per worker process) into a single stream of log entries in timestamp order.
+
+    Each file is read line by line and the next entry of every file is kept in a heap, so only one entry per file is held in memory regardless of the size of the files. Lines that do not start with a timestamp (e.g. tracebacks) stay with the entry before them. Entries with the same timestamp are kept in the order the files were given. Files rotated by BatchingFileHandler can be given as is, since files ending in .gz are decompressed while reading.
+
+    The files must have been written with the standard, notebook or fast format, since the order comes from the [%(asctime)s UTC] prefix of each entry. Each file is assumed to already be in timestamp order.
+
+    Args:
+        log_file_paths: the log files to merge
+
+    Returns:
+        each log entry (including its trailing newline)
+    """
+    with ExitStack() as stack:
+        log_files = [
+            stack.enter_context(
+                gzip.open(file_path, "rt", encoding="utf-8", errors="replace")
+                if file_path.endswith(".gz")
+                else open(file_path, encoding="utf-8", errors="replace")
+            )
+            for file_path in log_file_paths
+        ]
+        # the timestamps are fixed width, so comparing them as strings puts them in time order
+        for _, entry in heapq.merge(
+            *[_iter_timestamped_log_entries(log_file) for log_file in log_files], key=lambda item: item[0]
+        ):
+            yield entry
+
+
+def merge_log_files(log_file_paths: Sequence[str], merged_log_file_path: str) -> int:
+    """Write the entries of several log files to a single file in timestamp order.
+
+    See iter_merged_log_entries.
+
+    Returns:
+        the number of log entries written
+    """
+    num_entries = 0
+    with open(merged_log_file_path, "w", encoding="utf-8") as merged_log_file:
+        for entry in iter_merged_log_entries(log_file_paths):
+            merged_log_file.write(entry)
+            num_entries += 1
+    return num_entries
+
+
+# registered after logging's own atexit handler so that it runs first and the handlers are still open
+atexit.register(shutdown_queue_logging)
+
+
+def _after_fork_in_child() -> None:
+    _use_queue_listener_handlers_after_fork()
+    for handler in list(_handlers_to_reinit_after_fork):
+        handler._after_fork_in_child()  # pylint: disable=protected-access # only meant to be called here
+
+
+# not available on Windows, where processes are never forked
+if hasattr(os, "register_at_fork"):  # pragma: no cover
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -9,6 +9,8 @@ from multiprocessing import Process
 import multiprocessing.queues
 import queue
 from typing import Any
+from typing import Callable
+from typing import Optional
 from typing import Tuple
 from typing import Union
 
@@ -16,6 +18,7 @@ from .exceptions import BadQueueTypeError
 from .misc import get_formatted_stack_trace
 from .parallelism_framework import InfiniteLoopingParallelismMixIn
 from .queue_utils import SimpleMultiprocessingQueue
+from .shared_memory_queues import SharedMemoryQueue
 
 
 class InfiniteProcess(InfiniteLoopingParallelismMixIn, Process):
@@ -24,19 +27,24 @@ class InfiniteProcess(InfiniteLoopingParallelismMixIn, Process):
     Because of the more explict error reporting/handling during the run method, the Process.exitcode value will still be 0 when the process exits after handling an error.
 
     Args:
-        fatal_error_reporter: set up as a queue to be multiprocessing safe. If any error is unhandled during run, it is fed into this queue so that calling thread can know the full details about the problem in this process.
+        fatal_error_reporter: set up as a queue to be multiprocessing safe. If any error is unhandled during run, it is fed into this queue so that calling thread can know the full details about the problem in this process. If the queue has a custom serializer, it must be pickle based so that the exception can be sent.
+        clock_ns: the clock used for iteration timing. Defaults to time.perf_counter_ns. Must be picklable if the process is spawned (e.g. the perf_counter_ns method of a VirtualClock)
+        sleeper: called with the number of seconds to sleep at the end of each iteration. Defaults to time.sleep
     """
 
     def __init__(
         self,
         fatal_error_reporter: Union[
             SimpleMultiprocessingQueue,
+            SharedMemoryQueue,
             multiprocessing.queues.Queue[  # pylint: disable=unsubscriptable-object # Eli (3/12/20) not sure why pylint doesn't recognize this type annotation
                 Any
             ],
         ],
         logging_level: int = logging.INFO,
         minimum_iteration_duration_seconds: Union[float, int] = 0.01,
+        clock_ns: Optional[Callable[[], int]] = None,
+        sleeper: Optional[Callable[[float], None]] = None,
     ) -> None:
         Process.__init__(self)
         InfiniteLoopingParallelismMixIn.__init__(
@@ -49,6 +57,8 @@ class InfiniteProcess(InfiniteLoopingParallelismMixIn, Process):
             Event(),
             Event(),
             minimum_iteration_duration_seconds=minimum_iteration_duration_seconds,
+            clock_ns=clock_ns,
+            sleeper=sleeper,
         )
 
     def _report_fatal_error(self, the_err: Exception) -> None:
@@ -60,11 +70,17 @@ class InfiniteProcess(InfiniteLoopingParallelismMixIn, Process):
     def start(self) -> None:
         if not isinstance(
             self._fatal_error_reporter,
-            (SimpleMultiprocessingQueue, multiprocessing.queues.Queue),
+            (SimpleMultiprocessingQueue, SharedMemoryQueue, multiprocessing.queues.Queue),
         ):
             raise BadQueueTypeError(
-                f"_fatal_error_reporter must be a SimpleMultiprocessingQueue or multiprocessing.queues.Queue if starting this process, not {type(self._fatal_error_reporter)}"
+                f"_fatal_error_reporter must be a SimpleMultiprocessingQueue, SharedMemoryQueue or multiprocessing.queues.Queue if starting this process, not {type(self._fatal_error_reporter)}"
             )
+        if isinstance(self._fatal_error_reporter, (SimpleMultiprocessingQueue, SharedMemoryQueue)):
+            serializer = self._fatal_error_reporter.get_serializer()
+            if not serializer.can_serialize_any_picklable_object():
+                raise BadQueueTypeError(
+                    f"_fatal_error_reporter must use a pickle based serializer so that exceptions can be sent through it, not {serializer.get_name()}"
+                )
         super().start()
 
     @staticmethod
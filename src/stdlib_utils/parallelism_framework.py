@@ -10,6 +10,7 @@ import queue
 import threading
 import time
 from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import List
 from typing import Optional
@@ -23,10 +24,49 @@ from .misc import print_exception
 from .queue_utils import is_queue_eventually_not_empty
 from .queue_utils import SimpleMultiprocessingQueue
 from .queue_utils import TestingQueue
+from .shared_memory_queues import SharedMemoryQueue
 
 
-def calculate_iteration_time_ns(start_timepoint_of_iteration: int) -> int:
-    return time.perf_counter_ns() - start_timepoint_of_iteration
+def calculate_iteration_time_ns(
+    start_timepoint_of_iteration: int, clock_ns: Optional[Callable[[], int]] = None
+) -> int:
+    current_timepoint = time.perf_counter_ns() if clock_ns is None else clock_ns()
+    return current_timepoint - start_timepoint_of_iteration
+
+
+class VirtualClock:
+    """A clock that only moves forward when told to, for testing the run loop.
+
+    Pass the perf_counter_ns and sleep methods as the clock_ns and sleeper of an InfiniteThread/InfiniteProcess. Sleeping advances the clock instantly instead of blocking, so thousands of iterations (and any timeouts or periodic reports based on the clock) execute at CPU speed, while the performance metrics report the simulated durations.
+
+    Time only passes when the run loop sleeps or advance is called, so iterations take no time at all unless _commands_for_each_run_iteration advances the clock to simulate its duration. If no time has passed since the last reset, the performance tracker reports a percent use of 100.
+
+    Args:
+        start_timepoint_ns: the initial reading of the clock
+    """
+
+    def __init__(self, start_timepoint_ns: int = 0) -> None:
+        self._current_timepoint_ns = start_timepoint_ns
+        self._total_sleep_ns = 0
+
+    def perf_counter_ns(self) -> int:
+        return self._current_timepoint_ns
+
+    def advance(self, duration_ns: int) -> None:
+        """Move the clock forward, e.g. to simulate an iteration taking time."""
+        if duration_ns < 0:
+            raise ValueError(
+                f"A clock cannot move backwards, the duration must not be negative: {duration_ns}"
+            )
+        self._current_timepoint_ns += duration_ns
+
+    def sleep(self, seconds: Union[float, int]) -> None:
+        duration_ns = int(round(seconds * 10**9))
+        self.advance(duration_ns)
+        self._total_sleep_ns += duration_ns
+
+    def get_total_sleep_ns(self) -> int:
+        return self._total_sleep_ns
 
 
 # pylint: disable=too-many-instance-attributes
@@ -43,6 +83,8 @@ class InfiniteLoopingParallelismMixIn:
         soft_stop_event: When set (typically by calling .soft_stop()), this will cause the infinite loop to exit the next iteration that all conditionals indicating a soft_stop is possible are met (typically used to ensure all incoming tasks/queues are empty and there is nothing currently available to process)
         teardown_complete_event: After the infinite loop is exited, the _teardown_after_loop() method will be called. This event can be monitored by the parent thread to determine when the teardown has completed and the process is ready to have any needed additional clean-up performed by the parent before the parent calls .join().
         minimum_iteration_duration_seconds: In order for the process not to unnecessarily consume CPU resources while looping, the loop will sleep at the end of each iteration until this threshold duration is met.
+        clock_ns: the monotonic clock used for iteration timing and performance metrics. Defaults to time.perf_counter_ns. Typically replaced with a VirtualClock during unit testing
+        sleeper: called with the number of seconds to sleep at the end of each iteration. Defaults to time.sleep
     """
 
     num_longest_iterations = 5
@@ -53,6 +95,7 @@ class InfiniteLoopingParallelismMixIn:
             queue.Queue[str],
             multiprocessing.queues.Queue[Tuple[Exception, str]],
             SimpleMultiprocessingQueue,
+            SharedMemoryQueue,
             TestingQueue,
         ],
         logging_level: int,
@@ -62,7 +105,11 @@ class InfiniteLoopingParallelismMixIn:
         start_up_complete_event: Union[threading.Event, multiprocessing.synchronize.Event],
         pause_event: Union[threading.Event, multiprocessing.synchronize.Event],
         minimum_iteration_duration_seconds: Union[float, int] = 0.01,
+        clock_ns: Optional[Callable[[], int]] = None,
+        sleeper: Optional[Callable[[float], None]] = None,
     ) -> None:
+        self._clock_ns = clock_ns
+        self._sleeper = sleeper
         self._init_time_ns: Optional[int] = None
         self._stop_event = stop_event
         self._soft_stop_event = soft_stop_event
@@ -80,6 +127,22 @@ class InfiniteLoopingParallelismMixIn:
         self._longest_iterations: List[int] = list()
         self._sleep_durations: List[float] = list()
 
+    def get_current_timepoint_ns(self) -> int:
+        """Read the clock used by the run loop.
+
+        Subclasses should use this (instead of calling time.perf_counter_ns directly) for their own timeouts and periodic tasks so that they also follow a virtual clock during testing.
+        """
+        # the default is looked up on each call so that patching time.perf_counter_ns still works
+        if self._clock_ns is None:
+            return time.perf_counter_ns()
+        return self._clock_ns()
+
+    def _sleep(self, seconds: float) -> None:
+        if self._sleeper is None:
+            time.sleep(seconds)
+            return
+        self._sleeper(seconds)
+
     def _init_performance_measurements(self) -> None:
         # separate to make mocking easier
         self._reset_performance_measurements()
@@ -87,25 +150,27 @@ class InfiniteLoopingParallelismMixIn:
     def _reset_performance_measurements(self) -> None:
         self._periods_between_iterations = list()
         self._sleep_durations = list()
-        self._start_timepoint_of_last_performance_measurement = time.perf_counter_ns()
+        self._start_timepoint_of_last_performance_measurement = self.get_current_timepoint_ns()
         self._idle_iteration_time_ns = 0
 
     def _reset_start_time(self) -> None:
-        self._init_time_ns = time.perf_counter_ns()
+        self._init_time_ns = self.get_current_timepoint_ns()
 
     def get_start_timepoint_of_performance_measurement(self) -> int:
         return self._start_timepoint_of_last_performance_measurement
 
     def get_elapsed_time_since_last_performance_measurement(self) -> int:
-        return time.perf_counter_ns() - self._start_timepoint_of_last_performance_measurement
+        return self.get_current_timepoint_ns() - self._start_timepoint_of_last_performance_measurement
 
     def reset_performance_tracker(self) -> Dict[str, Any]:
         """Reset performance tracking and return various metrics."""
         out_dict: Dict[str, Any] = {}
         out_dict["start_timepoint_of_measurements"] = self._start_timepoint_of_last_performance_measurement
         out_dict["idle_iteration_time_ns"] = self._idle_iteration_time_ns
-        out_dict["percent_use"] = 100 * (
-            1 - self._idle_iteration_time_ns / self.get_elapsed_time_since_last_performance_measurement()
+        elapsed_time_ns = self.get_elapsed_time_since_last_performance_measurement()
+        # with a VirtualClock, no time passes unless the loop sleeps or the clock is advanced, and the loop was never idle
+        out_dict["percent_use"] = (
+            100.0 if elapsed_time_ns == 0 else 100 * (1 - self._idle_iteration_time_ns / elapsed_time_ns)
         )
         out_dict["longest_iterations"] = self._longest_iterations
         if len(self._periods_between_iterations) > 1:
@@ -131,7 +196,7 @@ class InfiniteLoopingParallelismMixIn:
     def get_cms_since_init(self) -> int:
         if self._init_time_ns is None:
             return 0
-        ns_since_init = time.perf_counter_ns() - self._init_time_ns
+        ns_since_init = self.get_current_timepoint_ns() - self._init_time_ns
         return ns_since_init // NANOSECONDS_PER_CENTIMILLISECOND
 
     def get_logging_level(self) -> int:
@@ -152,6 +217,7 @@ class InfiniteLoopingParallelismMixIn:
         queue.Queue[str],
         multiprocessing.queues.Queue[Tuple[Exception, str]],
         SimpleMultiprocessingQueue,
+        SharedMemoryQueue,
         TestingQueue,
     ]:
         return self._fatal_error_reporter
@@ -213,7 +279,7 @@ class InfiniteLoopingParallelismMixIn:
                 return
         self._start_up_complete_event.set()
         while True:
-            start_timepoint_of_iteration = time.perf_counter_ns()
+            start_timepoint_of_iteration = self.get_current_timepoint_ns()
             if self._start_time_of_last_iteration is not None:
                 self._periods_between_iterations.append(
                     start_timepoint_of_iteration - self._start_time_of_last_iteration
@@ -247,7 +313,7 @@ class InfiniteLoopingParallelismMixIn:
                 self._report_fatal_error(e)
 
     def _sleep_for_idle_time_during_iteration(self, start_timepoint_of_iteration: int) -> None:
-        iteration_time_ns = calculate_iteration_time_ns(start_timepoint_of_iteration)
+        iteration_time_ns = calculate_iteration_time_ns(start_timepoint_of_iteration, self._clock_ns)
 
         longest_iterations = self._longest_iterations
         if len(longest_iterations) < 5:
@@ -262,7 +328,7 @@ class InfiniteLoopingParallelismMixIn:
             self._idle_iteration_time_ns += idle_time_ns
             sleep_dur = idle_time_ns / 10**9
             self._sleep_durations.append(sleep_dur)
-            time.sleep(sleep_dur)
+            self._sleep(sleep_dur)
 
     def _commands_for_each_run_iteration(self) -> None:
         """Execute additional commands inside the run loop."""
@@ -318,7 +384,7 @@ class InfiniteLoopingParallelismMixIn:
 
         error_queue = self.get_fatal_error_reporter()
         error_items = list()
-        if isinstance(error_queue, (SimpleMultiprocessingQueue, TestingQueue)):
+        if isinstance(error_queue, (SimpleMultiprocessingQueue, SharedMemoryQueue, TestingQueue)):
             while not error_queue.empty():
                 error_items.append(error_queue.get_nowait())
         else:
@@ -6,22 +6,40 @@ multiprocessing_utils, and queue_utils.
 """
 from __future__ import annotations
 
+import logging
+from logging.handlers import QueueHandler
 import multiprocessing
 import multiprocessing.queues
+import queue
 from queue import Queue
+import sys
+import time
 from time import perf_counter
 from time import sleep
 from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Hashable
+from typing import List
 from typing import Optional
+from typing import TextIO
+from typing import Tuple
 from typing import Union
 
+from .constants import LOG_BATCH_COMMUNICATION_TAG
+from .constants import LOG_COMMUNICATION_TAG
+from .constants import OVERFLOW_POLICY_DROP_OLDEST
+from .constants import UnionOfThreadingAndMultiprocessingQueue
 from .exceptions import ParallelFrameworkStillNotStoppedError
+from .loggers import create_logging_formatter
+from .loggers import get_log_file_path
 from .multiprocessing_utils import InfiniteProcess
 from .parallelism_framework import InfiniteLoopingParallelismMixIn
+from .queue_utils import BoundedMultiprocessingQueue
 from .queue_utils import is_queue_eventually_not_empty
 from .queue_utils import SimpleMultiprocessingQueue
 from .queue_utils import TestingQueue
+from .shared_memory_queues import SharedMemoryQueue
 from .threading_utils import InfiniteThread
 
 
@@ -57,29 +75,191 @@ def put_log_message_into_queue(
             Dict[str, Any]
         ],
         SimpleMultiprocessingQueue,
+        SharedMemoryQueue,
         multiprocessing.queues.Queue[  # pylint: disable=unsubscriptable-object # Eli (3/12/20) not sure why pylint doesn't recognize this type annotation
             Dict[str, Any]
         ],
     ],
     log_level_threshold: int,
     pause_after_put: bool = False,
+    compact: bool = False,
 ) -> None:
     """Put a log message into a queue.
 
     The message is only put in if the log level of the message meets the
     threshold of the queue.
+
+    If compact is True, the message is sent as a (LOG_COMMUNICATION_TAG, log_level, message) tuple instead of a dictionary, which is smaller and faster to pickle. Use decode_log_communication on the receiving end to handle either form.
     """
     if log_level_of_this_message >= log_level_threshold:
-        comm_dict = {
-            "communication_type": "log",
-            "log_level": log_level_of_this_message,
-            "message": the_message,
-        }
-        the_queue.put_nowait(comm_dict)
+        comm: Any
+        if compact:
+            comm = (LOG_COMMUNICATION_TAG, log_level_of_this_message, the_message)
+        else:
+            comm = {
+                "communication_type": "log",
+                "log_level": log_level_of_this_message,
+                "message": the_message,
+            }
+        the_queue.put_nowait(comm)
     if not isinstance(the_queue, SimpleMultiprocessingQueue) and pause_after_put:
         is_queue_eventually_not_empty(the_queue)
 
 
+def _create_log_message_dict(
+    log_level: int, message: Any, message_key: Optional[Hashable] = None, num_suppressed: Optional[int] = None
+) -> Dict[str, Any]:
+    log_message = {"communication_type": "log", "log_level": log_level, "message": message}
+    if num_suppressed is not None:
+        log_message["message_key"] = message_key
+        log_message["num_suppressed"] = num_suppressed
+    return log_message
+
+
+def decode_log_communication(communication: Any) -> Optional[List[Dict[str, Any]]]:
+    """Convert a communication sent by put_log_message_into_queue or LogMessageBuffer into log message dictionaries.
+
+    Each dictionary has the same keys as the ones put_log_message_into_queue sends without compact=True. Summaries of rate limited messages from LogMessageBuffer also have the keys message_key and num_suppressed.
+
+    Returns None if the communication is not a log message, so that other communications from the same queue can be handled by the caller.
+    """
+    if isinstance(communication, dict):
+        return [communication] if communication.get("communication_type") == "log" else None
+    if isinstance(communication, tuple) and communication:
+        if communication[0] == LOG_COMMUNICATION_TAG:
+            return [_create_log_message_dict(*communication[1:])]
+        if communication[0] == LOG_BATCH_COMMUNICATION_TAG:
+            return [_create_log_message_dict(*log_entry) for log_entry in communication[1]]
+    return None
+
+
+class _MessageKeyRateLimit:  # pylint: disable=too-few-public-methods # only holds the counts for the current period
+    def __init__(self, period_start_timepoint_ns: int) -> None:
+        self.period_start_timepoint_ns = period_start_timepoint_ns
+        self.num_sent = 0
+        self.num_suppressed = 0
+        self.max_suppressed_log_level = logging.NOTSET
+
+
+class LogMessageBuffer:
+    """Send log messages from a worker to a queue in batches, optionally rate limiting them.
+
+    Messages below the threshold are discarded immediately. The rest are buffered as compact (log_level, message) tuples, and the whole buffer is sent as a single (LOG_BATCH_COMMUNICATION_TAG, list of tuples) communication once flush_interval_seconds have passed since the last send. This is checked whenever a message is put, so workers should also call flush at the end of each iteration (or close during teardown) to send any messages still buffered. Use decode_log_communication on the receiving end.
+
+    If max_messages_per_key is specified, messages put with a message_key are limited to that many per rate_limit_period_seconds for each key. The rest are suppressed and counted, and after the period ends a single summary message with the number suppressed is sent at the highest log level of the suppressed messages.
+
+    Args:
+        the_queue: the queue to send batches of log messages into
+        log_level_threshold: messages below this log level are discarded
+        flush_interval_seconds: the minimum amount of time between sending batches while messages are being put
+        max_messages_per_key: if specified, the number of messages with the same message_key sent per period
+        rate_limit_period_seconds: the length of each rate limiting period, which starts with the first message for a key
+        clock_ns: returns the current time in nanoseconds. Defaults to time.perf_counter_ns
+    """
+
+    def __init__(
+        self,
+        the_queue: UnionOfThreadingAndMultiprocessingQueue,
+        log_level_threshold: int,
+        flush_interval_seconds: float = 0.1,
+        max_messages_per_key: Optional[int] = None,
+        rate_limit_period_seconds: float = 1,
+        clock_ns: Optional[Callable[[], int]] = None,
+    ) -> None:
+        self._queue = the_queue
+        self._log_level_threshold = log_level_threshold
+        self._flush_interval_ns = int(flush_interval_seconds * 10**9)
+        self._max_messages_per_key = max_messages_per_key
+        self._rate_limit_period_ns = int(rate_limit_period_seconds * 10**9)
+        self._clock_ns = clock_ns
+        self._buffer: List[Tuple[Any, ...]] = list()
+        self._rate_limits: Dict[Hashable, _MessageKeyRateLimit] = dict()
+        self._num_suppressed = 0
+        self._last_send_timepoint_ns = self._get_timepoint_ns()
+
+    def _get_timepoint_ns(self) -> int:
+        if self._clock_ns is None:
+            return time.perf_counter_ns()
+        return self._clock_ns()
+
+    def get_num_buffered(self) -> int:
+        return len(self._buffer)
+
+    def get_num_suppressed(self) -> int:
+        """Get the total number of messages suppressed by the rate limiter."""
+        return self._num_suppressed
+
+    def put(self, log_level: int, message: Any, message_key: Optional[Hashable] = None) -> None:
+        """Buffer a log message, sending the buffer if the flush interval has passed.
+
+        Args:
+            log_level: the log level of this message
+            message: the message
+            message_key: identifies messages that should be rate limited together (e.g. the type of a repeated error). Messages without a key are never rate limited
+        """
+        if log_level < self._log_level_threshold:
+            return
+        timepoint_ns = self._get_timepoint_ns()
+        if (
+            message_key is None
+            or self._max_messages_per_key is None
+            or self._is_within_rate_limit(log_level, message_key, timepoint_ns)
+        ):
+            self._buffer.append((log_level, message))
+        if timepoint_ns - self._last_send_timepoint_ns >= self._flush_interval_ns:
+            self.flush()
+
+    def _is_within_rate_limit(self, log_level: int, message_key: Hashable, timepoint_ns: int) -> bool:
+        rate_limit = self._rate_limits.get(message_key)
+        if (
+            rate_limit is None
+            or timepoint_ns - rate_limit.period_start_timepoint_ns >= self._rate_limit_period_ns
+        ):
+            if rate_limit is not None:
+                self._buffer_summary(message_key, rate_limit)
+            rate_limit = _MessageKeyRateLimit(timepoint_ns)
+            self._rate_limits[message_key] = rate_limit
+        if rate_limit.num_sent < self._max_messages_per_key:  # type: ignore[operator] # only called when there is a limit
+            rate_limit.num_sent += 1
+            return True
+        rate_limit.num_suppressed += 1
+        rate_limit.max_suppressed_log_level = max(rate_limit.max_suppressed_log_level, log_level)
+        self._num_suppressed += 1
+        return False
+
+    def _buffer_summary(self, message_key: Hashable, rate_limit: _MessageKeyRateLimit) -> None:
+        if rate_limit.num_suppressed == 0:
+            return
+        self._buffer.append(
+            (
+                rate_limit.max_suppressed_log_level,
+                f"Suppressed {rate_limit.num_suppressed} log messages with key {message_key!r}",
+                message_key,
+                rate_limit.num_suppressed,
+            )
+        )
+
+    def flush(self) -> None:
+        """Send all buffered messages, including summaries for rate limiting periods that have ended."""
+        timepoint_ns = self._get_timepoint_ns()
+        self._last_send_timepoint_ns = timepoint_ns
+        # end the periods that are over now, so a summary is not held back until the key is used again
+        for message_key, rate_limit in list(self._rate_limits.items()):
+            if timepoint_ns - rate_limit.period_start_timepoint_ns >= self._rate_limit_period_ns:
+                self._buffer_summary(message_key, rate_limit)
+                del self._rate_limits[message_key]
+        if self._buffer:
+            self._queue.put_nowait((LOG_BATCH_COMMUNICATION_TAG, self._buffer))
+            self._buffer = list()
+
+    def close(self) -> None:
+        """Send all buffered messages and the summaries for every key, even if their period has not ended."""
+        for message_key, rate_limit in self._rate_limits.items():
+            self._buffer_summary(message_key, rate_limit)
+        self._rate_limits.clear()
+        self.flush()
+
+
 def invoke_process_run_and_check_errors(
     the_process: InfiniteLoopingParallelismMixIn,
     num_iterations: int = 1,
@@ -99,7 +279,7 @@ def invoke_process_run_and_check_errors(
 
     error_queue = the_process.get_fatal_error_reporter()
     is_item_in_queue = not error_queue.empty()
-    if not isinstance(error_queue, (SimpleMultiprocessingQueue, TestingQueue)):
+    if not isinstance(error_queue, (SimpleMultiprocessingQueue, SharedMemoryQueue, TestingQueue)):
         is_item_in_queue = is_queue_eventually_not_empty(error_queue)
     if is_item_in_queue:
         err_info = the_process.get_fatal_error_reporter().get_nowait()
@@ -117,3 +297,174 @@ def invoke_process_run_and_check_errors(
             raise NotImplementedError("Errors from InfiniteThread must be Exceptions")
 
         InfiniteThread.log_and_raise_error_from_reporter(err_info)
+
+
+class LogCollectorQueueHandler(QueueHandler):
+    """Send log records to a LogCollectorProcess without ever blocking on a full queue.
+
+    Records that do not fit in the queue are dropped, and the number dropped is attached to the next record that is sent so the collector can count them.
+    """
+
+    def __init__(self, log_queue: BoundedMultiprocessingQueue) -> None:
+        super().__init__(log_queue)
+        self._num_dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        record.num_dropped_log_records = self._num_dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._num_dropped += 1
+            return
+        self._num_dropped = 0
+
+    def get_num_dropped(self) -> int:
+        """Get the number of records dropped since the last one that was sent."""
+        return self._num_dropped
+
+
+def install_log_collector_handler(
+    log_queue: BoundedMultiprocessingQueue, logging_level: int = logging.INFO
+) -> LogCollectorQueueHandler:
+    """Send all logging in this process to a LogCollectorProcess.
+
+    This should be called at the start of the run method (e.g. in _setup_before_loop) of each worker process, so that it takes effect in the worker and not the parent. Any existing handlers on the root logger are removed.
+
+    Args:
+        log_queue: the queue from LogCollectorProcess.get_log_queue
+        logging_level: the threshold for records sent to the collector
+    """
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    handler = LogCollectorQueueHandler(log_queue)
+    root_logger.addHandler(handler)
+    root_logger.setLevel(logging_level)
+    return handler
+
+
+class LogCollectorProcess(InfiniteProcess):
+    """Write the log records of many worker processes to a single file.
+
+    Workers send records over one shared queue by calling install_log_collector_handler inside their run method. The collector writes each batch of records it receives with a single write, and counts the messages received from (and dropped by) each worker, keyed by process name.
+
+    The counts are sent back to the parent process periodically and when the collector stops, and can be retrieved there with get_worker_stats. Only the most recent counts are kept until they are retrieved, so the collector never waits on the parent.
+
+    Args:
+        fatal_error_reporter: the queue to report fatal errors in the collector itself
+        log_file_path: the file to append records to. Defaults to the file created by configure_logging in the process creating the collector, or stdout if configure_logging did not create one that other writers can append to (see get_log_file_path).
+        logging_format: the format of the records written, as in configure_logging
+        logging_formatter: optional custom formatter to use instead of logging_format
+        max_queued_records: the number of records that can be waiting in the queue before workers start dropping them
+        max_records_per_write: the maximum number of records written at once
+        stats_reporting_period_seconds: how often the per-worker counts are sent to the parent process
+    """
+
+    def __init__(
+        self,
+        fatal_error_reporter: Any,
+        log_file_path: Optional[str] = None,
+        logging_format: str = "standard",
+        logging_formatter: Optional[logging.Formatter] = None,
+        max_queued_records: int = 10000,
+        max_records_per_write: int = 1000,
+        stats_reporting_period_seconds: Union[float, int] = 1,
+        logging_level: int = logging.INFO,
+        minimum_iteration_duration_seconds: Union[float, int] = 0.01,
+    ) -> None:
+        super().__init__(
+            fatal_error_reporter,
+            logging_level=logging_level,
+            minimum_iteration_duration_seconds=minimum_iteration_duration_seconds,
+        )
+        self._log_file_path = get_log_file_path() if log_file_path is None else log_file_path
+        if logging_formatter is None:
+            logging_formatter = create_logging_formatter(logging_format)
+        self._formatter = logging_formatter
+        self._max_records_per_write = max_records_per_write
+        self._stats_reporting_period_ns = int(stats_reporting_period_seconds * 10**9)
+        self._log_queue = BoundedMultiprocessingQueue(max_queued_records)
+        # only the most recent counts matter, so older ones are dropped rather than blocking the collector when the parent never retrieves them
+        self._stats_queue = BoundedMultiprocessingQueue(1, overflow_policy=OVERFLOW_POLICY_DROP_OLDEST)
+        self._log_file: Optional[TextIO] = None
+        self._worker_stats: Dict[str, Dict[str, int]] = dict()
+        self._last_stats_report_timepoint_ns = 0
+
+    def get_log_queue(self) -> BoundedMultiprocessingQueue:
+        return self._log_queue
+
+    def get_log_file_path(self) -> Optional[str]:
+        return self._log_file_path
+
+    def get_worker_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get the most recent counts of messages and dropped messages for each worker."""
+        while True:
+            try:
+                self._worker_stats = self._stats_queue.get_nowait()
+            except queue.Empty:
+                break
+        return self._worker_stats
+
+    def _setup_before_loop(self) -> None:
+        super()._setup_before_loop()
+        if self._log_file_path is None:
+            self._log_file = sys.stdout
+        else:
+            self._log_file = open(  # pylint: disable=consider-using-with # the file stays open until teardown
+                self._log_file_path, "a", encoding="utf-8"
+            )
+        self._last_stats_report_timepoint_ns = self.get_current_timepoint_ns()
+
+    def _write_records(self, records: List[logging.LogRecord]) -> None:
+        if self._log_file is None:
+            raise NotImplementedError("The log file should always be opened before writing records.")
+        lines = list()
+        for record in records:
+            lines.append(self._formatter.format(record))
+            worker_stats = self._worker_stats.setdefault(
+                record.processName or "", {"num_messages": 0, "num_dropped": 0}
+            )
+            worker_stats["num_messages"] += 1
+            worker_stats["num_dropped"] += getattr(record, "num_dropped_log_records", 0)
+        lines.append("")
+        self._log_file.write("\n".join(lines))
+        self._log_file.flush()
+
+    def _report_worker_stats(self) -> None:
+        self._stats_queue.put_nowait({name: dict(stats) for name, stats in self._worker_stats.items()})
+        self._last_stats_report_timepoint_ns = self.get_current_timepoint_ns()
+
+    def _get_records_nowait(self) -> List[logging.LogRecord]:
+        records: List[logging.LogRecord] = list()
+        while len(records) < self._max_records_per_write:
+            try:
+                records.append(self._log_queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _commands_for_each_run_iteration(self) -> None:
+        records = self._get_records_nowait()
+        if records:
+            self._write_records(records)
+        if len(records) == self._max_records_per_write:
+            self._process_can_be_soft_stopped = False
+        if (
+            self.get_current_timepoint_ns() - self._last_stats_report_timepoint_ns
+            >= self._stats_reporting_period_ns
+        ):
+            self._report_worker_stats()
+
+    def _teardown_after_loop(self) -> None:
+        # the parent also calls this during hard_stop, but only the collector process has the file open
+        if self._log_file is not None:
+            while True:
+                records = self._get_records_nowait()
+                if not records:
+                    break
+                self._write_records(records)
+            self._report_worker_stats()
+            if self._log_file is not sys.stdout:
+                self._log_file.close()
+            self._log_file = None
+        super()._teardown_after_loop()
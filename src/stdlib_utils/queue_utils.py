@@ -2,28 +2,87 @@
 """Functionality to enhance checking of queue mainly during unit testing.
 
 This module should not need to import from any other modules in
-stdlib_utils.
+stdlib_utils besides the constants, exceptions, misc and serializers.
 """
 from __future__ import annotations
 
+import array
+import asyncio
 from collections import deque
+import mmap
 import multiprocessing
+import multiprocessing.connection
 import multiprocessing.queues
+import os
 import queue
 from queue import Empty
 from queue import Queue
+import struct
+import sys
+import tempfile
 import time
-from time import process_time
+from time import perf_counter
 from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
 from typing import Union
 
+from .constants import INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE
+from .constants import OVERFLOW_POLICY_BLOCK
+from .constants import OVERFLOW_POLICY_DROP_NEWEST
+from .constants import OVERFLOW_POLICY_DROP_OLDEST
+from .constants import OVERFLOW_POLICY_KEEP_EVERY_NTH
 from .constants import QUEUE_CHECK_TIMEOUT_SECONDS
 from .constants import SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
 from .constants import UnionOfThreadingAndMultiprocessingQueue
 from .exceptions import QueueNotEmptyError
 from .exceptions import QueueNotExpectedSizeError
 from .exceptions import QueueStillEmptyError
+from .exceptions import UnrecognizedOverflowPolicyError
+from .misc import create_metrics_stats
+from .serializers import CompressingSerializer
+from .serializers import DEFAULT_PICKLE_SERIALIZER
+from .serializers import HIGHEST_PROTOCOL_PICKLE_SERIALIZER
+from .serializers import Serializer
+from .serializers import StructSerializer
+
+
+def _wait_for_queue_update(
+    the_queue: UnionOfThreadingAndMultiprocessingQueue,
+    is_waiting_for_put: bool,
+    is_queue_empty: bool,
+    timeout_seconds: Union[float, int],
+    fallback_sleep_seconds: float,
+) -> float:
+    """Block until the queue has likely changed or the timeout has passed.
+
+    The reading end of an empty multiprocessing queue's pipe can be polled for incoming data. Anything else (e.g. waiting for another process to drain a multiprocessing queue) falls back to sleeping with an exponential backoff. This includes threading queues: their not_empty and not_full conditions only wake one waiter per put or get, so waiting on them could take the wakeup meant for a thread blocked in get or put and leave that thread blocked.
+
+    Each wait is capped at SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE so that data which arrives between checking the queue and starting to wait can only delay the caller by that much.
+
+    Returns:
+        the duration of the fallback sleep to use on the next call
+    """
+    timeout_seconds = min(timeout_seconds, SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE)
+    if (
+        is_waiting_for_put
+        and is_queue_empty
+        and isinstance(the_queue, (multiprocessing.queues.Queue, multiprocessing.queues.SimpleQueue))
+    ):
+        # the reader connection is the only way to block on a multiprocessing queue without consuming from it
+        the_queue._reader.poll(timeout_seconds)  # type: ignore[attr-defined] # pylint: disable=protected-access
+        return fallback_sleep_seconds
+    if is_waiting_for_put and is_queue_empty and isinstance(the_queue, MultiprocessingPriorityQueue):
+        multiprocessing.connection.wait(the_queue.get_reader_connections(), timeout_seconds)
+        return fallback_sleep_seconds
+    time.sleep(min(timeout_seconds, fallback_sleep_seconds))
+    return min(fallback_sleep_seconds * 2, SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE)
 
 
 def _eventually_empty(
@@ -32,20 +91,18 @@ def _eventually_empty(
     timeout_seconds: Union[float, int] = QUEUE_CHECK_TIMEOUT_SECONDS,
 ) -> bool:
     """Help to determine if queue is eventually empty or not."""
-    start_time = process_time()
-    while process_time() - start_time < timeout_seconds:
+    deadline = perf_counter() + timeout_seconds
+    fallback_sleep_seconds = INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE
+    while True:
         is_empty = the_queue.empty()
-        value_to_check = is_empty
-        if not should_be_empty:
-            value_to_check = not value_to_check
-        if value_to_check:
+        if is_empty is should_be_empty:
             return True
-        time.sleep(
-            SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
-        )  # wait 50 msec between polling the queue to allow things to process in the background
-        # process_time() does not include time during sleep, so decrement the timeout_seconds to account for this
-        timeout_seconds -= SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
-    return False
+        remaining_seconds = deadline - perf_counter()
+        if remaining_seconds <= 0:
+            return False
+        fallback_sleep_seconds = _wait_for_queue_update(
+            the_queue, not should_be_empty, is_empty, remaining_seconds, fallback_sleep_seconds
+        )
 
 
 def is_queue_eventually_empty(
@@ -75,16 +132,18 @@ def is_queue_eventually_of_size(
     has fully completed during test setup before triggering the function
     being tested.
     """
-    start_time = process_time()
-    while process_time() - start_time < timeout_seconds:
-        if the_queue.qsize() == size:
+    deadline = perf_counter() + timeout_seconds
+    fallback_sleep_seconds = INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE
+    while True:
+        current_size = the_queue.qsize()
+        if current_size == size:
             return True
-        time.sleep(
-            SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
-        )  # wait 50 msec between polling the queue to allow things to process in the background
-        # process_time() does not include time during sleep, so decrement the timeout_seconds to account for this
-        timeout_seconds -= SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
-    return False
+        remaining_seconds = deadline - perf_counter()
+        if remaining_seconds <= 0:
+            return False
+        fallback_sleep_seconds = _wait_for_queue_update(
+            the_queue, current_size < size, current_size == 0, remaining_seconds, fallback_sleep_seconds
+        )
 
 
 def confirm_queue_is_eventually_of_size(
@@ -157,21 +216,316 @@ def drain_queue(
     return queue_items
 
 
+def _get_nowait_batch(
+    the_queue: UnionOfThreadingAndMultiprocessingQueue,
+    max_items: Optional[int],
+) -> List[Any]:
+    """Get a batch of items that are currently available in the queue.
+
+    Threading queues are drained in a single acquisition of their mutex,
+    and any other type of queue has a single item retrieved using
+    get_nowait.
+    """
+    if isinstance(the_queue, Queue):
+        with the_queue.not_full:
+            # the mutex is already held, so the public qsize/get methods would deadlock. Using _get preserves the ordering of subclasses such as PriorityQueue
+            num_items = the_queue._qsize()  # pylint: disable=protected-access
+            if max_items is not None:
+                num_items = min(num_items, max_items)
+            items = [the_queue._get() for _ in range(num_items)]  # pylint: disable=protected-access
+            if num_items > 0:
+                the_queue.not_full.notify(num_items)
+        return items
+    try:
+        return [the_queue.get_nowait()]
+    except Empty:
+        return []
+
+
+def iter_queue_nowait(
+    the_queue: UnionOfThreadingAndMultiprocessingQueue,
+    max_items: Optional[int] = None,
+    settle_seconds: Union[float, int] = 0,
+) -> Iterator[Any]:
+    """Yield all items currently in the queue without blocking on each get.
+
+    Unlike drain_queue, this does not wait for a timeout after the last item and it does not stop at an item that is None.
+
+    Args:
+        the_queue: the queue to drain
+        max_items: optional maximum number of items to retrieve
+        settle_seconds: once the queue appears empty, how long to wait for more items to arrive before stopping. Useful for multiprocessing queues where a feeder thread may not yet have flushed everything that was put into the queue.
+    """
+    num_items_retrieved = 0
+    while max_items is None or num_items_retrieved < max_items:
+        items = _get_nowait_batch(the_queue, None if max_items is None else max_items - num_items_retrieved)
+        if not items:
+            if settle_seconds > 0 and is_queue_eventually_not_empty(
+                the_queue, timeout_seconds=settle_seconds
+            ):
+                continue
+            return
+        num_items_retrieved += len(items)
+        yield from items
+
+
+def drain_queue_nowait(
+    the_queue: UnionOfThreadingAndMultiprocessingQueue,
+    max_items: Optional[int] = None,
+    settle_seconds: Union[float, int] = 0,
+) -> List[Any]:
+    """Return all items currently in the queue without blocking on each get.
+
+    See iter_queue_nowait for details about the arguments.
+    """
+    return list(iter_queue_nowait(the_queue, max_items=max_items, settle_seconds=settle_seconds))
+
+
+def _get_reader_connections(
+    the_queue: UnionOfThreadingAndMultiprocessingQueue,
+) -> Optional[List[multiprocessing.connection.Connection]]:
+    """Get the connections that become readable when objects are put into the queue.
+
+    Returns:
+        None if the queue is not backed by pipes
+    """
+    if isinstance(the_queue, (MultiprocessingPriorityQueue, BoundedMultiprocessingQueue)):
+        return the_queue.get_reader_connections()
+    if isinstance(the_queue, SimpleMultiprocessingQueue):
+        return [the_queue.get_reader_connection()]
+    if isinstance(the_queue, (multiprocessing.queues.Queue, multiprocessing.queues.SimpleQueue)):
+        return [the_queue._reader]  # type: ignore[attr-defined] # pylint: disable=protected-access
+    return None
+
+
+def wait_for_any(
+    queues: Iterable[UnionOfThreadingAndMultiprocessingQueue],
+    timeout_seconds: Optional[Union[float, int]] = None,
+) -> List[UnionOfThreadingAndMultiprocessingQueue]:
+    """Block until at least one of the queues is not empty.
+
+    Multiprocessing queues are waited on with multiprocessing.connection.wait on the reading ends of their pipes, so this returns as soon as an object is put into any of them. Any other types of queue (e.g. threading queues, SharedMemoryQueue or TestingQueue) are checked repeatedly with an exponential backoff. Threading queues are not waited on through their not_empty conditions, since each put only wakes one waiter and this could take the wakeup meant for a thread blocked in get.
+
+    Args:
+        queues: the queues to wait on, which may be of different types
+        timeout_seconds: maximum number of seconds to wait. Waits indefinitely if None.
+
+    Returns:
+        the queues which are not empty, in the order given. Empty if the timeout was reached.
+    """
+    queues = list(queues)
+    if not queues:
+        raise ValueError("At least one queue must be given to wait for")
+    deadline = None if timeout_seconds is None else perf_counter() + timeout_seconds
+    reader_connections: List[multiprocessing.connection.Connection] = list()
+    is_polling_required = False
+    for the_queue in queues:
+        connections = _get_reader_connections(the_queue)
+        if connections is None:
+            is_polling_required = True
+        else:
+            reader_connections.extend(connections)
+    fallback_sleep_seconds = INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE
+    while True:
+        ready_queues = [the_queue for the_queue in queues if not the_queue.empty()]
+        if ready_queues:
+            return ready_queues
+        wait_seconds = None if deadline is None else deadline - perf_counter()
+        if wait_seconds is not None and wait_seconds <= 0:
+            return []
+        if is_polling_required:
+            wait_seconds = (
+                fallback_sleep_seconds if wait_seconds is None else min(wait_seconds, fallback_sleep_seconds)
+            )
+            fallback_sleep_seconds = min(
+                fallback_sleep_seconds * 2, SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
+            )
+        if reader_connections:
+            multiprocessing.connection.wait(reader_connections, wait_seconds)
+        else:
+            time.sleep(wait_seconds)  # type: ignore[arg-type] # polling is always required if there is nothing to wait on
+
+
+_SINGLE_ITEM_MESSAGE_HEADER = b"\x00"
+_BATCH_MESSAGE_HEADER = b"\x01"
+
+
 class SimpleMultiprocessingQueue(multiprocessing.queues.SimpleQueue):  # type: ignore[type-arg] # noqa: F821 # Eli (3/10/20) can't figure out why SimpleQueue doesn't have type arguments defined in the stdlib(?)
     """Some additional basic functionality.
 
     Since SimpleQueue is not technically a class, there are some tricks to subclassing it: https://stackoverflow.com/questions/39496554/cannot-subclass-multiprocessing-queue-in-python-3-5
+
+    Args:
+        serializer: the codec used to convert objects to bytes for the pipe. Defaults to pickling with the same protocol as a regular SimpleQueue
+        compression_threshold_bytes: if given, serialized messages at least this large are compressed with zlib (see CompressingSerializer)
+        compression_level: the zlib compression level to use if compressing messages
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        serializer: Optional[Serializer] = None,
+        compression_threshold_bytes: Optional[int] = None,
+        compression_level: int = 6,
+    ) -> None:
         ctx = multiprocessing.get_context()
         super().__init__(ctx=ctx)
+        if serializer is None:
+            serializer = DEFAULT_PICKLE_SERIALIZER
+        if compression_threshold_bytes is not None:
+            serializer = CompressingSerializer(
+                serializer, threshold_bytes=compression_threshold_bytes, level=compression_level
+            )
+        self._serializer = serializer
+        self._unpacked_items: Deque[Any] = deque()
+
+    def __getstate__(self) -> Any:
+        return super().__getstate__() + (self._serializer,)  # type: ignore[operator]
+
+    def __setstate__(self, state: Any) -> None:
+        super().__setstate__(state[:-1])
+        self._serializer = state[-1]
+        self._unpacked_items = deque()
+
+    def get_serializer(self) -> Serializer:
+        return self._serializer
+
+    def get_reader_connection(self) -> multiprocessing.connection.Connection:
+        """Get the reading end of the pipe, e.g. to wait for it to become readable.
+
+        Reading from the connection directly would bypass the queue's locking and deserialization.
+        """
+        reader: multiprocessing.connection.Connection = self._reader  # type: ignore[attr-defined]
+        return reader
+
+    def _send_message(self, message: Union[bytes, bytearray]) -> None:
+        if self._wlock is None:  # type: ignore[attr-defined]
+            # writes to a message oriented win32 pipe are atomic
+            self._writer.send_bytes(message)  # type: ignore[attr-defined]
+        else:
+            with self._wlock:  # type: ignore[attr-defined]
+                self._writer.send_bytes(message)  # type: ignore[attr-defined]
+
+    def _receive_raw_message(self, timeout: Optional[Union[float, int]] = None) -> Optional[bytes]:
+        """Read the next message from the pipe.
+
+        Checking for data and reading it both happen while holding the read lock, so another consumer can never read the message in between and leave this one blocked.
+
+        Args:
+            timeout: maximum number of seconds to wait for the read lock and a message. Waits indefinitely if None.
+
+        Returns:
+            the message (including its header byte), or None if the timeout was reached
+        """
+        if timeout is None:
+            deadline = None
+            is_lock_acquired = self._rlock.acquire()  # type: ignore[attr-defined]
+        else:
+            deadline = perf_counter() + timeout
+            is_lock_acquired = self._rlock.acquire(True, max(timeout, 0))  # type: ignore[attr-defined]
+        if not is_lock_acquired:
+            return None
+        try:
+            poll_timeout = None if deadline is None else max(deadline - perf_counter(), 0)
+            if not self._reader.poll(poll_timeout):  # type: ignore[attr-defined]
+                return None
+            message: bytes = self._reader.recv_bytes()  # type: ignore[attr-defined]
+        finally:
+            self._rlock.release()  # type: ignore[attr-defined]
+        return message
+
+    def _receive_message(self, timeout: Optional[Union[float, int]] = None) -> bool:
+        """Read the next message from the pipe into the unpacked items.
+
+        Args:
+            timeout: maximum number of seconds to wait for the read lock and a message. Waits indefinitely if None.
+
+        Returns:
+            whether a message was received before the timeout
+        """
+        message = self._receive_raw_message(timeout=timeout)
+        if message is None:
+            return False
+        # deserialize the data after having released the lock
+        payload = memoryview(message)[1:]
+        if message[:1] == _BATCH_MESSAGE_HEADER:
+            self._unpacked_items.extend(self._serializer.loads_many(payload))
+        else:
+            self._unpacked_items.append(self._serializer.loads(payload))
+        return True
+
+    def put(self, obj: Any) -> None:
+        self._send_message(_SINGLE_ITEM_MESSAGE_HEADER + self._serializer.dumps(obj))
+
+    def put_many(self, objs: Iterable[Any]) -> None:
+        """Put multiple objects into the queue as a single message.
+
+        This requires only one serialization and one write to the pipe for the whole batch. Consumers still receive the objects individually from get/get_nowait, or can retrieve them in bulk with get_many.
+
+        The whole batch is delivered to the first process that reads it, even if that process only gets one of the objects: the rest are held in that process until it gets them, and are invisible to (empty() is True in) any other process. Only use batches when a single consumer process reads from the queue.
+        """
+        objs = list(objs)
+        if not objs:
+            return
+        self._send_message(_BATCH_MESSAGE_HEADER + self._serializer.dumps_many(objs))
+
+    def get(self, block: bool = True, timeout: Optional[Union[float, int]] = None) -> Any:
+        """Get the next object, waiting for one to arrive if necessary.
+
+        Args:
+            block: if False, raise queue.Empty immediately if no object is available
+            timeout: maximum number of seconds to wait if blocking. Waits indefinitely if None.
+        """
+        if not block:
+            timeout = 0
+        deadline = None if timeout is None else perf_counter() + timeout
+        while True:
+            try:
+                return self._unpacked_items.popleft()
+            except IndexError:
+                pass
+            remaining_timeout = None if deadline is None else deadline - perf_counter()
+            if not self._receive_message(timeout=remaining_timeout):
+                raise queue.Empty()
+
+    def get_many(self, max_items: Optional[int] = None) -> List[Any]:
+        """Get all objects currently available without blocking.
+
+        Args:
+            max_items: optional maximum number of objects to retrieve. Any remaining objects from a batch that was already read from the pipe are kept for the next call to get/get_many.
+        """
+        items: List[Any] = list()
+        while max_items is None or len(items) < max_items:
+            try:
+                items.append(self._unpacked_items.popleft())
+            except IndexError:
+                if not self._receive_message(timeout=0):
+                    break
+        return items
+
+    def get_batch(
+        self, max_items: Optional[int] = None, timeout: Optional[Union[float, int]] = None
+    ) -> List[Any]:
+        """Wait for at least one object, then get all that are available.
+
+        Args:
+            max_items: optional maximum number of objects to retrieve
+            timeout: maximum number of seconds to wait for the first object. Waits indefinitely if None.
+
+        Returns:
+            the objects retrieved, which will be an empty list if the timeout was reached
+        """
+        try:
+            first_item = self.get(timeout=timeout)
+        except queue.Empty:
+            return []
+        return [first_item] + self.get_many(max_items=None if max_items is None else max_items - 1)
+
+    def empty(self) -> bool:
+        return not self._unpacked_items and super().empty()
 
     def get_nowait(self) -> Any:
         """Get value or raise error if empty."""
-        if self.empty():
-            raise queue.Empty()
-        return self.get()
+        return self.get(block=False)
 
     def put_nowait(self, obj: Any) -> None:
         """Put without waiting/blocking.
@@ -183,6 +537,496 @@ class SimpleMultiprocessingQueue(multiprocessing.queues.SimpleQueue):  # type: i
         self.put(obj)
 
 
+_NATIVE_STRUCT_BYTE_ORDERS = ("@", "=")
+_STRUCT_BYTE_ORDERS = _NATIVE_STRUCT_BYTE_ORDERS + ("<", ">", "!")
+
+
+def _get_array_typecode_of_struct_format(struct_format: str) -> Tuple[Optional[str], bool]:
+    """Find the array typecode matching a struct format with only one type of field.
+
+    Returns:
+        the typecode (or None if the records cannot be represented as an array), and whether the bytes need to be swapped to native byte order
+    """
+    byte_order = "@"
+    if struct_format[:1] in _STRUCT_BYTE_ORDERS:
+        byte_order = struct_format[0]
+        struct_format = struct_format[1:]
+    field_codes = set(char for char in struct_format if not char.isdigit() and not char.isspace())
+    if len(field_codes) != 1:
+        return None, False
+    typecode = field_codes.pop()
+    if typecode not in array.typecodes:
+        return None, False
+    size_byte_order = "=" if byte_order == "@" else byte_order
+    if array.array(typecode).itemsize != struct.calcsize(size_byte_order + typecode):
+        return None, False
+    if byte_order in _NATIVE_STRUCT_BYTE_ORDERS:
+        return typecode, False
+    native_byte_order = "<" if sys.byteorder == "little" else ">"
+    return typecode, (">" if byte_order == "!" else byte_order) != native_byte_order
+
+
+class StructRecordQueue(SimpleMultiprocessingQueue):
+    """Multiprocessing safe queue of fixed-schema records packed with struct.
+
+    Each record is a tuple of values matching the struct format (e.g. '<qhd' for a timestamp, channel and value). Records can be put/retrieved individually like any other queue, but the intended use is to stream large numbers of them in bulk: put_many/put_packed send a whole buffer of consecutive records as one message, and get_buffer/get_array return a whole message of records without creating any per-record objects.
+
+    If the format has only one type of field (e.g. '<qqq' or '3d'), get_array converts the records to an array, and a single field of every record can be selected with a slice (e.g. values[2::3]).
+
+    Args:
+        struct_format: the format string for the struct module describing a single record
+    """
+
+    def __init__(self, struct_format: str) -> None:
+        super().__init__(serializer=StructSerializer(struct_format))
+        self._init_record_layout()
+
+    def __setstate__(self, state: Any) -> None:
+        super().__setstate__(state)
+        self._init_record_layout()
+
+    def _init_record_layout(self) -> None:
+        struct_format = self.get_struct_format()
+        self._record_size = struct.calcsize(struct_format)
+        self._array_typecode, self._is_byteswap_needed = _get_array_typecode_of_struct_format(struct_format)
+
+    def get_struct_format(self) -> str:
+        serializer: StructSerializer = self._serializer  # type: ignore[assignment]
+        return serializer.get_struct_format()
+
+    def get_record_size(self) -> int:
+        return self._record_size
+
+    def get_array_typecode(self) -> Optional[str]:
+        """Get the typecode of the arrays returned by get_array, or None if the format is not supported."""
+        return self._array_typecode
+
+    def put_packed(self, buffer: Union[bytes, bytearray, memoryview, array.array[Any]]) -> None:
+        """Put consecutive records that have already been packed.
+
+        This is the fastest way to put records, e.g. directly from an array that was filled with readings.
+
+        Args:
+            buffer: any object supporting the buffer protocol containing a whole number of records
+        """
+        view = memoryview(buffer)
+        num_bytes = view.nbytes
+        if num_bytes % self._record_size != 0:
+            raise ValueError(
+                f"The buffer must contain a whole number of records of {self._record_size} bytes, but it is {num_bytes} bytes"
+            )
+        if num_bytes == 0:
+            return
+        message = bytearray(1 + num_bytes)
+        message[0] = _BATCH_MESSAGE_HEADER[0]
+        message[1:] = view.cast("B")
+        self._send_message(message)
+
+    def get_buffer(self, block: bool = True, timeout: Optional[Union[float, int]] = None) -> memoryview:
+        """Get the next message of records without unpacking them.
+
+        Any records left over from a message partially consumed by get/get_many are returned first.
+
+        Args:
+            block: if False, raise queue.Empty immediately if no records are available
+            timeout: maximum number of seconds to wait if blocking. Waits indefinitely if None.
+
+        Returns:
+            a read-only view of one or more consecutive packed records
+        """
+        if self._unpacked_items:
+            records = list(self._unpacked_items)
+            self._unpacked_items.clear()
+            return memoryview(self._serializer.dumps_many(records))
+        if not block:
+            timeout = 0
+        message = self._receive_raw_message(timeout=timeout)
+        if message is None:
+            raise queue.Empty()
+        return memoryview(message)[1:]
+
+    def get_array(self, block: bool = True, timeout: Optional[Union[float, int]] = None) -> array.array[Any]:
+        """Get the next message of records as a flat array of their fields.
+
+        Args:
+            block: if False, raise queue.Empty immediately if no records are available
+            timeout: maximum number of seconds to wait if blocking. Waits indefinitely if None.
+        """
+        if self._array_typecode is None:
+            raise ValueError(
+                f"Records with the struct format '{self.get_struct_format()}' cannot be converted to an array, every field must be the same numeric type"
+            )
+        records = array.array(self._array_typecode)
+        records.frombytes(self.get_buffer(block=block, timeout=timeout))
+        if self._is_byteswap_needed:
+            records.byteswap()
+        return records
+
+
+class MultiprocessingPriorityQueue:
+    """Multiprocessing safe queue with a small fixed number of priority levels.
+
+    Each priority level is a separate SimpleMultiprocessingQueue, so putting an object and checking each level for an object are O(1). Objects are always retrieved from the highest priority level that has any available (0 is the highest priority), and in FIFO order within a level.
+
+    This is useful to prevent control commands from getting stuck behind large numbers of data messages.
+
+    Args:
+        num_priority_levels: the number of priority levels
+        serializer: the codec used to convert objects to bytes. Defaults to pickling
+    """
+
+    def __init__(self, num_priority_levels: int = 2, serializer: Optional[Serializer] = None) -> None:
+        self._queues = [SimpleMultiprocessingQueue(serializer=serializer) for _ in range(num_priority_levels)]
+        ctx = multiprocessing.get_context()
+        # pipes have no size, so keep track of the number of objects in each level separately
+        self._sizes = ctx.Array("q", num_priority_levels)
+
+    def get_num_priority_levels(self) -> int:
+        return len(self._queues)
+
+    def get_reader_connections(self) -> List[multiprocessing.connection.Connection]:
+        return [the_queue.get_reader_connection() for the_queue in self._queues]
+
+    def _change_size(self, priority: int, change: int) -> None:
+        with self._sizes.get_lock():
+            self._sizes[priority] += change
+
+    def put(self, obj: Any, priority: int = 0) -> None:
+        """Put an object into the queue.
+
+        Args:
+            obj: the object
+            priority: the priority level of the object, 0 being the highest
+        """
+        the_queue = self._queues[priority]
+        # increase the size first so it is never negative while a consumer has already retrieved the object
+        self._change_size(priority, 1)
+        try:
+            the_queue.put(obj)
+        except BaseException:
+            # nothing was put into the pipe if the object could not be serialized
+            self._change_size(priority, -1)
+            raise
+
+    def put_nowait(self, obj: Any, priority: int = 0) -> None:
+        """Put without waiting/blocking.
+
+        Putting into the pipe never blocks, so this is aliased to put
+        for compatibility with the regular multiprocessing.Queue
+        interface.
+        """
+        self.put(obj, priority=priority)
+
+    def get_nowait(self) -> Any:
+        """Get the highest priority object available or raise error if empty."""
+        for priority, the_queue in enumerate(self._queues):
+            try:
+                obj = the_queue.get_nowait()
+            except queue.Empty:
+                continue
+            self._change_size(priority, -1)
+            return obj
+        raise queue.Empty()
+
+    def get(self, block: bool = True, timeout: Optional[Union[float, int]] = None) -> Any:
+        """Get the highest priority object available, waiting for one to arrive if necessary.
+
+        Args:
+            block: if False, raise queue.Empty immediately if no object is available
+            timeout: maximum number of seconds to wait if blocking. Waits indefinitely if None.
+        """
+        deadline = None if timeout is None else perf_counter() + timeout
+        while True:
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                remaining_timeout = None if deadline is None else deadline - perf_counter()
+                if not block or (remaining_timeout is not None and remaining_timeout <= 0):
+                    raise
+            multiprocessing.connection.wait(self.get_reader_connections(), remaining_timeout)
+
+    def qsize(self) -> int:
+        with self._sizes.get_lock():
+            size: int = sum(self._sizes[:])
+            return size
+
+    def qsize_of_priority_level(self, priority: int) -> int:
+        with self._sizes.get_lock():
+            size: int = self._sizes[priority]
+            return size
+
+    def empty(self) -> bool:
+        return all(the_queue.empty() for the_queue in self._queues)
+
+
+_OVERFLOW_POLICIES = (
+    OVERFLOW_POLICY_BLOCK,
+    OVERFLOW_POLICY_DROP_NEWEST,
+    OVERFLOW_POLICY_DROP_OLDEST,
+    OVERFLOW_POLICY_KEEP_EVERY_NTH,
+)
+
+
+def _validate_bounds(maxsize: int, overflow_policy: str) -> None:
+    if maxsize <= 0:
+        raise ValueError(f"The maxsize of a bounded queue must be positive, not {maxsize}")
+    if overflow_policy not in _OVERFLOW_POLICIES:
+        raise UnrecognizedOverflowPolicyError(overflow_policy)
+
+
+def _is_overflow_replacing_oldest(overflow_policy: str, num_overflows: int, keep_every_nth: int) -> bool:
+    """Determine whether an object put into a full queue should replace the oldest object or be dropped.
+
+    Args:
+        overflow_policy: drop_newest, drop_oldest or keep_every_nth
+        num_overflows: the number of objects put while the queue was full, including this one
+        keep_every_nth: how often an object is kept with the keep_every_nth policy
+    """
+    if overflow_policy == OVERFLOW_POLICY_KEEP_EVERY_NTH:
+        return num_overflows % keep_every_nth == 0
+    return overflow_policy == OVERFLOW_POLICY_DROP_OLDEST
+
+
+class BoundedQueue(Queue):  # type: ignore[type-arg]
+    """Threading queue with a selectable policy for when it is full.
+
+    Policies:
+        block: the regular queue.Queue behavior
+        drop_newest: the object being put is discarded
+        drop_oldest: the oldest object in the queue is discarded to make room
+        keep_every_nth: every Nth object put while the queue is full replaces the oldest object, the rest are discarded. This keeps a stream (e.g. for a live display) updating at a reduced rate while the consumer is behind.
+
+    With all policies other than block, put never blocks or raises queue.Full.
+
+    Args:
+        maxsize: the maximum number of objects in the queue
+        overflow_policy: one of the OVERFLOW_POLICY constants
+        keep_every_nth: how often an object is kept with the keep_every_nth policy
+    """
+
+    def __init__(
+        self, maxsize: int, overflow_policy: str = OVERFLOW_POLICY_BLOCK, keep_every_nth: int = 10
+    ) -> None:
+        _validate_bounds(maxsize, overflow_policy)
+        super().__init__(maxsize=maxsize)
+        self._overflow_policy = overflow_policy
+        self._keep_every_nth = keep_every_nth
+        self._num_overflows = 0
+        self._num_dropped = 0
+
+    def get_overflow_policy(self) -> str:
+        return self._overflow_policy
+
+    def get_num_dropped(self) -> int:
+        with self.mutex:
+            return self._num_dropped
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[Union[float, int]] = None) -> None:
+        if self._overflow_policy == OVERFLOW_POLICY_BLOCK:
+            super().put(item, block=block, timeout=timeout)
+            return
+        with self.not_full:
+            if self._qsize() >= self.maxsize:
+                self._num_overflows += 1
+                self._num_dropped += 1
+                if not _is_overflow_replacing_oldest(
+                    self._overflow_policy, self._num_overflows, self._keep_every_nth
+                ):
+                    return
+                self._get()
+                # the discarded object will never be processed, so it no longer counts towards join
+                self.unfinished_tasks -= 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+
+class BoundedMultiprocessingQueue:
+    """Multiprocessing safe queue with a selectable policy for when it is full.
+
+    See BoundedQueue for a description of the overflow policies. The count of dropped objects is shared by all processes using the queue.
+
+    Args:
+        maxsize: the maximum number of objects in the queue
+        overflow_policy: one of the OVERFLOW_POLICY constants
+        keep_every_nth: how often an object is kept with the keep_every_nth policy
+        serializer: the codec used to convert objects to bytes. Defaults to pickling
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        overflow_policy: str = OVERFLOW_POLICY_BLOCK,
+        keep_every_nth: int = 10,
+        serializer: Optional[Serializer] = None,
+    ) -> None:
+        _validate_bounds(maxsize, overflow_policy)
+        self._maxsize = maxsize
+        self._overflow_policy = overflow_policy
+        self._keep_every_nth = keep_every_nth
+        self._queue = SimpleMultiprocessingQueue(serializer=serializer)
+        ctx = multiprocessing.get_context()
+        # the counters are only accessed while holding the condition's lock
+        self._not_full = ctx.Condition(ctx.Lock())
+        self._size = ctx.RawValue("q", 0)
+        self._num_overflows = ctx.RawValue("q", 0)
+        self._num_dropped = ctx.RawValue("q", 0)
+
+    def get_overflow_policy(self) -> str:
+        return self._overflow_policy
+
+    def get_maxsize(self) -> int:
+        return self._maxsize
+
+    def get_reader_connections(self) -> List[multiprocessing.connection.Connection]:
+        return [self._queue.get_reader_connection()]
+
+    def get_num_dropped(self) -> int:
+        with self._not_full:
+            num_dropped: int = self._num_dropped.value
+            return num_dropped
+
+    def qsize(self) -> int:
+        with self._not_full:
+            size: int = self._size.value
+            return size
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+    def _block_until_not_full(self, block: bool, timeout: Optional[Union[float, int]]) -> None:
+        with self._not_full:
+            if not self._not_full.wait_for(
+                lambda: self._size.value < self._maxsize, timeout=timeout if block else 0
+            ):
+                raise queue.Full()
+            self._size.value += 1
+
+    def _discard_oldest(self) -> None:
+        """Remove the oldest object to make space for a new one.
+
+        The space of the discarded object is transferred to the new one, so the size does not change.
+        """
+        while True:
+            try:
+                # objects counted in the size may still be in the process of being put by another producer, so wait briefly for them
+                self._queue.get(timeout=INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE)
+                return
+            except queue.Empty:
+                with self._not_full:
+                    if self._size.value < self._maxsize:
+                        # a consumer retrieved the oldest object first, so nothing needs to be dropped after all
+                        self._size.value += 1
+                        self._num_dropped.value -= 1
+                        return
+
+    def put(self, obj: Any, block: bool = True, timeout: Optional[Union[float, int]] = None) -> None:
+        if self._overflow_policy == OVERFLOW_POLICY_BLOCK:
+            self._block_until_not_full(block, timeout)
+            self._queue.put(obj)
+            return
+        with self._not_full:
+            is_full = self._size.value >= self._maxsize
+            if is_full:
+                self._num_overflows.value += 1
+                self._num_dropped.value += 1
+                if not _is_overflow_replacing_oldest(
+                    self._overflow_policy, self._num_overflows.value, self._keep_every_nth
+                ):
+                    return
+            else:
+                self._size.value += 1
+        if is_full:
+            self._discard_oldest()
+        self._queue.put(obj)
+
+    def put_nowait(self, obj: Any) -> None:
+        self.put(obj, block=False)
+
+    def _release_space(self) -> None:
+        with self._not_full:
+            self._size.value -= 1
+            self._not_full.notify()
+
+    def get(self, block: bool = True, timeout: Optional[Union[float, int]] = None) -> Any:
+        obj = self._queue.get(block=block, timeout=timeout)
+        self._release_space()
+        return obj
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+
+class AsyncQueueAdapter:
+    """Allow awaiting objects from a SimpleMultiprocessingQueue in asyncio.
+
+    The reading end of the queue's pipe is registered with the event loop using loop.add_reader only while a coroutine is waiting in get, so no helper thread or polling is needed. This requires an event loop that supports add_reader with pipes, which excludes all event loops on Windows.
+
+    The adapter must only be used from the thread running the event loop. Other processes (or threads) can still put objects into the wrapped queue directly.
+
+    Args:
+        the_queue: the queue to retrieve objects from
+    """
+
+    def __init__(self, the_queue: SimpleMultiprocessingQueue) -> None:
+        self._queue = the_queue
+        self._waiters: List[asyncio.Future[None]] = list()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get_wrapped_queue(self) -> SimpleMultiprocessingQueue:
+        return self._queue
+
+    def _on_readable(self) -> None:
+        # every waiter checks the queue again once woken up, and the reader is registered again if any are still waiting
+        self._remove_reader()
+        waiters = self._waiters
+        self._waiters = list()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _remove_reader(self) -> None:
+        loop = self._loop
+        if loop is None:
+            raise NotImplementedError("The reader should always be registered while a coroutine is waiting.")
+        loop.remove_reader(self._queue.get_reader_connection().fileno())
+        self._loop = None
+
+    async def _wait_until_readable(self) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        if self._loop is None:
+            loop.add_reader(self._queue.get_reader_connection().fileno(), self._on_readable)
+            self._loop = loop
+        try:
+            await waiter
+        finally:
+            if waiter in self._waiters:
+                # cancelled before data arrived
+                self._waiters.remove(waiter)
+                if not self._waiters:
+                    self._remove_reader()
+
+    async def get(self) -> Any:
+        """Wait for the next object from the queue.
+
+        Use asyncio.wait_for to add a timeout.
+        """
+        while True:
+            try:
+                return self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            await self._wait_until_readable()
+
+    def get_nowait(self) -> Any:
+        return self._queue.get_nowait()
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+
 class TestingQueue(deque):  # type: ignore[type-arg]
     """Queue-like Deque subclass.
 
@@ -212,6 +1056,9 @@ class TestingQueue(deque):  # type: ignore[type-arg]
     def put_nowait(self, item: Any) -> None:
         self.append(item)
 
+    def put_many(self, items: Iterable[Any]) -> None:
+        self.extend(items)
+
     def get(self, block: bool = False, timeout: int = 0) -> Any:
         # pylint: disable=unused-argument  # Tanner (8/23/21): This is intentional to make this compatible with code expecting real queues
         return self.get_nowait()
@@ -221,8 +1068,295 @@ class TestingQueue(deque):  # type: ignore[type-arg]
             raise Empty()
         return self.popleft()
 
+    def get_many(self, max_items: Optional[int] = None) -> List[Any]:
+        num_items = self.qsize() if max_items is None else min(self.qsize(), max_items)
+        return [self.popleft() for _ in range(num_items)]
+
     def qsize(self) -> int:
         return super().__len__()
 
     def empty(self) -> bool:
         return self.qsize() == 0
+
+
+def _compute_percentiles(
+    sorted_values: Sequence[Union[int, float]], percentiles: Iterable[int]
+) -> Dict[str, Union[int, float]]:
+    """Calculate nearest-rank percentiles of values already in ascending order."""
+    num_values = len(sorted_values)
+    return {
+        f"p{percentile}": sorted_values[max(-(-percentile * num_values // 100) - 1, 0)]
+        for percentile in percentiles
+    }
+
+
+class InstrumentedQueue:
+    """Wrap a queue to measure how much traffic it handles and how long objects wait in it.
+
+    Works with threading queues, multiprocessing queues, SimpleMultiprocessingQueue, SharedMemoryQueue and TestingQueue. Objects are stamped with time.perf_counter_ns when put into the queue (so the wrapper must be used on both ends), and the time until they are retrieved is recorded on get. The clock used by perf_counter_ns is shared by all processes on Windows, Linux and macOS, so this also works across processes.
+
+    Metrics are kept separately in each process (they start at zero when the wrapper is sent to another process), so for a multiprocessing queue the producer's snapshot contains the puts and the consumer's snapshot contains the gets and residence times.
+
+    The depth of the queue is sampled after every put using qsize if the wrapped queue supports it, otherwise it is estimated from the puts and gets made through this wrapper in the current process.
+
+    Args:
+        the_queue: the queue to wrap
+        max_residence_time_samples: the maximum number of residence times kept between snapshots. The oldest are discarded once this is reached.
+    """
+
+    def __init__(
+        self,
+        the_queue: Union[UnionOfThreadingAndMultiprocessingQueue, SimpleMultiprocessingQueue, TestingQueue],
+        max_residence_time_samples: int = 100000,
+    ) -> None:
+        self._queue = the_queue
+        self._max_residence_time_samples = max_residence_time_samples
+        self._reset_metrics()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"queue": self._queue, "max_residence_time_samples": self._max_residence_time_samples}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._queue = state["queue"]
+        self._max_residence_time_samples = state["max_residence_time_samples"]
+        self._reset_metrics()
+
+    def _reset_metrics(self) -> None:
+        self._start_timepoint_of_measurements = time.perf_counter_ns()
+        self._num_puts = 0
+        self._num_gets = 0
+        self._high_water_depth = 0
+        self._residence_times_ns: Deque[int] = deque(maxlen=self._max_residence_time_samples)
+
+    def get_wrapped_queue(
+        self,
+    ) -> Union[UnionOfThreadingAndMultiprocessingQueue, SimpleMultiprocessingQueue, TestingQueue]:
+        return self._queue
+
+    def _get_depth(self) -> int:
+        try:
+            depth: int = self._queue.qsize()  # type: ignore[union-attr]
+        except (AttributeError, NotImplementedError):
+            # SimpleMultiprocessingQueue has no qsize, and multiprocessing queues do not support it on macOS
+            depth = self._num_puts - self._num_gets
+        return depth
+
+    def _record_put(self) -> None:
+        self._num_puts += 1
+        self._high_water_depth = max(self._high_water_depth, self._get_depth())
+
+    def _unstamp(self, stamped_item: Tuple[int, Any]) -> Any:
+        put_timepoint, item = stamped_item
+        self._num_gets += 1
+        self._residence_times_ns.append(time.perf_counter_ns() - put_timepoint)
+        return item
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[Union[float, int]] = None) -> None:
+        stamped_item = (time.perf_counter_ns(), item)
+        if block and timeout is None:
+            # SimpleMultiprocessingQueue.put does not accept any other arguments
+            self._queue.put(stamped_item)
+        else:
+            self._queue.put(stamped_item, block, timeout)  # type: ignore[call-arg,arg-type]
+        self._record_put()
+
+    def put_nowait(self, item: Any) -> None:
+        self._queue.put_nowait((time.perf_counter_ns(), item))
+        self._record_put()
+
+    def get(self, block: bool = True, timeout: Optional[Union[float, int]] = None) -> Any:
+        return self._unstamp(self._queue.get(block, timeout))  # type: ignore[arg-type]
+
+    def get_nowait(self) -> Any:
+        return self._unstamp(self._queue.get_nowait())
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()  # type: ignore[union-attr]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the metrics since the previous snapshot and start a new measurement period."""
+        elapsed_seconds = (time.perf_counter_ns() - self._start_timepoint_of_measurements) / 10**9
+        out_dict: Dict[str, Any] = {}
+        out_dict["start_timepoint_of_measurements"] = self._start_timepoint_of_measurements
+        out_dict["num_puts"] = self._num_puts
+        out_dict["num_gets"] = self._num_gets
+        out_dict["puts_per_second"] = self._num_puts / elapsed_seconds
+        out_dict["gets_per_second"] = self._num_gets / elapsed_seconds
+        out_dict["high_water_depth"] = self._high_water_depth
+        if len(self._residence_times_ns) > 1:
+            sorted_residence_times = sorted(self._residence_times_ns)
+            residence_time_metrics = create_metrics_stats(sorted_residence_times)
+            residence_time_metrics.update(_compute_percentiles(sorted_residence_times, (50, 90, 99)))
+            out_dict["residence_time_ns"] = residence_time_metrics
+        self._reset_metrics()
+        return out_dict
+
+
+_SPILL_RECORD_LENGTH = struct.Struct("<I")
+
+
+class _SpillSegment:
+    """A memory-mapped file that serialized objects are appended to and then read back from in order."""
+
+    def __init__(self, folder: str, size_bytes: int) -> None:
+        file_descriptor, self._file_path = tempfile.mkstemp(
+            prefix="spill_segment_", suffix=".bin", dir=folder
+        )
+        try:
+            os.ftruncate(file_descriptor, size_bytes)
+            self._mmap = mmap.mmap(file_descriptor, size_bytes)
+        finally:
+            os.close(file_descriptor)
+        self._size_bytes = size_bytes
+        self._write_position = 0
+        self._read_position = 0
+
+    def get_file_path(self) -> str:
+        return self._file_path
+
+    def get_size_bytes(self) -> int:
+        return self._size_bytes
+
+    def has_space_for(self, record_size: int) -> bool:
+        return self._write_position + _SPILL_RECORD_LENGTH.size + record_size <= self._size_bytes
+
+    def is_fully_read(self) -> bool:
+        return self._read_position == self._write_position
+
+    def append(self, record: Union[bytes, memoryview]) -> None:
+        record_size = len(record)
+        _SPILL_RECORD_LENGTH.pack_into(self._mmap, self._write_position, record_size)
+        record_start = self._write_position + _SPILL_RECORD_LENGTH.size
+        record_end = record_start + record_size
+        self._mmap[record_start:record_end] = record
+        self._write_position = record_end
+
+    def read_next(self) -> bytes:
+        record_size: int = _SPILL_RECORD_LENGTH.unpack_from(self._mmap, self._read_position)[0]
+        record_start = self._read_position + _SPILL_RECORD_LENGTH.size
+        record_end = record_start + record_size
+        self._read_position = record_end
+        return self._mmap[record_start:record_end]
+
+    def delete(self) -> None:
+        self._mmap.close()
+        os.remove(self._file_path)
+
+
+class DiskSpillingQueue(Queue):  # type: ignore[type-arg]
+    """Threading queue that spills objects to disk instead of growing without limit in memory.
+
+    Objects are kept in memory until max_items_in_memory is reached. After that, objects are serialized and appended to memory-mapped segment files until the consumer has caught up on everything that was spilled, so objects are always retrieved in FIFO order. Each segment file is deleted as soon as all the objects in it have been retrieved.
+
+    put never blocks. Call close when finished with the queue to delete any segment files still on disk.
+
+    Args:
+        max_items_in_memory: the number of objects kept in memory before spilling to disk
+        spill_folder: where to create the segment files. Defaults to the system's temporary folder
+        segment_size_bytes: the size of each segment file. An object larger than this is written to a segment of its own
+        serializer: the codec used to write objects to disk. Defaults to pickling with the highest protocol
+        max_read_latency_samples: the number of most recent disk reads used for the read latency statistics
+    """
+
+    def __init__(
+        self,
+        max_items_in_memory: int = 10000,
+        spill_folder: Optional[str] = None,
+        segment_size_bytes: int = 2**26,
+        serializer: Optional[Serializer] = None,
+        max_read_latency_samples: int = 100000,
+    ) -> None:
+        if max_items_in_memory <= 0:
+            raise ValueError(f"max_items_in_memory must be positive, not {max_items_in_memory}")
+        self._max_items_in_memory = max_items_in_memory
+        self._spill_folder = tempfile.gettempdir() if spill_folder is None else spill_folder
+        self._segment_size_bytes = segment_size_bytes
+        self._serializer = HIGHEST_PROTOCOL_PICKLE_SERIALIZER if serializer is None else serializer
+        self._read_latencies_ns: Deque[int] = deque(maxlen=max_read_latency_samples)
+        self._num_spilled = 0
+        self._spilled_bytes = 0
+        self._num_segments_created = 0
+        self._num_segments_reclaimed = 0
+        super().__init__()
+
+    def _init(self, maxsize: int) -> None:
+        super()._init(maxsize)
+        self._segments: Deque[_SpillSegment] = deque()
+        self._num_items_on_disk = 0
+
+    def _qsize(self) -> int:
+        return len(self.queue) + self._num_items_on_disk
+
+    def _put(self, item: Any) -> None:
+        # once anything has been spilled, everything else must go to disk behind it to preserve the order
+        if self._num_items_on_disk == 0 and len(self.queue) < self._max_items_in_memory:
+            self.queue.append(item)
+            return
+        record = self._serializer.dumps(item)
+        record_size = len(record)
+        if not self._segments or not self._segments[-1].has_space_for(record_size):
+            self._segments.append(
+                _SpillSegment(
+                    self._spill_folder,
+                    max(self._segment_size_bytes, _SPILL_RECORD_LENGTH.size + record_size),
+                )
+            )
+            self._num_segments_created += 1
+        self._segments[-1].append(record)
+        self._num_items_on_disk += 1
+        self._num_spilled += 1
+        self._spilled_bytes += record_size
+
+    def _get(self) -> Any:
+        if self.queue:
+            return self.queue.popleft()
+        start_timepoint = time.perf_counter_ns()
+        segment = self._segments[0]
+        item = self._serializer.loads(segment.read_next())
+        self._read_latencies_ns.append(time.perf_counter_ns() - start_timepoint)
+        self._num_items_on_disk -= 1
+        if segment.is_fully_read():
+            self._segments.popleft().delete()
+            self._num_segments_reclaimed += 1
+        return item
+
+    def get_max_items_in_memory(self) -> int:
+        return self._max_items_in_memory
+
+    def get_spill_folder(self) -> str:
+        return self._spill_folder
+
+    def get_segment_file_paths(self) -> List[str]:
+        with self.mutex:
+            return [segment.get_file_path() for segment in self._segments]
+
+    def get_spill_stats(self) -> Dict[str, Any]:
+        """Get the amount of data spilled to disk and how long reading it back has taken.
+
+        The read latency (including deserialization) is included once there is more than one sample.
+        """
+        with self.mutex:
+            out_dict: Dict[str, Any] = {
+                "num_spilled": self._num_spilled,
+                "spilled_bytes": self._spilled_bytes,
+                "num_items_on_disk": self._num_items_on_disk,
+                "disk_bytes_in_use": sum(segment.get_size_bytes() for segment in self._segments),
+                "num_segments_created": self._num_segments_created,
+                "num_segments_reclaimed": self._num_segments_reclaimed,
+            }
+            if len(self._read_latencies_ns) > 1:
+                sorted_read_latencies = sorted(self._read_latencies_ns)
+                read_latency_metrics = create_metrics_stats(sorted_read_latencies)
+                read_latency_metrics.update(_compute_percentiles(sorted_read_latencies, (50, 90, 99)))
+                out_dict["disk_read_latency_ns"] = read_latency_metrics
+        return out_dict
+
+    def close(self) -> None:
+        """Delete all segment files, discarding any objects still on disk."""
+        with self.mutex:
+            while self._segments:
+                self._segments.popleft().delete()
+            self._num_items_on_disk = 0
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""Codecs for converting objects to bytes when sending them between processes.
+
+Queues accepting a serializer encode each message with the codec they were created with, so both ends of the queue always agree. Pickling handles almost anything, while the faster codecs trade generality for speed:
+
+- PickleSerializer: any picklable object. Uses the same pickler as multiprocessing, so connections, locks, etc. can still be sent.
+- MarshalSerializer: only plain data (None, bools, numbers, strings, bytes, and tuples/lists/sets/dicts of them).
+- StructSerializer: only tuples matching a fixed struct format.
+
+Any of these can be wrapped in a CompressingSerializer to zlib compress large messages.
+
+This module should not need to import from any other modules in
+stdlib_utils.
+"""
+from __future__ import annotations
+
+import marshal
+from multiprocessing.reduction import ForkingPickler as _ForkingPickler
+import pickle
+from struct import Struct
+from time import thread_time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+import zlib
+
+
+class Serializer:
+    """Base class for the codecs used by the multiprocessing queues.
+
+    Subclasses must implement dumps and loads. A batch of objects is sent as a single message encoded by dumps_many, which by default serializes the batch as a list.
+    """
+
+    def dumps(self, obj: Any) -> Union[bytes, memoryview]:
+        raise NotImplementedError("Serializers must implement dumps.")
+
+    def loads(self, data: Union[bytes, memoryview]) -> Any:
+        raise NotImplementedError("Serializers must implement loads.")
+
+    def dumps_many(self, objs: List[Any]) -> Union[bytes, memoryview]:
+        return self.dumps(objs)
+
+    def loads_many(self, data: Union[bytes, memoryview]) -> List[Any]:
+        objs: List[Any] = self.loads(data)
+        return objs
+
+    def get_name(self) -> str:
+        """Get a short description of the codec, e.g. for benchmark reports."""
+        return type(self).__name__
+
+    def can_serialize_any_picklable_object(self) -> bool:
+        """Whether objects such as exceptions can be sent with this codec."""
+        return False
+
+
+class PickleSerializer(Serializer):
+    """Pickle objects using the same pickler as multiprocessing.
+
+    Args:
+        protocol: the pickle protocol to use. Defaults to pickle.DEFAULT_PROTOCOL, pass pickle.HIGHEST_PROTOCOL for faster (de)serialization of large objects
+    """
+
+    def __init__(self, protocol: Optional[int] = None) -> None:
+        self._protocol = pickle.DEFAULT_PROTOCOL if protocol is None else protocol
+
+    def get_protocol(self) -> int:
+        return self._protocol
+
+    def dumps(self, obj: Any) -> Union[bytes, memoryview]:
+        return _ForkingPickler.dumps(obj, self._protocol)
+
+    def loads(self, data: Union[bytes, memoryview]) -> Any:
+        return _ForkingPickler.loads(data)
+
+    def get_name(self) -> str:
+        return f"pickle (protocol {self._protocol})"
+
+    def can_serialize_any_picklable_object(self) -> bool:
+        return True
+
+
+class MarshalSerializer(Serializer):
+    """Serialize plain data with marshal.
+
+    This is typically much faster than pickling dictionaries of primitive values, but raises a ValueError for anything else (e.g. class instances or exceptions).
+    """
+
+    def dumps(self, obj: Any) -> Union[bytes, memoryview]:
+        return marshal.dumps(obj)
+
+    def loads(self, data: Union[bytes, memoryview]) -> Any:
+        return marshal.loads(data)
+
+    def get_name(self) -> str:
+        return "marshal"
+
+
+class StructSerializer(Serializer):
+    """Pack tuples with a fixed schema.
+
+    Objects must be tuples of values matching the format. A batch is packed as consecutive records with no additional framing.
+
+    Args:
+        struct_format: the format string for the struct module (e.g. '<qd' for a timestamp and a reading)
+    """
+
+    def __init__(self, struct_format: str) -> None:
+        self._struct = Struct(struct_format)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Struct objects themselves cannot be pickled, so recreate it from the format in the other process
+        return (type(self), (self._struct.format,))
+
+    def get_struct_format(self) -> str:
+        return self._struct.format
+
+    def dumps(self, obj: Tuple[Any, ...]) -> Union[bytes, memoryview]:
+        return self._struct.pack(*obj)
+
+    def loads(self, data: Union[bytes, memoryview]) -> Tuple[Any, ...]:
+        return self._struct.unpack(data)
+
+    def dumps_many(self, objs: List[Tuple[Any, ...]]) -> Union[bytes, memoryview]:
+        pack = self._struct.pack
+        return b"".join([pack(*obj) for obj in objs])
+
+    def loads_many(self, data: Union[bytes, memoryview]) -> List[Tuple[Any, ...]]:
+        return list(self._struct.iter_unpack(data))
+
+    def get_name(self) -> str:
+        return f"struct ({self._struct.format})"
+
+
+_UNCOMPRESSED_HEADER = b"\x00"
+_ZLIB_COMPRESSED_HEADER = b"\x01"
+
+
+class CompressingSerializer(Serializer):
+    """Compress messages above a size threshold with zlib.
+
+    Smaller messages are sent uncompressed since compressing them would cost more time than it saves. A one byte header marks whether each message was compressed, so decompression on the receiving end is transparent.
+
+    Counters of the bytes before/after compression and the CPU time spent are kept separately in each process (they start at zero when the serializer is sent to another process along with its queue) and can be retrieved with get_stats.
+
+    Args:
+        serializer: the codec used to convert objects to bytes before compression. Defaults to pickling
+        threshold_bytes: messages at least this large are compressed
+        level: the zlib compression level, from 1 (fastest) to 9 (smallest)
+    """
+
+    def __init__(
+        self, serializer: Optional[Serializer] = None, threshold_bytes: int = 2**16, level: int = 6
+    ) -> None:
+        self._serializer = DEFAULT_PICKLE_SERIALIZER if serializer is None else serializer
+        self._threshold_bytes = threshold_bytes
+        self._level = level
+        self._reset_stats()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            "serializer": self._serializer,
+            "threshold_bytes": self._threshold_bytes,
+            "level": self._level,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._serializer = state["serializer"]
+        self._threshold_bytes = state["threshold_bytes"]
+        self._level = state["level"]
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self._num_compressed = 0
+        self._num_decompressed = 0
+        self._uncompressed_bytes = 0
+        self._compressed_bytes = 0
+        self._compression_cpu_seconds = 0.0
+        self._decompression_cpu_seconds = 0.0
+
+    def get_serializer(self) -> Serializer:
+        return self._serializer
+
+    def get_threshold_bytes(self) -> int:
+        return self._threshold_bytes
+
+    def get_level(self) -> int:
+        return self._level
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """Get the compression counters for this process.
+
+        The compression ratio is the total size of the compressed messages before compression divided by their size after (so higher is better), or 0 if nothing has been compressed yet.
+        """
+        compression_ratio = self._uncompressed_bytes / self._compressed_bytes if self._compressed_bytes else 0
+        return {
+            "num_compressed": self._num_compressed,
+            "num_decompressed": self._num_decompressed,
+            "uncompressed_bytes": self._uncompressed_bytes,
+            "compressed_bytes": self._compressed_bytes,
+            "compression_ratio": compression_ratio,
+            "compression_cpu_seconds": self._compression_cpu_seconds,
+            "decompression_cpu_seconds": self._decompression_cpu_seconds,
+        }
+
+    def _compress(self, data: Union[bytes, memoryview]) -> bytes:
+        if len(data) < self._threshold_bytes:
+            return _UNCOMPRESSED_HEADER + data
+        start = thread_time()
+        compressed = zlib.compress(data, self._level)
+        self._compression_cpu_seconds += thread_time() - start
+        self._num_compressed += 1
+        self._uncompressed_bytes += len(data)
+        self._compressed_bytes += len(compressed)
+        return _ZLIB_COMPRESSED_HEADER + compressed
+
+    def _decompress(self, data: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
+        data = memoryview(data)
+        if data[:1] == _UNCOMPRESSED_HEADER:
+            return data[1:]
+        start = thread_time()
+        decompressed = zlib.decompress(data[1:])
+        self._decompression_cpu_seconds += thread_time() - start
+        self._num_decompressed += 1
+        return decompressed
+
+    def dumps(self, obj: Any) -> Union[bytes, memoryview]:
+        return self._compress(self._serializer.dumps(obj))
+
+    def loads(self, data: Union[bytes, memoryview]) -> Any:
+        return self._serializer.loads(self._decompress(data))
+
+    def dumps_many(self, objs: List[Any]) -> Union[bytes, memoryview]:
+        return self._compress(self._serializer.dumps_many(objs))
+
+    def loads_many(self, data: Union[bytes, memoryview]) -> List[Any]:
+        return self._serializer.loads_many(self._decompress(data))
+
+    def get_name(self) -> str:
+        return f"{self._serializer.get_name()} + zlib (level {self._level}, threshold {self._threshold_bytes} bytes)"
+
+    def can_serialize_any_picklable_object(self) -> bool:
+        return self._serializer.can_serialize_any_picklable_object()
+
+
+DEFAULT_PICKLE_SERIALIZER = PickleSerializer()
+HIGHEST_PROTOCOL_PICKLE_SERIALIZER = PickleSerializer(protocol=pickle.HIGHEST_PROTOCOL)
+MARSHAL_SERIALIZER = MarshalSerializer()
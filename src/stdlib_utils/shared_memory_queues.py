@@ -0,0 +1,726 @@
+# -*- coding: utf-8 -*-
+"""Queues backed by shared memory for passing data between processes.
+
+These avoid the pickling and copying through a pipe that
+multiprocessing queues perform for every object. They are restricted to
+bytes-like payloads or to objects with a known maximum serialized size.
+
+This module should only import from constants, exceptions and
+serializers in stdlib_utils.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+import multiprocessing
+import queue
+import struct
+import time
+from time import perf_counter
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Union
+
+from .constants import INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE
+from .constants import SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
+from .exceptions import PayloadTooLargeForQueueError
+from .exceptions import SubscriberOverrunError
+from .exceptions import TooManySubscribersError
+from .serializers import CompressingSerializer
+from .serializers import DEFAULT_PICKLE_SERIALIZER
+from .serializers import Serializer
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: no cover # multiprocessing.shared_memory was added in Python 3.8
+    shared_memory = None  # type: ignore[assignment]
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+_COUNTER = struct.Struct("<Q")
+_RECORD_LENGTH = struct.Struct("<I")
+_RECORD_ALIGNMENT = 8
+_RECORD_HEADER_SIZE = _RECORD_ALIGNMENT  # the length is padded so that payloads start on an aligned boundary
+_WRAP_MARKER = 0xFFFFFFFF
+
+# the producer and consumer counters are kept on separate cache lines so the two processes do not contend for them
+_WRITE_POSITION_OFFSET = 0
+_NUM_PUT_OFFSET = 8
+_READ_POSITION_OFFSET = 64
+_NUM_GOT_OFFSET = 72
+_RING_BUFFER_HEADER_SIZE = 128
+
+
+def _align(num_bytes: int) -> int:
+    return -(-num_bytes // _RECORD_ALIGNMENT) * _RECORD_ALIGNMENT
+
+
+def _get_buffer(shared_memory_block: Any) -> memoryview:
+    # the type stubs for SharedMemory.buf differ between Python versions
+    buf: memoryview = shared_memory_block.buf
+    return buf
+
+
+def _wait_until(
+    is_ready: Callable[[], bool],
+    timeout_seconds: Optional[Union[float, int]],
+) -> bool:
+    """Sleep with an exponential backoff until is_ready() or the timeout.
+
+    There is no cross-process notification mechanism that does not
+    require a system call on every put, so the blocking versions of the
+    shared memory queue methods poll.
+    """
+    deadline = None if timeout_seconds is None else perf_counter() + timeout_seconds
+    sleep_seconds = INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE
+    while not is_ready():
+        if deadline is not None:
+            remaining_seconds = deadline - perf_counter()
+            if remaining_seconds <= 0:
+                return False
+            sleep_seconds = min(sleep_seconds, remaining_seconds)
+        time.sleep(sleep_seconds)
+        sleep_seconds = min(sleep_seconds * 2, SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE)
+    return True
+
+
+class SharedMemoryRingBuffer:
+    """Single-producer/single-consumer queue of bytes in shared memory.
+
+    Each payload is written once into a ring buffer in a shared memory block and is never split across the end of the buffer, so the consumer can read it in place with get_view_nowait. The producer and consumer each own one position counter, so no locks are needed as long as there is only ever one process/thread putting and one getting.
+
+    The process that creates the ring buffer owns the shared memory block and should call unlink once all processes are finished with it. Other processes receive it by passing the instance as an argument to a Process (or InfiniteProcess) and should call close when finished.
+
+    Args:
+        capacity_bytes: size of the data region. Each payload uses its length rounded up to a multiple of 8 plus an 8 byte header.
+    """
+
+    def __init__(self, capacity_bytes: int = 2**20) -> None:
+        if shared_memory is None:  # pragma: no cover
+            raise NotImplementedError("SharedMemoryRingBuffer requires Python 3.8 or later")
+        self._capacity_bytes = _align(capacity_bytes)
+        self._shared_memory = shared_memory.SharedMemory(
+            create=True, size=_RING_BUFFER_HEADER_SIZE + self._capacity_bytes
+        )
+        self._buf: memoryview = _get_buffer(self._shared_memory)
+        self._buf[:_RING_BUFFER_HEADER_SIZE] = bytes(_RING_BUFFER_HEADER_SIZE)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"name": self._shared_memory.name, "capacity_bytes": self._capacity_bytes}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._capacity_bytes = state["capacity_bytes"]
+        self._shared_memory = shared_memory.SharedMemory(name=state["name"])
+        self._buf = _get_buffer(self._shared_memory)
+
+    def _read_counter(self, offset: int) -> int:
+        value: int = _COUNTER.unpack_from(self._buf, offset)[0]
+        return value
+
+    def _write_counter(self, offset: int, value: int) -> None:
+        _COUNTER.pack_into(self._buf, offset, value)
+
+    def get_capacity_bytes(self) -> int:
+        return self._capacity_bytes
+
+    def get_name(self) -> str:
+        return self._shared_memory.name
+
+    def close(self) -> None:
+        """Detach from the shared memory block in this process."""
+        del self._buf
+        self._shared_memory.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory block.
+
+        Should only be called once, by the process that created the ring
+        buffer, after all processes have closed it.
+        """
+        self.close()
+        self._shared_memory.unlink()
+
+    def qsize(self) -> int:
+        return self._read_counter(_NUM_PUT_OFFSET) - self._read_counter(_NUM_GOT_OFFSET)
+
+    def empty(self) -> bool:
+        return self._read_counter(_WRITE_POSITION_OFFSET) == self._read_counter(_READ_POSITION_OFFSET)
+
+    def _has_space_for(self, record_size: int) -> bool:
+        write_position = self._read_counter(_WRITE_POSITION_OFFSET)
+        bytes_until_end = self._capacity_bytes - write_position % self._capacity_bytes
+        if record_size > bytes_until_end:
+            record_size += bytes_until_end  # the rest of the buffer will be skipped
+        return (
+            write_position + record_size - self._read_counter(_READ_POSITION_OFFSET) <= self._capacity_bytes
+        )
+
+    def _get_record_size(self, payload_size: int) -> int:
+        record_size = _align(_RECORD_HEADER_SIZE + payload_size)
+        if record_size > self._capacity_bytes:
+            raise PayloadTooLargeForQueueError(
+                f"A payload of {payload_size} bytes cannot fit in a ring buffer with a capacity of {self._capacity_bytes} bytes"
+            )
+        return record_size
+
+    def put_nowait(self, data: BytesLike) -> None:
+        """Copy the payload into the ring buffer or raise queue.Full."""
+        payload = memoryview(data).cast("B")
+        payload_size = payload.nbytes
+        record_size = self._get_record_size(payload_size)
+        if not self._has_space_for(record_size):
+            raise queue.Full()
+        write_position = self._read_counter(_WRITE_POSITION_OFFSET)
+        offset = write_position % self._capacity_bytes
+        bytes_until_end = self._capacity_bytes - offset
+        if record_size > bytes_until_end:
+            _RECORD_LENGTH.pack_into(self._buf, _RING_BUFFER_HEADER_SIZE + offset, _WRAP_MARKER)
+            write_position += bytes_until_end
+            offset = 0
+        record_start = _RING_BUFFER_HEADER_SIZE + offset
+        _RECORD_LENGTH.pack_into(self._buf, record_start, payload_size)
+        payload_start = record_start + _RECORD_HEADER_SIZE
+        payload_end = payload_start + payload_size
+        self._buf[payload_start:payload_end] = payload
+        self._write_counter(_NUM_PUT_OFFSET, self._read_counter(_NUM_PUT_OFFSET) + 1)
+        # publishing the new write position must happen last so the consumer never sees a partially written payload
+        self._write_counter(_WRITE_POSITION_OFFSET, write_position + record_size)
+
+    def put(self, data: BytesLike, block: bool = True, timeout: Optional[Union[float, int]] = None) -> None:
+        """Put the payload, waiting for space if the ring buffer is full."""
+        if block:
+            record_size = self._get_record_size(memoryview(data).nbytes)
+            _wait_until(lambda: self._has_space_for(record_size), timeout)
+        self.put_nowait(data)
+
+    @contextmanager
+    def get_view_nowait(self) -> Iterator[memoryview]:
+        """Provide a read-only view of the next payload without copying it.
+
+        The payload is only removed from the ring buffer when the context exits, so the view must not be used after that.
+
+        Raises:
+            queue.Empty: if there is nothing in the ring buffer
+        """
+        read_position = self._read_counter(_READ_POSITION_OFFSET)
+        if read_position == self._read_counter(_WRITE_POSITION_OFFSET):
+            raise queue.Empty()
+        offset = read_position % self._capacity_bytes
+        payload_size: int = _RECORD_LENGTH.unpack_from(self._buf, _RING_BUFFER_HEADER_SIZE + offset)[0]
+        if payload_size == _WRAP_MARKER:
+            read_position += self._capacity_bytes - offset
+            offset = 0
+            payload_size = _RECORD_LENGTH.unpack_from(self._buf, _RING_BUFFER_HEADER_SIZE)[0]
+        payload_start = _RING_BUFFER_HEADER_SIZE + offset + _RECORD_HEADER_SIZE
+        payload_end = payload_start + payload_size
+        view = self._buf[payload_start:payload_end].toreadonly()
+        try:
+            yield view
+        finally:
+            view.release()
+            self._write_counter(_NUM_GOT_OFFSET, self._read_counter(_NUM_GOT_OFFSET) + 1)
+            self._write_counter(
+                _READ_POSITION_OFFSET, read_position + _align(_RECORD_HEADER_SIZE + payload_size)
+            )
+
+    def get_nowait(self) -> bytes:
+        """Get a copy of the next payload or raise queue.Empty."""
+        with self.get_view_nowait() as view:
+            return bytes(view)
+
+    def get(self, block: bool = True, timeout: Optional[Union[float, int]] = None) -> bytes:
+        """Get a copy of the next payload, waiting for one if necessary."""
+        if block:
+            _wait_until(lambda: not self.empty(), timeout)
+        return self.get_nowait()
+
+
+# each slot holds a sequence number used to hand the slot back and forth between producers and consumers, followed by the record length and the record itself
+_SLOT_SEQUENCE_OFFSET = 0
+_SLOT_RECORD_LENGTH_OFFSET = 8
+_SLOT_HEADER_SIZE = 16
+# producers and consumers claim slots using counters kept on separate cache lines
+_NEXT_SLOT_TO_PUT_OFFSET = 0
+_NEXT_SLOT_TO_GET_OFFSET = 64
+_QUEUE_HEADER_SIZE = 128
+
+
+class SharedMemoryQueue:
+    """Multi-producer/multi-consumer queue of objects in shared memory.
+
+    Objects are serialized into fixed size slots in a shared memory block. Producers only contend with other producers (and consumers with other consumers) for the brief time needed to claim the next slot, the serialized record is then copied into/out of the slot outside of any lock. Counting semaphores allow put/get to block efficiently when the queue is full/empty.
+
+    This can be used anywhere a multiprocessing.Queue is accepted, including as the fatal_error_reporter of an InfiniteProcess (in which case the serializer must be pickle based and max_record_bytes must allow for the pickled exception and its formatted stack trace).
+
+    The process that creates the queue owns the shared memory block and should call unlink once all processes are finished with it. Other processes receive it by passing the instance as an argument to a Process (or InfiniteProcess) and should call close when finished.
+
+    Args:
+        max_record_bytes: the maximum size of a serialized object
+        num_slots: the maximum number of objects the queue can hold
+        serializer: the codec used to convert objects to bytes. Defaults to pickling
+        compression_threshold_bytes: if given, serialized objects at least this large are compressed with zlib (see CompressingSerializer). max_record_bytes then applies to the compressed size.
+        compression_level: the zlib compression level to use if compressing objects
+    """
+
+    def __init__(
+        self,
+        max_record_bytes: int = 4096,
+        num_slots: int = 1024,
+        serializer: Optional[Serializer] = None,
+        compression_threshold_bytes: Optional[int] = None,
+        compression_level: int = 6,
+    ) -> None:
+        if shared_memory is None:  # pragma: no cover
+            raise NotImplementedError("SharedMemoryQueue requires Python 3.8 or later")
+        self._max_record_bytes = max_record_bytes
+        self._num_slots = num_slots
+        if serializer is None:
+            serializer = DEFAULT_PICKLE_SERIALIZER
+        if compression_threshold_bytes is not None:
+            serializer = CompressingSerializer(
+                serializer, threshold_bytes=compression_threshold_bytes, level=compression_level
+            )
+        self._serializer = serializer
+        self._slot_size = _align(_SLOT_HEADER_SIZE + max_record_bytes)
+        self._shared_memory = shared_memory.SharedMemory(
+            create=True, size=_QUEUE_HEADER_SIZE + self._slot_size * num_slots
+        )
+        self._buf: memoryview = _get_buffer(self._shared_memory)
+        self._buf[:_QUEUE_HEADER_SIZE] = bytes(_QUEUE_HEADER_SIZE)
+        for slot_index in range(num_slots):
+            self._write_slot_sequence(slot_index, slot_index)
+        ctx = multiprocessing.get_context()
+        self._put_lock = ctx.Lock()
+        self._get_lock = ctx.Lock()
+        self._num_items = ctx.Semaphore(0)
+        self._num_free_slots = ctx.Semaphore(num_slots)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            "name": self._shared_memory.name,
+            "max_record_bytes": self._max_record_bytes,
+            "num_slots": self._num_slots,
+            "serializer": self._serializer,
+            "put_lock": self._put_lock,
+            "get_lock": self._get_lock,
+            "num_items": self._num_items,
+            "num_free_slots": self._num_free_slots,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._max_record_bytes = state["max_record_bytes"]
+        self._num_slots = state["num_slots"]
+        self._serializer = state["serializer"]
+        self._slot_size = _align(_SLOT_HEADER_SIZE + self._max_record_bytes)
+        self._shared_memory = shared_memory.SharedMemory(name=state["name"])
+        self._buf = _get_buffer(self._shared_memory)
+        self._put_lock = state["put_lock"]
+        self._get_lock = state["get_lock"]
+        self._num_items = state["num_items"]
+        self._num_free_slots = state["num_free_slots"]
+
+    def _read_counter(self, offset: int) -> int:
+        value: int = _COUNTER.unpack_from(self._buf, offset)[0]
+        return value
+
+    def _write_counter(self, offset: int, value: int) -> None:
+        _COUNTER.pack_into(self._buf, offset, value)
+
+    def _get_slot_start(self, slot_index: int) -> int:
+        return _QUEUE_HEADER_SIZE + slot_index * self._slot_size
+
+    def _read_slot_sequence(self, slot_index: int) -> int:
+        return self._read_counter(self._get_slot_start(slot_index) + _SLOT_SEQUENCE_OFFSET)
+
+    def _write_slot_sequence(self, slot_index: int, sequence: int) -> None:
+        self._write_counter(self._get_slot_start(slot_index) + _SLOT_SEQUENCE_OFFSET, sequence)
+
+    def _claim_position(self, lock: Any, counter_offset: int) -> int:
+        with lock:
+            position = self._read_counter(counter_offset)
+            self._write_counter(counter_offset, position + 1)
+        return position
+
+    def get_max_record_bytes(self) -> int:
+        return self._max_record_bytes
+
+    def get_num_slots(self) -> int:
+        return self._num_slots
+
+    def get_serializer(self) -> Serializer:
+        return self._serializer
+
+    def close(self) -> None:
+        """Detach from the shared memory block in this process."""
+        del self._buf
+        self._shared_memory.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory block.
+
+        Should only be called once, by the process that created the
+        queue, after all processes have closed it.
+        """
+        self.close()
+        self._shared_memory.unlink()
+
+    def qsize(self) -> int:
+        """Return the approximate number of objects in the queue.
+
+        Similar to multiprocessing.Queue, this includes objects which
+        are still in the process of being put into the queue.
+        """
+        return self._read_counter(_NEXT_SLOT_TO_PUT_OFFSET) - self._read_counter(_NEXT_SLOT_TO_GET_OFFSET)
+
+    def empty(self) -> bool:
+        next_position_to_get = self._read_counter(_NEXT_SLOT_TO_GET_OFFSET)
+        return self._read_slot_sequence(next_position_to_get % self._num_slots) != next_position_to_get + 1
+
+    def put(self, obj: Any, block: bool = True, timeout: Optional[Union[float, int]] = None) -> None:
+        record = self._serializer.dumps(obj)
+        record_size = len(record)
+        if record_size > self._max_record_bytes:
+            raise PayloadTooLargeForQueueError(
+                f"A serialized object of {record_size} bytes cannot fit in a queue with a maximum record size of {self._max_record_bytes} bytes"
+            )
+        if not self._num_free_slots.acquire(block, timeout):
+            raise queue.Full()
+        position = self._claim_position(self._put_lock, _NEXT_SLOT_TO_PUT_OFFSET)
+        slot_index = position % self._num_slots
+        # a consumer of the previous object in this slot may still be copying it out
+        _wait_until(lambda: self._read_slot_sequence(slot_index) == position, None)
+        slot_start = self._get_slot_start(slot_index)
+        self._write_counter(slot_start + _SLOT_RECORD_LENGTH_OFFSET, record_size)
+        record_start = slot_start + _SLOT_HEADER_SIZE
+        record_end = record_start + record_size
+        self._buf[record_start:record_end] = record
+        self._write_slot_sequence(slot_index, position + 1)
+        self._num_items.release()
+
+    def put_nowait(self, obj: Any) -> None:
+        self.put(obj, block=False)
+
+    def get(self, block: bool = True, timeout: Optional[Union[float, int]] = None) -> Any:
+        if not self._num_items.acquire(block, timeout):
+            raise queue.Empty()
+        position = self._claim_position(self._get_lock, _NEXT_SLOT_TO_GET_OFFSET)
+        slot_index = position % self._num_slots
+        # the producer of an earlier slot may still be copying its object in even though a later one has finished
+        _wait_until(lambda: self._read_slot_sequence(slot_index) == position + 1, None)
+        slot_start = self._get_slot_start(slot_index)
+        record_size = self._read_counter(slot_start + _SLOT_RECORD_LENGTH_OFFSET)
+        record_start = slot_start + _SLOT_HEADER_SIZE
+        record_end = record_start + record_size
+        record = bytes(self._buf[record_start:record_end])
+        self._write_slot_sequence(slot_index, position + self._num_slots)
+        self._num_free_slots.release()
+        # deserialize the data after the slot has been released
+        return self._serializer.loads(record)
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+
+# the next position to publish is kept on its own cache line, followed by a cache line for each subscriber
+_NEXT_POSITION_TO_PUBLISH_OFFSET = 0
+_BROADCAST_HEADER_SIZE = 64
+_SUBSCRIBER_IS_ACTIVE_OFFSET = 0
+_SUBSCRIBER_CURSOR_OFFSET = 8
+_SUBSCRIBER_NUM_MISSED_OFFSET = 16
+_SUBSCRIBER_ENTRY_SIZE = 64
+# marks a slot whose record is being overwritten
+_SLOT_BEING_WRITTEN = 0
+
+
+class SharedMemoryBroadcastChannel:
+    """Broadcast objects from any number of producers to several subscribers in other processes.
+
+    Each object is serialized once into a ring of fixed size slots in a shared memory block, and every subscriber reads it from there with its own cursor. Producers never wait for subscribers: once all slots are in use, the oldest object is overwritten. A subscriber that falls more than num_slots objects behind skips ahead to the oldest object still available, and the number of objects it missed is counted (or SubscriberOverrunError is raised if it was created with raise_error_on_overrun).
+
+    The cursor and missed count of each subscriber are kept in shared memory, so the producer can monitor how far behind each one is with get_subscriber_stats.
+
+    Subscribers are created with subscribe (before starting the process that will use them) and passed to the consuming process as an argument. The process that creates the channel owns the shared memory block and should call unlink once all processes are finished with it.
+
+    Args:
+        max_record_bytes: the maximum size of a serialized object
+        num_slots: the number of most recent objects kept available for slow subscribers
+        max_subscribers: the maximum number of subscribers at any one time
+        serializer: the codec used to convert objects to bytes. Defaults to pickling
+    """
+
+    def __init__(
+        self,
+        max_record_bytes: int = 4096,
+        num_slots: int = 1024,
+        max_subscribers: int = 8,
+        serializer: Optional[Serializer] = None,
+    ) -> None:
+        if shared_memory is None:  # pragma: no cover
+            raise NotImplementedError("SharedMemoryBroadcastChannel requires Python 3.8 or later")
+        self._max_record_bytes = max_record_bytes
+        self._num_slots = num_slots
+        self._max_subscribers = max_subscribers
+        self._serializer = DEFAULT_PICKLE_SERIALIZER if serializer is None else serializer
+        self._init_layout()
+        self._shared_memory = shared_memory.SharedMemory(
+            create=True, size=self._slots_start + self._slot_size * num_slots
+        )
+        self._buf: memoryview = _get_buffer(self._shared_memory)
+        self._buf[: self._slots_start] = bytes(self._slots_start)
+        for slot_index in range(num_slots):
+            self._write_counter(self._get_slot_start(slot_index) + _SLOT_SEQUENCE_OFFSET, _SLOT_BEING_WRITTEN)
+        ctx = multiprocessing.get_context()
+        self._put_lock = ctx.Lock()
+        self._subscribe_lock = ctx.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            "name": self._shared_memory.name,
+            "max_record_bytes": self._max_record_bytes,
+            "num_slots": self._num_slots,
+            "max_subscribers": self._max_subscribers,
+            "serializer": self._serializer,
+            "put_lock": self._put_lock,
+            "subscribe_lock": self._subscribe_lock,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._max_record_bytes = state["max_record_bytes"]
+        self._num_slots = state["num_slots"]
+        self._max_subscribers = state["max_subscribers"]
+        self._serializer = state["serializer"]
+        self._init_layout()
+        self._shared_memory = shared_memory.SharedMemory(name=state["name"])
+        self._buf = _get_buffer(self._shared_memory)
+        self._put_lock = state["put_lock"]
+        self._subscribe_lock = state["subscribe_lock"]
+
+    def _init_layout(self) -> None:
+        self._slot_size = _align(_SLOT_HEADER_SIZE + self._max_record_bytes)
+        self._slots_start = _BROADCAST_HEADER_SIZE + _SUBSCRIBER_ENTRY_SIZE * self._max_subscribers
+
+    def _read_counter(self, offset: int) -> int:
+        value: int = _COUNTER.unpack_from(self._buf, offset)[0]
+        return value
+
+    def _write_counter(self, offset: int, value: int) -> None:
+        _COUNTER.pack_into(self._buf, offset, value)
+
+    def _get_slot_start(self, slot_index: int) -> int:
+        return self._slots_start + slot_index * self._slot_size
+
+    def _get_subscriber_entry_start(self, subscriber_index: int) -> int:
+        return _BROADCAST_HEADER_SIZE + subscriber_index * _SUBSCRIBER_ENTRY_SIZE
+
+    def get_max_record_bytes(self) -> int:
+        return self._max_record_bytes
+
+    def get_num_slots(self) -> int:
+        return self._num_slots
+
+    def get_max_subscribers(self) -> int:
+        return self._max_subscribers
+
+    def get_serializer(self) -> Serializer:
+        return self._serializer
+
+    def get_num_published(self) -> int:
+        """Get the total number of objects put into the channel."""
+        return self._read_counter(_NEXT_POSITION_TO_PUBLISH_OFFSET)
+
+    def close(self) -> None:
+        """Detach from the shared memory block in this process."""
+        del self._buf
+        self._shared_memory.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory block.
+
+        Should only be called once, by the process that created the
+        channel, after all processes have closed it.
+        """
+        self.close()
+        self._shared_memory.unlink()
+
+    def put(self, obj: Any) -> None:
+        """Serialize the object once and publish it to all subscribers.
+
+        This never blocks waiting for subscribers.
+        """
+        record = self._serializer.dumps(obj)
+        record_size = len(record)
+        if record_size > self._max_record_bytes:
+            raise PayloadTooLargeForQueueError(
+                f"A serialized object of {record_size} bytes cannot fit in a channel with a maximum record size of {self._max_record_bytes} bytes"
+            )
+        with self._put_lock:
+            position = self._read_counter(_NEXT_POSITION_TO_PUBLISH_OFFSET)
+            self._write_counter(_NEXT_POSITION_TO_PUBLISH_OFFSET, position + 1)
+            slot_start = self._get_slot_start(position % self._num_slots)
+            # mark the slot first so a subscriber still reading the object being overwritten notices
+            self._write_counter(slot_start + _SLOT_SEQUENCE_OFFSET, _SLOT_BEING_WRITTEN)
+            self._write_counter(slot_start + _SLOT_RECORD_LENGTH_OFFSET, record_size)
+            record_start = slot_start + _SLOT_HEADER_SIZE
+            record_end = record_start + record_size
+            self._buf[record_start:record_end] = record
+            self._write_counter(slot_start + _SLOT_SEQUENCE_OFFSET, position + 1)
+
+    def put_nowait(self, obj: Any) -> None:
+        self.put(obj)
+
+    def subscribe(self, raise_error_on_overrun: bool = False) -> BroadcastSubscriber:
+        """Create a subscriber that receives every object put after this point.
+
+        Args:
+            raise_error_on_overrun: if True, the subscriber raises SubscriberOverrunError (after skipping ahead) when it has missed objects. Otherwise missed objects are only counted.
+        """
+        with self._subscribe_lock:
+            for subscriber_index in range(self._max_subscribers):
+                if self._read_subscriber_counter(subscriber_index, _SUBSCRIBER_IS_ACTIVE_OFFSET):
+                    continue
+                self._write_subscriber_counter(
+                    subscriber_index, _SUBSCRIBER_CURSOR_OFFSET, self.get_num_published()
+                )
+                self._write_subscriber_counter(subscriber_index, _SUBSCRIBER_NUM_MISSED_OFFSET, 0)
+                self._write_subscriber_counter(subscriber_index, _SUBSCRIBER_IS_ACTIVE_OFFSET, 1)
+                return BroadcastSubscriber(self, subscriber_index, raise_error_on_overrun)
+        raise TooManySubscribersError(
+            f"The channel already has the maximum of {self._max_subscribers} subscribers"
+        )
+
+    def _unsubscribe(self, subscriber_index: int) -> None:
+        with self._subscribe_lock:
+            self._write_subscriber_counter(subscriber_index, _SUBSCRIBER_IS_ACTIVE_OFFSET, 0)
+
+    def get_subscriber_stats(self) -> Dict[int, Dict[str, int]]:
+        """Get the lag (number of published objects not yet retrieved) and number of missed objects of each active subscriber.
+
+        Lags greater than num_slots mean the subscriber has fallen far enough behind that it will miss objects.
+        """
+        num_published = self.get_num_published()
+        stats: Dict[int, Dict[str, int]] = dict()
+        for subscriber_index in range(self._max_subscribers):
+            if not self._read_subscriber_counter(subscriber_index, _SUBSCRIBER_IS_ACTIVE_OFFSET):
+                continue
+            cursor = self._read_subscriber_counter(subscriber_index, _SUBSCRIBER_CURSOR_OFFSET)
+            stats[subscriber_index] = {
+                "lag": num_published - cursor,
+                "num_missed": self._read_subscriber_counter(subscriber_index, _SUBSCRIBER_NUM_MISSED_OFFSET),
+            }
+        return stats
+
+    def _read_subscriber_counter(self, subscriber_index: int, counter_offset: int) -> int:
+        return self._read_counter(self._get_subscriber_entry_start(subscriber_index) + counter_offset)
+
+    def _write_subscriber_counter(self, subscriber_index: int, counter_offset: int, value: int) -> None:
+        self._write_counter(self._get_subscriber_entry_start(subscriber_index) + counter_offset, value)
+
+    def _is_published(self, position: int) -> bool:
+        slot_start = self._get_slot_start(position % self._num_slots)
+        return self._read_counter(slot_start + _SLOT_SEQUENCE_OFFSET) == position + 1
+
+    def _is_overwritten(self, position: int) -> bool:
+        return self.get_num_published() - position > self._num_slots
+
+    def _read_record(self, position: int) -> Optional[bytes]:
+        """Copy the record at the position, or return None if it has not been published or was overwritten."""
+        if not self._is_published(position):
+            return None
+        slot_start = self._get_slot_start(position % self._num_slots)
+        record_size = min(self._read_counter(slot_start + _SLOT_RECORD_LENGTH_OFFSET), self._max_record_bytes)
+        record_start = slot_start + _SLOT_HEADER_SIZE
+        record_end = record_start + record_size
+        record = bytes(self._buf[record_start:record_end])
+        # a producer may have started overwriting the slot while it was being copied
+        if not self._is_published(position):
+            return None
+        return record
+
+    def _skip_overwritten_objects(self, subscriber_index: int, raise_error_on_overrun: bool) -> int:
+        oldest_available_position = self.get_num_published() - self._num_slots
+        cursor = self._read_subscriber_counter(subscriber_index, _SUBSCRIBER_CURSOR_OFFSET)
+        num_missed = oldest_available_position - cursor
+        total_num_missed = self._read_subscriber_counter(subscriber_index, _SUBSCRIBER_NUM_MISSED_OFFSET)
+        self._write_subscriber_counter(
+            subscriber_index, _SUBSCRIBER_NUM_MISSED_OFFSET, total_num_missed + num_missed
+        )
+        self._write_subscriber_counter(subscriber_index, _SUBSCRIBER_CURSOR_OFFSET, oldest_available_position)
+        if raise_error_on_overrun:
+            raise SubscriberOverrunError(
+                f"Subscriber {subscriber_index} fell too far behind and missed {num_missed} objects"
+            )
+        return oldest_available_position
+
+    def _is_empty_for_subscriber(self, subscriber_index: int) -> bool:
+        cursor = self._read_subscriber_counter(subscriber_index, _SUBSCRIBER_CURSOR_OFFSET)
+        return not self._is_published(cursor) and not self._is_overwritten(cursor)
+
+    def _get_nowait_for_subscriber(self, subscriber_index: int, raise_error_on_overrun: bool) -> Any:
+        cursor = self._read_subscriber_counter(subscriber_index, _SUBSCRIBER_CURSOR_OFFSET)
+        while True:
+            record = self._read_record(cursor)
+            if record is not None:
+                break
+            if not self._is_overwritten(cursor):
+                raise queue.Empty()
+            cursor = self._skip_overwritten_objects(subscriber_index, raise_error_on_overrun)
+        self._write_subscriber_counter(subscriber_index, _SUBSCRIBER_CURSOR_OFFSET, cursor + 1)
+        # deserialize the data after the cursor has been moved on
+        return self._serializer.loads(record)
+
+
+class BroadcastSubscriber:
+    """The receiving end of a SharedMemoryBroadcastChannel for a single consumer.
+
+    Create these with SharedMemoryBroadcastChannel.subscribe. A subscriber should only be used by one process/thread at a time.
+    """
+
+    # pylint: disable=protected-access # the subscriber keeps its state in the channel's shared memory
+
+    def __init__(
+        self,
+        channel: SharedMemoryBroadcastChannel,
+        subscriber_index: int,
+        raise_error_on_overrun: bool,
+    ) -> None:
+        self._channel = channel
+        self._subscriber_index = subscriber_index
+        self._raise_error_on_overrun = raise_error_on_overrun
+
+    def get_subscriber_index(self) -> int:
+        return self._subscriber_index
+
+    def get_channel(self) -> SharedMemoryBroadcastChannel:
+        return self._channel
+
+    def get_lag(self) -> int:
+        """Get the number of published objects that this subscriber has not yet retrieved."""
+        cursor = self._channel._read_subscriber_counter(self._subscriber_index, _SUBSCRIBER_CURSOR_OFFSET)
+        return self._channel.get_num_published() - cursor
+
+    def get_num_missed(self) -> int:
+        """Get the number of objects that were overwritten before this subscriber retrieved them."""
+        return self._channel._read_subscriber_counter(self._subscriber_index, _SUBSCRIBER_NUM_MISSED_OFFSET)
+
+    def empty(self) -> bool:
+        return self._channel._is_empty_for_subscriber(self._subscriber_index)
+
+    def get_nowait(self) -> Any:
+        """Get the next object or raise queue.Empty."""
+        return self._channel._get_nowait_for_subscriber(self._subscriber_index, self._raise_error_on_overrun)
+
+    def get(self, block: bool = True, timeout: Optional[Union[float, int]] = None) -> Any:
+        """Get the next object, waiting for one if necessary."""
+        if block:
+            _wait_until(lambda: not self.empty(), timeout)
+        return self.get_nowait()
+
+    def unsubscribe(self) -> None:
+        """Stop receiving objects and free this subscriber's place in the channel."""
+        self._channel._unsubscribe(self._subscriber_index)
+
+    def close(self) -> None:
+        """Detach from the channel's shared memory block in this process."""
+        self._channel.close()
@@ -5,6 +5,7 @@ from __future__ import annotations
 import logging
 import queue
 import threading
+from typing import Callable
 from typing import Optional
 from typing import Union
 
@@ -19,6 +20,8 @@ class InfiniteThread(InfiniteLoopingParallelismMixIn, threading.Thread):
 
     Args:
         fatal_error_reporter: set up as a queue to be thread safe. If any error is unhandled during run, it is fed into this queue so that calling thread can know the full details about the problem in this process.
+        clock_ns: the clock used for iteration timing. Defaults to time.perf_counter_ns
+        sleeper: called with the number of seconds to sleep at the end of each iteration. Defaults to time.sleep
     """
 
     def __init__(
@@ -27,6 +30,8 @@ class InfiniteThread(InfiniteLoopingParallelismMixIn, threading.Thread):
         lock: Optional[threading.Lock] = None,
         logging_level: int = logging.INFO,
         minimum_iteration_duration_seconds: Union[float, int] = 0.01,
+        clock_ns: Optional[Callable[[], int]] = None,
+        sleeper: Optional[Callable[[float], None]] = None,
     ) -> None:
         threading.Thread.__init__(self)
         InfiniteLoopingParallelismMixIn.__init__(
@@ -39,6 +44,8 @@ class InfiniteThread(InfiniteLoopingParallelismMixIn, threading.Thread):
             threading.Event(),
             threading.Event(),
             minimum_iteration_duration_seconds=minimum_iteration_duration_seconds,
+            clock_ns=clock_ns,
+            sleeper=sleeper,
         )
         self._lock = lock
 
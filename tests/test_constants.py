@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 import typing
 
+from stdlib_utils import INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE
 from stdlib_utils import NANOSECONDS_PER_CENTIMILLISECOND
+from stdlib_utils import OVERFLOW_POLICY_BLOCK
+from stdlib_utils import OVERFLOW_POLICY_DROP_NEWEST
+from stdlib_utils import OVERFLOW_POLICY_DROP_OLDEST
+from stdlib_utils import OVERFLOW_POLICY_KEEP_EVERY_NTH
 from stdlib_utils import QUEUE_CHECK_TIMEOUT_SECONDS
 from stdlib_utils import SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
 from stdlib_utils import UnionOfThreadingAndMultiprocessingQueue
@@ -11,6 +16,7 @@ def test_polling_times():
 
     assert SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE == 0.05
     assert QUEUE_CHECK_TIMEOUT_SECONDS == 0.2
+    assert INITIAL_SECONDS_TO_SLEEP_WHILE_WAITING_FOR_QUEUE == 0.001
 
 
 def test_type_aliases():
@@ -26,3 +32,10 @@ def test_type_aliases():
 
 def test_conversion_factors():
     assert NANOSECONDS_PER_CENTIMILLISECOND == 10**4
+
+
+def test_overflow_policies():
+    assert OVERFLOW_POLICY_BLOCK == "block"
+    assert OVERFLOW_POLICY_DROP_NEWEST == "drop_newest"
+    assert OVERFLOW_POLICY_DROP_OLDEST == "drop_oldest"
+    assert OVERFLOW_POLICY_KEEP_EVERY_NTH == "keep_every_nth"
@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
+import errno
+import gzip
+import json
 import logging
+from logging.handlers import QueueHandler
+import multiprocessing
 import os
+import queue
+import re
 import sys
 import tempfile
 import time
@@ -8,10 +15,22 @@ from unittest.mock import ANY
 
 from freezegun import freeze_time
 import pytest
+from stdlib_utils import BatchingFileHandler
+from stdlib_utils import CachedTimestampFormatter
 from stdlib_utils import configure_logging
+from stdlib_utils import create_logging_formatter
+from stdlib_utils import get_log_file_path
+from stdlib_utils import get_logging_format_string
+from stdlib_utils import iter_merged_log_entries
+from stdlib_utils import JsonLinesFormatter
 from stdlib_utils import LogFolderDoesNotExistError
 from stdlib_utils import LogFolderGivenWithoutFilePrefixError
+from stdlib_utils import loggers
+from stdlib_utils import MemoryMappedFileHandler
+from stdlib_utils import merge_log_files
+from stdlib_utils import shutdown_queue_logging
 from stdlib_utils import UnrecognizedLoggingFormatError
+from stdlib_utils import VirtualClock
 
 
 def test_configure_logging__default_args_sets_up_logging_on_stdout(mocker):
@@ -133,3 +152,899 @@ def test_configure_logging__raises_error_if_path_to_folder_given_without_file_na
 ):
     with pytest.raises(LogFolderGivenWithoutFilePrefixError):
         configure_logging(path_to_log_folder="dir")
+
+
+def _log_through_handler(handler, message, *args):
+    logger = logging.getLogger("test_queue_logging")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        logger.warning(message, *args)
+    finally:
+        logger.removeHandler(handler)
+
+
+def test_configure_logging__with_queue_listener__installs_queue_handler_and_writes_formatted_records_from_background_thread(
+    mocker,
+):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure_logging(log_file_prefix="my_log", path_to_log_folder=tmp_dir, use_queue_listener=True)
+        actual_handlers = spied_basic_config.call_args_list[0][1]["handlers"]
+        assert len(actual_handlers) == 1
+        queue_handler = actual_handlers[0]
+        assert isinstance(queue_handler, QueueHandler) is True
+        file_handler = loggers._queue_listener.handlers[0]
+        assert isinstance(file_handler, logging.FileHandler) is True
+
+        _log_through_handler(queue_handler, "reading %d of %s", 5, "well A1")
+        shutdown_queue_logging()
+        assert loggers._queue_listener is None
+        with open(file_handler.baseFilename) as log_file:
+            lines = log_file.read().splitlines()
+        file_handler.close()
+    assert len(lines) == 1
+    assert re.fullmatch(
+        r"\[[\d\-: ,]+ UTC\] test_queue_logging-\{test_loggers.py:\d+\} WARNING - reading 5 of well A1",
+        lines[0],
+    )
+
+
+def test_configure_logging__with_queue_listener__applies_custom_formatter_in_background_thread(mocker):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    test_formatter = logging.Formatter("redacted: %(levelname)s")
+    configure_logging(logging_formatter=test_formatter, use_queue_listener=True)
+    queue_handler = spied_basic_config.call_args_list[0][1]["handlers"][0]
+    stream_handler = loggers._queue_listener.handlers[0]
+    assert stream_handler.formatter is test_formatter
+    mocked_emit = mocker.patch.object(stream_handler, "emit", autospec=True)
+
+    _log_through_handler(queue_handler, "secret")
+    shutdown_queue_logging()
+
+    assert mocked_emit.call_count == 1
+    assert stream_handler.format(mocked_emit.call_args[0][0]) == "redacted: WARNING"
+
+
+def test_configure_logging__with_queue_listener__stops_previous_listener(mocker):
+    configure_logging(use_queue_listener=True)
+    first_listener = loggers._queue_listener
+    spied_stop = mocker.spy(first_listener, "stop")
+    configure_logging(use_queue_listener=True)
+    assert spied_stop.call_count == 1
+    assert loggers._queue_listener is not first_listener
+    shutdown_queue_logging()
+
+
+def test_configure_logging__with_queue_listener__replaces_previous_queue_handler_on_root_logger(
+    mocker, tmp_path
+):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    root_logger = logging.getLogger()
+    logger = logging.getLogger("test_queue_logging_reconfigure")
+    configure_logging(log_file_prefix="first", path_to_log_folder=str(tmp_path), use_queue_listener=True)
+    first_queue_handler = spied_basic_config.call_args[1]["handlers"][0]
+    first_file_handler = loggers._queue_listener.handlers[0]
+    # pytest has already configured the root logger, so basicConfig did not add the handler
+    root_logger.addHandler(first_queue_handler)
+    logger.warning("message one")
+
+    configure_logging(log_file_prefix="second", path_to_log_folder=str(tmp_path), use_queue_listener=True)
+    second_queue_handler = loggers._queue_handler
+    second_file_handler = loggers._queue_listener.handlers[0]
+    assert first_queue_handler not in root_logger.handlers
+    assert root_logger.handlers.count(second_queue_handler) == 1
+    logger.warning("message two")
+    shutdown_queue_logging()
+    first_file_handler.close()
+    second_file_handler.close()
+
+    assert second_queue_handler not in root_logger.handlers
+    assert _read_log_file(first_file_handler.baseFilename).endswith("message one\n")
+    assert _read_log_file(second_file_handler.baseFilename).endswith("message two\n")
+
+
+def test_shutdown_queue_logging__removes_queue_handler_from_root_logger(mocker):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    configure_logging(use_queue_listener=True)
+    queue_handler = spied_basic_config.call_args[1]["handlers"][0]
+    root_logger = logging.getLogger()
+    root_logger.addHandler(queue_handler)
+    shutdown_queue_logging()
+    assert queue_handler not in root_logger.handlers
+
+
+def test_configure_logging__with_queue_listener__passes_exception_info_to_background_thread(mocker):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    configure_logging(use_queue_listener=True)
+    queue_handler = spied_basic_config.call_args_list[0][1]["handlers"][0]
+    mocked_emit = mocker.patch.object(loggers._queue_listener.handlers[0], "emit", autospec=True)
+    logger = logging.getLogger("test_queue_logging_exception")
+    logger.propagate = False
+    logger.addHandler(queue_handler)
+    try:
+        raise ValueError("test error")
+    except ValueError:
+        logger.exception("failed")
+    logger.removeHandler(queue_handler)
+    shutdown_queue_logging()
+    record = mocked_emit.call_args[0][0]
+    assert record.getMessage().startswith("failed\nTraceback")
+    assert "ValueError: test error" in record.getMessage()
+
+
+def _log_error_from_child_process(message):
+    logging.getLogger("test_forked_logging").error(message)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="processes cannot be forked on Windows")
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_configure_logging__with_queue_listener__forked_processes_write_their_records(mocker, tmp_path):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    configure_logging(log_file_prefix="my_log", path_to_log_folder=str(tmp_path), use_queue_listener=True)
+    queue_handler = spied_basic_config.call_args[1]["handlers"][0]
+    file_handler = loggers._queue_listener.handlers[0]
+    # pytest has already configured the root logger, so basicConfig did not add the handler
+    root_logger = logging.getLogger()
+    root_logger.addHandler(queue_handler)
+    try:
+        process = multiprocessing.get_context("fork").Process(
+            target=_log_error_from_child_process, args=("from the child",)
+        )
+        process.start()
+        process.join()
+    finally:
+        root_logger.removeHandler(queue_handler)
+    shutdown_queue_logging()
+    file_handler.close()
+    assert process.exitcode == 0
+    assert "from the child" in _read_log_file(file_handler.baseFilename)
+
+
+def test_use_queue_listener_handlers_after_fork__replaces_queue_handler_on_root_logger(mocker):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    configure_logging(use_queue_listener=True)
+    queue_handler = spied_basic_config.call_args[1]["handlers"][0]
+    stream_handler = loggers._queue_listener.handlers[0]
+    listener = loggers._queue_listener
+    root_logger = logging.getLogger()
+    root_logger.addHandler(queue_handler)
+    try:
+        loggers._use_queue_listener_handlers_after_fork()
+        assert queue_handler not in root_logger.handlers
+        assert stream_handler in root_logger.handlers
+        assert loggers._queue_listener is None
+    finally:
+        root_logger.removeHandler(stream_handler)
+        listener.stop()
+
+
+def test_use_queue_listener_handlers_after_fork__leaves_root_logger_unchanged_if_queue_handler_is_not_on_it():
+    configure_logging(use_queue_listener=True)
+    listener = loggers._queue_listener
+    original_handlers = list(logging.getLogger().handlers)
+    loggers._use_queue_listener_handlers_after_fork()
+    assert logging.getLogger().handlers == original_handlers
+    assert loggers._queue_handler is None
+    listener.stop()
+    loggers._use_queue_listener_handlers_after_fork()
+    assert logging.getLogger().handlers == original_handlers
+
+
+def test_shutdown_queue_logging__does_nothing_if_queue_listener_was_not_used():
+    assert loggers._queue_listener is None
+    shutdown_queue_logging()
+    assert loggers._queue_listener is None
+
+
+def test_get_log_file_path__returns_file_created_by_configure_logging(mocker):
+    mocker.patch.object(logging, "basicConfig", autospec=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure_logging(log_file_prefix="my_log", path_to_log_folder=tmp_dir)
+        log_file_path = get_log_file_path()
+        assert os.path.dirname(log_file_path) == tmp_dir
+        assert os.path.basename(log_file_path).startswith("my_log__")
+        configure_logging()
+        assert get_log_file_path() is None
+        logging.basicConfig.call_args_list[0][1]["handlers"][0].close()
+
+
+@pytest.mark.parametrize(
+    "logging_format,expected,test_description",
+    [
+        (
+            "standard",
+            "[%(asctime)s UTC] %(name)s-{%(filename)s:%(lineno)d} %(levelname)s - %(message)s",
+            "standard",
+        ),
+        ("notebook", "[%(asctime)s UTC] %(levelname)s - %(message)s", "notebook"),
+    ],
+)
+def test_get_logging_format_string__returns_format_used_by_configure_logging(
+    logging_format, expected, test_description
+):
+    assert get_logging_format_string(logging_format) == expected
+
+
+def _create_batching_file_handler(tmp_dir, **kwargs):
+    kwargs.setdefault("flush_interval_seconds", 60)
+    handler = BatchingFileHandler(tmp_dir, "my_log", **kwargs)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def _log_messages(handler, messages):
+    for message in messages:
+        handler.handle(logging.makeLogRecord({"msg": message}))
+
+
+def _read_log_file(file_path):
+    if file_path.endswith(".gz"):
+        with gzip.open(file_path, "rt") as in_file:
+            return in_file.read()
+    with open(file_path) as in_file:
+        return in_file.read()
+
+
+def test_BatchingFileHandler__raises_error_if_folder_does_not_exist():
+    with pytest.raises(LogFolderDoesNotExistError, match="fake_folder"):
+        BatchingFileHandler("fake_folder", "my_log")
+
+
+def test_BatchingFileHandler__writes_records_once_max_records_per_flush_are_buffered(tmp_path):
+    handler = _create_batching_file_handler(
+        str(tmp_path), max_records_per_flush=3, clock_ns=VirtualClock().perf_counter_ns
+    )
+    file_path = handler.get_current_file_path()
+    assert re.fullmatch(r"my_log__\d{4}_\d{2}_\d{2}_\d{6}\.txt", os.path.basename(file_path)) is not None
+    _log_messages(handler, ["first", "second"])
+    assert _read_log_file(file_path) == ""
+    assert handler.get_stats()["num_records_buffered"] == 2
+
+    _log_messages(handler, ["third"])
+    assert _read_log_file(file_path) == "first\nsecond\nthird\n"
+    stats = handler.get_stats()
+    assert stats["num_records_written"] == 3
+    assert stats["num_records_buffered"] == 0
+    assert stats["bytes_written"] == os.path.getsize(file_path)
+    assert stats["num_flushes"] == 1
+    assert "flush_latency_ns" not in stats
+    handler.close()
+
+
+def test_BatchingFileHandler__writes_records_once_flush_interval_has_elapsed(tmp_path):
+    clock = VirtualClock()
+    handler = _create_batching_file_handler(str(tmp_path), clock_ns=clock.perf_counter_ns)
+    _log_messages(handler, ["first"])
+    assert handler.get_stats()["num_records_written"] == 0
+
+    clock.advance(60 * 10**9)
+    _log_messages(handler, ["second"])
+    clock.advance(10)
+    handler.flush()
+    _log_messages(handler, ["third"])
+    handler.flush()
+    assert _read_log_file(handler.get_current_file_path()) == "first\nsecond\nthird\n"
+    stats = handler.get_stats()
+    assert stats["num_flushes"] == 2
+    assert stats["flush_latency_ns"] == {"max": 0, "min": 0, "mean": 0}
+    handler.close()
+
+
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_BatchingFileHandler__background_thread_writes_records_when_nothing_else_is_logged(tmp_path):
+    handler = _create_batching_file_handler(str(tmp_path), flush_interval_seconds=0.01)
+    _log_messages(handler, ["first"])
+    while handler.get_stats()["num_records_written"] == 0:
+        time.sleep(0.01)
+    assert _read_log_file(handler.get_current_file_path()) == "first\n"
+    handler.close()
+
+
+@freeze_time("2022-07-25 12:34:56")
+def test_BatchingFileHandler__rotates_by_size_and_compresses_rotated_files(tmp_path):
+    handler = _create_batching_file_handler(
+        str(tmp_path), max_records_per_flush=2, max_bytes_per_file=12, clock_ns=VirtualClock().perf_counter_ns
+    )
+    first_file_path = handler.get_current_file_path()
+    _log_messages(handler, ["aaaa", "bbbb", "cccc", "dddd", "eeee", "ffff", "gggggggggggggggg", "h"])
+    handler.close()
+
+    assert handler.get_current_file_path() == os.path.join(str(tmp_path), "my_log__2022_07_25_123456_3.txt")
+    assert sorted(os.listdir(str(tmp_path))) == [
+        "my_log__2022_07_25_123456.txt.gz",
+        "my_log__2022_07_25_123456_1.txt.gz",
+        "my_log__2022_07_25_123456_2.txt.gz",
+        "my_log__2022_07_25_123456_3.txt",
+    ]
+    assert _read_log_file(f"{first_file_path}.gz") == "aaaa\nbbbb\n"
+    assert _read_log_file(handler.get_current_file_path()) == "gggggggggggggggg\nh\n"
+    stats = handler.get_stats()
+    assert stats["num_records_written"] == 8
+    assert stats["num_files_rotated"] == 3
+    assert stats["num_files_compressed"] == 3
+
+
+def test_BatchingFileHandler__rotates_by_time_without_compressing(tmp_path, mocker):
+    clock = VirtualClock()
+    handler = _create_batching_file_handler(
+        str(tmp_path),
+        max_records_per_flush=1,
+        rotation_interval_seconds=10,
+        compress_rotated_files=False,
+        clock_ns=clock.perf_counter_ns,
+    )
+    mocker.patch.object(
+        loggers, "_create_unique_log_file_path", autospec=True, side_effect=[str(tmp_path / "second.txt")]
+    )
+    first_file_path = handler.get_current_file_path()
+    _log_messages(handler, ["first"])
+    clock.advance(9 * 10**9)
+    _log_messages(handler, ["second"])
+    clock.advance(10**9)
+    _log_messages(handler, ["third"])
+    handler.close()
+
+    assert _read_log_file(first_file_path) == "first\nsecond\n"
+    assert _read_log_file(str(tmp_path / "second.txt")) == "third\n"
+    assert handler.get_stats()["num_files_compressed"] == 0
+
+
+def test_BatchingFileHandler__does_not_write_records_logged_after_close(tmp_path):
+    handler = _create_batching_file_handler(str(tmp_path))
+    handler.close()
+    _log_messages(handler, ["too late"])
+    handler.flush()
+    handler.close()
+    assert _read_log_file(handler.get_current_file_path()) == ""
+    assert handler.get_stats()["num_records_written"] == 0
+
+
+def test_BatchingFileHandler__reports_errors_while_formatting_records(tmp_path, mocker):
+    handler = _create_batching_file_handler(str(tmp_path))
+    mocked_handle_error = mocker.patch.object(handler, "handleError", autospec=True)
+    record = logging.makeLogRecord({"msg": "%d", "args": ("not a number",)})
+    handler.handle(record)
+    mocked_handle_error.assert_called_once_with(record)
+    handler.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="processes cannot be forked on Windows")
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_BatchingFileHandler__forked_process_writes_its_records_to_its_own_file(tmp_path):
+    handler = _create_batching_file_handler(str(tmp_path))
+    parent_file_path = handler.get_current_file_path()
+    _log_messages(handler, ["parent before fork"])
+    process = multiprocessing.get_context("fork").Process(
+        target=_log_messages, args=(handler, ["from the child"])
+    )
+    process.start()
+    process.join()
+    _log_messages(handler, ["parent after fork"])
+    handler.close()
+
+    assert process.exitcode == 0
+    assert _read_log_file(parent_file_path) == "parent before fork\nparent after fork\n"
+    child_file_names = [
+        name for name in os.listdir(str(tmp_path)) if name != os.path.basename(parent_file_path)
+    ]
+    assert len(child_file_names) == 1
+    assert child_file_names[0].startswith("my_log__")
+    assert _read_log_file(str(tmp_path / child_file_names[0])) == "from the child\n"
+
+
+def test_BatchingFileHandler_after_fork_in_child__drops_inherited_records_and_writes_every_record(tmp_path):
+    handler = _create_batching_file_handler(str(tmp_path))
+    parent_file_path = handler.get_current_file_path()
+    parent_files_to_compress = handler._files_to_compress
+    parent_background_thread = handler._background_thread
+    _log_messages(handler, ["parent before fork"])
+
+    handler._after_fork_in_child()
+    # the background thread of the parent would not exist in an actual child process
+    parent_files_to_compress.put(None)
+    parent_background_thread.join()
+    assert handler.get_current_file_path() != parent_file_path
+    assert handler._background_thread is not parent_background_thread
+    _log_messages(handler, ["from the child"])
+    assert _read_log_file(handler.get_current_file_path()) == "from the child\n"
+    handler.close()
+    assert _read_log_file(parent_file_path) == ""
+
+    handler._after_fork_in_child()
+    assert handler.get_stats()["num_records_buffered"] == 0
+
+
+def test_after_fork_in_child__adjusts_queue_listener_and_log_file_handlers(mocker):
+    mocked_use_handlers = mocker.patch.object(
+        loggers, "_use_queue_listener_handlers_after_fork", autospec=True
+    )
+    mocked_handler = mocker.MagicMock()
+    mocker.patch.object(loggers, "_handlers_to_reinit_after_fork", [mocked_handler])
+    loggers._after_fork_in_child()
+    mocked_use_handlers.assert_called_once_with()
+    mocked_handler._after_fork_in_child.assert_called_once_with()
+
+
+@pytest.mark.parametrize(
+    "kwargs,expected,test_description",
+    [
+        ({}, False, "no rotation"),
+        ({"max_bytes_per_file": 100}, True, "rotation by size"),
+        ({"rotation_interval_seconds": 60}, True, "rotation by time"),
+    ],
+)
+def test_BatchingFileHandler_is_rotation_enabled(kwargs, expected, test_description, tmp_path):
+    handler = _create_batching_file_handler(str(tmp_path), **kwargs)
+    assert handler.is_rotation_enabled() is expected
+    handler.close()
+
+
+def test_configure_logging__uses_batching_file_handler_when_given_kwargs(mocker):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure_logging(
+            path_to_log_folder=tmp_dir,
+            log_file_prefix="my_log",
+            log_file_handler_kwargs={"max_bytes_per_file": 2**20},
+        )
+        handler = spied_basic_config.call_args[1]["handlers"][0]
+        assert isinstance(handler, BatchingFileHandler) is True
+        # a LogCollectorProcess appending to the file would lose its records once the file is rotated
+        assert get_log_file_path() is None
+        assert handler._max_bytes_per_file == 2**20
+        handler.close()
+
+        configure_logging(
+            path_to_log_folder=tmp_dir,
+            log_file_prefix="my_log",
+            log_file_handler_kwargs={"max_records_per_flush": 1},
+        )
+        handler = spied_basic_config.call_args[1]["handlers"][0]
+        assert handler.is_rotation_enabled() is False
+        assert get_log_file_path() == handler.get_current_file_path()
+        handler.close()
+
+
+def _create_json_test_record(msg="value is %d", args=(5,), exc_info=None):
+    record = logging.LogRecord("my_logger", logging.WARNING, "/a/b/my_module.py", 17, msg, args, exc_info)
+    record.created = 1658752496.0
+    record.msecs = 123
+    record.processName = "MainProcess"
+    return record
+
+
+def test_JsonLinesFormatter__formats_fixed_keys_as_a_single_line():
+    line = JsonLinesFormatter().format(_create_json_test_record())
+    assert line == (
+        '{"time":"2022-07-25T12:34:56.123Z","level":"WARNING","logger":"my_logger","process":"MainProcess",'
+        '"file":"my_module.py","line":17,"message":"value is 5"}'
+    )
+
+
+def test_JsonLinesFormatter__adds_extra_fields_from_formatter_and_logging_call():
+    formatter = JsonLinesFormatter(extra_fields={"instrument": "mantarray"})
+    assert formatter.get_extra_fields() == {"instrument": "mantarray"}
+    record = _create_json_test_record(msg="wéll\nA1", args=None)
+    record.well_index = 0
+    record.unserializable = {1, 2}
+    fields = json.loads(formatter.format(record))
+    assert fields["message"] == "wéll\nA1"
+    assert fields["instrument"] == "mantarray"
+    assert fields["well_index"] == 0
+    assert fields["unserializable"] == "{1, 2}"
+    assert "\n" not in formatter.format(record)
+    assert "wéll" in formatter.format(record)
+
+
+def test_JsonLinesFormatter__includes_exception_and_stack_info():
+    try:
+        raise ValueError("test error")
+    except ValueError:
+        record = _create_json_test_record(exc_info=sys.exc_info())
+    record.stack_info = "Stack (most recent call last):"
+    fields = json.loads(JsonLinesFormatter().format(record))
+    assert fields["exception"].startswith("Traceback")
+    assert fields["exception"].endswith("ValueError: test error")
+    assert fields["stack"] == "Stack (most recent call last):"
+
+
+@pytest.mark.parametrize(
+    "logging_format,expected_start,test_description",
+    [
+        ("standard", "[2022-07-25 12:34:56,123 UTC] my_logger-{my_module.py:17} WARNING", "standard"),
+        ("notebook", "[2022-07-25 12:34:56,123 UTC] WARNING", "notebook"),
+        ("json", '{"time":"2022-07-25T12:34:56.123Z"', "json"),
+        ("fast", "[2022-07-25 12:34:56,123 UTC] my_logger WARNING - value is 5", "fast"),
+    ],
+)
+def test_create_logging_formatter__uses_utc_timestamps(logging_format, expected_start, test_description):
+    formatter = create_logging_formatter(logging_format)
+    assert formatter.format(_create_json_test_record()).startswith(expected_start)
+
+
+def test_configure_logging__sets_json_lines_formatter_on_handlers(mocker):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    configure_logging(logging_format="json")
+    handler = spied_basic_config.call_args[1]["handlers"][0]
+    assert isinstance(handler.formatter, JsonLinesFormatter) is True
+
+    custom_formatter = JsonLinesFormatter(extra_fields={"instrument": "mantarray"})
+    configure_logging(logging_format="json", logging_formatter=custom_formatter)
+    assert spied_basic_config.call_args[1]["handlers"][0].formatter is custom_formatter
+
+
+def test_configure_logging__with_json_format_and_queue_listener__writes_exception_under_its_own_key(
+    mocker, tmp_path
+):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    configure_logging(
+        path_to_log_folder=str(tmp_path),
+        log_file_prefix="my_log",
+        logging_format="json",
+        use_queue_listener=True,
+    )
+    queue_handler = spied_basic_config.call_args[1]["handlers"][0]
+    file_handler = loggers._queue_listener.handlers[0]
+    logger = logging.getLogger("test_json_queue_logging_exception")
+    logger.propagate = False
+    logger.addHandler(queue_handler)
+    try:
+        raise ValueError("test error")
+    except ValueError:
+        logger.exception("failed reading %s", "A1")
+    logger.removeHandler(queue_handler)
+    shutdown_queue_logging()
+    file_handler.close()
+
+    entry = json.loads(_read_log_file(file_handler.baseFilename))
+    assert entry["message"] == "failed reading A1"
+    assert entry["exception"].startswith("Traceback")
+    assert entry["exception"].endswith("ValueError: test error")
+
+
+def test_ExceptionKeepingQueueHandler__keeps_existing_exception_text_and_passes_records_without_exceptions():
+    queue_handler = loggers._ExceptionKeepingQueueHandler(queue.SimpleQueue())
+    record = logging.makeLogRecord(
+        {"msg": "failed %d", "args": (1,), "exc_info": (ValueError, ValueError(), None), "exc_text": "cached"}
+    )
+    prepared = queue_handler.prepare(record)
+    assert (prepared.msg, prepared.args, prepared.exc_info, prepared.exc_text) == (
+        "failed 1",
+        None,
+        None,
+        "cached",
+    )
+    assert record.exc_info is not None
+    prepared = queue_handler.prepare(logging.makeLogRecord({"msg": "hello"}))
+    assert (prepared.msg, prepared.exc_text) == ("hello", None)
+
+
+def test_CachedTimestampFormatter__formats_like_standard_formatter_in_utc():
+    fmt = "[%(asctime)s UTC] %(levelname)s - %(message)s"
+    standard_formatter = logging.Formatter(fmt)
+    standard_formatter.converter = time.gmtime
+    record = _create_json_test_record()
+    assert CachedTimestampFormatter(fmt).format(record) == standard_formatter.format(record)
+
+
+def test_CachedTimestampFormatter__only_formats_date_and_time_once_per_second(mocker):
+    spied_strftime = mocker.spy(time, "strftime")
+    formatter = CachedTimestampFormatter("%(asctime)s")
+    record = _create_json_test_record()
+    assert formatter.format(record) == "2022-07-25 12:34:56,123"
+    record.created += 0.5
+    record.msecs = 623
+    assert formatter.format(record) == "2022-07-25 12:34:56,623"
+    assert spied_strftime.call_count == 1
+    record.created += 1
+    assert formatter.format(record) == "2022-07-25 12:34:57,623"
+    assert spied_strftime.call_count == 2
+
+
+@pytest.fixture(scope="function", name="restore_caller_lookup")
+def fixture_restore_caller_lookup():
+    original_srcfile = logging._srcfile
+    yield
+    logging._srcfile = original_srcfile
+
+
+def test_configure_logging__fast_format_skips_caller_lookup_until_reconfigured(mocker, restore_caller_lookup):
+    original_srcfile = logging._srcfile
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    configure_logging(logging_format="fast")
+    handler = spied_basic_config.call_args[1]["handlers"][0]
+    assert isinstance(handler.formatter, CachedTimestampFormatter) is True
+    assert (
+        spied_basic_config.call_args[1]["format"] == "[%(asctime)s UTC] %(name)s %(levelname)s - %(message)s"
+    )
+    assert logging._srcfile is None
+    mocked_emit = mocker.patch.object(handler, "emit", autospec=True)
+    _log_through_handler(handler, "hey")
+    assert mocked_emit.call_args[0][0].lineno == 0
+
+    configure_logging()
+    assert logging._srcfile == original_srcfile
+
+
+def test_configure_logging__fast_format_with_queue_listener_merges_message_arguments_in_background_thread(
+    mocker, restore_caller_lookup
+):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    configure_logging(logging_format="fast", use_queue_listener=True)
+    queue_handler = spied_basic_config.call_args[1]["handlers"][0]
+    stream_handler = loggers._queue_listener.handlers[0]
+    assert isinstance(stream_handler.formatter, CachedTimestampFormatter) is True
+    spied_prepare = mocker.spy(queue_handler, "prepare")
+    mocked_emit = mocker.patch.object(stream_handler, "emit", autospec=True)
+
+    _log_through_handler(queue_handler, "reading %d of %s", 5, "well A1")
+    shutdown_queue_logging()
+
+    queued_record = spied_prepare.spy_return
+    assert queued_record.msg == "reading %d of %s"
+    assert queued_record.args == (5, "well A1")
+    written_record = mocked_emit.call_args[0][0]
+    assert written_record is queued_record
+    assert re.fullmatch(
+        r"\[[\d\-: ,]+ UTC\] test_queue_logging WARNING - reading 5 of well A1",
+        stream_handler.format(written_record),
+    )
+
+
+def _create_memory_mapped_file_handler(tmp_dir, **kwargs):
+    handler = MemoryMappedFileHandler(tmp_dir, "my_log", **kwargs)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def test_MemoryMappedFileHandler__raises_error_if_folder_does_not_exist():
+    with pytest.raises(LogFolderDoesNotExistError, match="fake_folder"):
+        MemoryMappedFileHandler("fake_folder", "my_log")
+
+
+def test_MemoryMappedFileHandler__preallocates_file_and_truncates_it_when_closed(tmp_path):
+    handler = _create_memory_mapped_file_handler(
+        str(tmp_path), extent_size_bytes=1024, flush_interval_seconds=None
+    )
+    file_path = handler.get_current_file_path()
+    assert re.fullmatch(r"my_log__\d{4}_\d{2}_\d{2}_\d{6}\.txt", os.path.basename(file_path)) is not None
+    assert os.path.getsize(file_path) == 1024
+
+    _log_messages(handler, ["first", "sécond"])
+    with open(file_path, "rb") as in_file:
+        contents = in_file.read()
+    assert contents == "first\nsécond\n".encode("utf-8") + b"\x00" * (1024 - 14)
+    assert handler.get_stats() == {
+        "num_records_written": 2,
+        "bytes_written": 14,
+        "file_size_bytes": 1024,
+        "num_extents": 1,
+        "num_flushes": 0,
+    }
+
+    handler.close()
+    assert _read_log_file(file_path) == "first\nsécond\n"
+    assert handler.get_stats()["num_flushes"] == 1
+
+
+def test_MemoryMappedFileHandler__grows_file_in_extents(tmp_path):
+    handler = _create_memory_mapped_file_handler(str(tmp_path), extent_size_bytes=8)
+    _log_messages(handler, ["abcdef", "g", "a much longer message"])
+    stats = handler.get_stats()
+    assert stats["bytes_written"] == 31
+    assert stats["file_size_bytes"] == 32
+    assert stats["num_extents"] == 4
+    assert os.path.getsize(handler.get_current_file_path()) == 32
+    handler.close()
+    assert _read_log_file(handler.get_current_file_path()) == "abcdef\ng\na much longer message\n"
+
+
+def test_MemoryMappedFileHandler__flushes_once_flush_interval_has_elapsed(tmp_path):
+    clock = VirtualClock()
+    handler = _create_memory_mapped_file_handler(
+        str(tmp_path), flush_interval_seconds=1, clock_ns=clock.perf_counter_ns
+    )
+    _log_messages(handler, ["first"])
+    clock.advance(10**9)
+    _log_messages(handler, ["second"])
+    assert handler.get_stats()["num_flushes"] == 1
+    _log_messages(handler, ["third"])
+    handler.flush()
+    assert handler.get_stats()["num_flushes"] == 2
+    handler.close()
+
+
+def test_MemoryMappedFileHandler__ignores_records_after_close(tmp_path):
+    handler = _create_memory_mapped_file_handler(str(tmp_path))
+    handler.close()
+    _log_messages(handler, ["too late"])
+    handler.flush()
+    handler.close()
+    assert _read_log_file(handler.get_current_file_path()) == ""
+    assert handler.get_stats()["num_flushes"] == 1
+
+
+def test_MemoryMappedFileHandler__reports_errors_while_formatting_records(tmp_path, mocker):
+    handler = _create_memory_mapped_file_handler(str(tmp_path))
+    mocked_handle_error = mocker.patch.object(handler, "handleError", autospec=True)
+    record = logging.makeLogRecord({"msg": "%d", "args": ("not a number",)})
+    handler.handle(record)
+    mocked_handle_error.assert_called_once_with(record)
+    handler.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="processes cannot be forked on Windows")
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_MemoryMappedFileHandler__forked_process_writes_its_records_to_its_own_file(tmp_path):
+    handler = _create_memory_mapped_file_handler(str(tmp_path), extent_size_bytes=1024)
+    parent_file_path = handler.get_current_file_path()
+    _log_messages(handler, ["parent before fork"])
+    process = multiprocessing.get_context("fork").Process(
+        target=_log_messages, args=(handler, ["from the child"])
+    )
+    process.start()
+    process.join()
+    _log_messages(handler, ["parent after fork"])
+    handler.close()
+
+    assert process.exitcode == 0
+    assert _read_log_file(parent_file_path) == "parent before fork\nparent after fork\n"
+    child_file_names = [
+        name for name in os.listdir(str(tmp_path)) if name != os.path.basename(parent_file_path)
+    ]
+    assert len(child_file_names) == 1
+    assert child_file_names[0].startswith("my_log__")
+    # the child exited without closing the handler, so the rest of the extent was not truncated
+    assert _read_log_file(str(tmp_path / child_file_names[0])).rstrip("\x00") == "from the child\n"
+
+
+def test_MemoryMappedFileHandler_after_fork_in_child__opens_new_file_without_truncating_parent_file(tmp_path):
+    handler = _create_memory_mapped_file_handler(str(tmp_path), extent_size_bytes=1024)
+    parent_file_path = handler.get_current_file_path()
+    _log_messages(handler, ["parent before fork"])
+
+    handler._after_fork_in_child()
+    child_file_path = handler.get_current_file_path()
+    assert child_file_path != parent_file_path
+    assert handler.get_stats() == {
+        "num_records_written": 0,
+        "bytes_written": 0,
+        "file_size_bytes": 1024,
+        "num_extents": 1,
+        "num_flushes": 0,
+    }
+    _log_messages(handler, ["from the child"])
+    handler.close()
+    handler._after_fork_in_child()
+
+    assert os.path.getsize(parent_file_path) == 1024
+    assert _read_log_file(parent_file_path).rstrip("\x00") == "parent before fork\n"
+    assert _read_log_file(child_file_path) == "from the child\n"
+    assert handler.get_current_file_path() == child_file_path
+
+
+def test_MemoryMappedFileHandler__reserves_disk_space_for_each_extent(tmp_path, mocker):
+    spied_fallocate = mocker.spy(os, "posix_fallocate")
+    handler = _create_memory_mapped_file_handler(str(tmp_path), extent_size_bytes=8)
+    _log_messages(handler, ["abcdef", "g"])
+    assert [call.args[1:] for call in spied_fallocate.call_args_list] == [(0, 8), (8, 8)]
+    handler.close()
+
+
+def test_MemoryMappedFileHandler__reports_error_when_disk_space_cannot_be_reserved(tmp_path, mocker):
+    handler = _create_memory_mapped_file_handler(str(tmp_path), extent_size_bytes=8)
+    mocker.patch.object(os, "posix_fallocate", autospec=True, side_effect=OSError(errno.ENOSPC, "disk full"))
+    mocked_handle_error = mocker.patch.object(handler, "handleError", autospec=True)
+    _log_messages(handler, ["a message longer than the extent"])
+    assert mocked_handle_error.call_count == 1
+    mocker.stopall()
+    _log_messages(handler, ["short"])
+    handler.close()
+    assert _read_log_file(handler.get_current_file_path()) == "short\n"
+
+
+def test_configure_logging__uses_memory_mapped_file_handler(mocker):
+    spied_basic_config = mocker.spy(logging, "basicConfig")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure_logging(
+            path_to_log_folder=tmp_dir,
+            log_file_prefix="my_log",
+            memory_mapped_log_file=True,
+            log_file_handler_kwargs={"extent_size_bytes": 4096},
+        )
+        handler = spied_basic_config.call_args[1]["handlers"][0]
+        assert isinstance(handler, MemoryMappedFileHandler) is True
+        # a LogCollectorProcess appending to the file would have its records truncated away when the handler is closed
+        assert get_log_file_path() is None
+        assert handler.get_stats()["file_size_bytes"] == 4096
+        handler.close()
+
+        configure_logging(path_to_log_folder=tmp_dir, log_file_prefix="my_log", memory_mapped_log_file=True)
+        handler = spied_basic_config.call_args[1]["handlers"][0]
+        assert handler.get_stats()["file_size_bytes"] == 2**24
+        handler.close()
+
+
+def _write_log_file(file_path, contents):
+    if file_path.endswith(".gz"):
+        with gzip.open(file_path, "wt", encoding="utf-8") as out_file:
+            out_file.write(contents)
+    else:
+        with open(file_path, "w", encoding="utf-8") as out_file:
+            out_file.write(contents)
+    return file_path
+
+
+def test_iter_merged_log_entries__merges_entries_from_all_files_in_timestamp_order(tmp_path):
+    worker_0_path = _write_log_file(
+        str(tmp_path / "worker_0__2022_07_25_123456.txt"),
+        "[2022-07-25 12:34:56,100 UTC] root-{a.py:1} INFO - first\n"
+        "[2022-07-25 12:34:57,000 UTC] root-{a.py:2} ERROR - failed\n"
+        "Traceback (most recent call last):\n"
+        "ValueError: test error\n"
+        "[2022-07-25 12:35:00,000 UTC] root-{a.py:3} INFO - last without newline",
+    )
+    worker_1_path = _write_log_file(
+        str(tmp_path / "worker_1__2022_07_25_123456.txt.gz"),
+        "[2022-07-25 12:34:56,050 UTC] INFO - earliest\n"
+        "[2022-07-25 12:34:57,000 UTC] INFO - same time as failure\n"
+        "[2022-07-25 12:34:58,000 UTC] INFO - wörker 1\n",
+    )
+    worker_2_path = _write_log_file(
+        str(tmp_path / "worker_2__2022_07_25_123456.txt"),
+        "starting up\n[2022-07-25 12:34:59,999 UTC] worker_2 INFO - fast format\n",
+    )
+
+    entries = list(iter_merged_log_entries([worker_0_path, worker_1_path, worker_2_path]))
+    assert entries == [
+        "starting up\n",
+        "[2022-07-25 12:34:56,050 UTC] INFO - earliest\n",
+        "[2022-07-25 12:34:56,100 UTC] root-{a.py:1} INFO - first\n",
+        "[2022-07-25 12:34:57,000 UTC] root-{a.py:2} ERROR - failed\n"
+        "Traceback (most recent call last):\n"
+        "ValueError: test error\n",
+        "[2022-07-25 12:34:57,000 UTC] INFO - same time as failure\n",
+        "[2022-07-25 12:34:58,000 UTC] INFO - wörker 1\n",
+        "[2022-07-25 12:34:59,999 UTC] worker_2 INFO - fast format\n",
+        "[2022-07-25 12:35:00,000 UTC] root-{a.py:3} INFO - last without newline\n",
+    ]
+
+
+def test_iter_merged_log_entries__interleaves_many_entries(tmp_path):
+    file_paths = [
+        _write_log_file(
+            str(tmp_path / f"worker_{worker_index}.txt"),
+            "".join(
+                f"[2022-07-25 12:{i // 60000:02d}:{i // 1000 % 60:02d},{i % 1000:03d} UTC] INFO - {i}\n"
+                for i in range(worker_index, 3000, 3)
+            ),
+        )
+        for worker_index in range(3)
+    ]
+    merged_entries = iter_merged_log_entries(file_paths)
+    assert [int(entry.split(" - ")[1]) for entry in merged_entries] == list(range(3000))
+
+
+def test_iter_merged_log_entries__handles_empty_files(tmp_path):
+    empty_path = _write_log_file(str(tmp_path / "empty.txt"), "")
+    log_path = _write_log_file(str(tmp_path / "log.txt"), "[2022-07-25 12:34:56,000 UTC] INFO - hey\n")
+    assert list(iter_merged_log_entries([empty_path, log_path])) == [
+        "[2022-07-25 12:34:56,000 UTC] INFO - hey\n"
+    ]
+    assert list(iter_merged_log_entries([])) == []
+
+
+def test_merge_log_files__writes_merged_entries_to_file(tmp_path):
+    first_path = _write_log_file(
+        str(tmp_path / "a.txt"),
+        "[2022-07-25 12:34:56,000 UTC] INFO - 1\n[2022-07-25 12:34:58,000 UTC] INFO - 3\n",
+    )
+    second_path = _write_log_file(str(tmp_path / "b.txt"), "[2022-07-25 12:34:57,000 UTC] INFO - 2\n")
+    merged_path = str(tmp_path / "merged.txt")
+    assert merge_log_files([first_path, second_path], merged_path) == 3
+    assert _read_log_file(merged_path) == (
+        "[2022-07-25 12:34:56,000 UTC] INFO - 1\n"
+        "[2022-07-25 12:34:57,000 UTC] INFO - 2\n"
+        "[2022-07-25 12:34:58,000 UTC] INFO - 3\n"
+    )
@@ -7,9 +7,11 @@ import time
 
 import pytest
 from stdlib_utils import BadQueueTypeError
+from stdlib_utils import HIGHEST_PROTOCOL_PICKLE_SERIALIZER
 from stdlib_utils import InfiniteLoopingParallelismMixIn
 from stdlib_utils import InfiniteProcess
 from stdlib_utils import invoke_process_run_and_check_errors
+from stdlib_utils import MARSHAL_SERIALIZER
 from stdlib_utils import SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
 from stdlib_utils import SimpleMultiprocessingQueue
 from stdlib_utils import TestingQueue
@@ -63,6 +65,8 @@ def test_InfiniteProcess_super_InfiniteLoopingParallelismMixIn_is_called_during_
         error_queue,
         *init_test_args_InfiniteLoopingParallelismMixIn,
         minimum_iteration_duration_seconds=0.01,
+        clock_ns=None,
+        sleeper=None,
     )
 
 
@@ -284,7 +288,7 @@ def test_InfiniteProcess_start__raises_error_if_error_queue_is_incorrect_queue_t
     p1 = InfiniteProcess(error_queue1)
     with pytest.raises(
         BadQueueTypeError,
-        match=f"_fatal_error_reporter must be a SimpleMultiprocessingQueue or multiprocessing.queues.Queue if starting this process, not {type(error_queue1)}",
+        match=f"_fatal_error_reporter must be a SimpleMultiprocessingQueue, SharedMemoryQueue or multiprocessing.queues.Queue if starting this process, not {type(error_queue1)}",
     ):
         p1.start()
 
@@ -292,6 +296,35 @@ def test_InfiniteProcess_start__raises_error_if_error_queue_is_incorrect_queue_t
     p2 = InfiniteProcess(error_queue2)
     with pytest.raises(
         BadQueueTypeError,
-        match=f"_fatal_error_reporter must be a SimpleMultiprocessingQueue or multiprocessing.queues.Queue if starting this process, not {type(error_queue2)}",
+        match=f"_fatal_error_reporter must be a SimpleMultiprocessingQueue, SharedMemoryQueue or multiprocessing.queues.Queue if starting this process, not {type(error_queue2)}",
     ):
         p2.start()
+
+
+def test_InfiniteProcess_start__raises_error_if_error_queue_cannot_send_exceptions():
+    error_queue = SimpleMultiprocessingQueue(serializer=MARSHAL_SERIALIZER)
+    p = InfiniteProcess(error_queue)
+    with pytest.raises(
+        BadQueueTypeError,
+        match="_fatal_error_reporter must use a pickle based serializer so that exceptions can be sent through it, not marshal",
+    ):
+        p.start()
+
+
+def test_InfiniteProcess__reports_errors_through_queue_with_highest_protocol_pickle_serializer():
+    error_queue = SimpleMultiprocessingQueue(serializer=HIGHEST_PROTOCOL_PICKLE_SERIALIZER)
+    p = InfiniteProcessThatRaisesError(error_queue)
+    p.start()
+    p.join()
+    err, _ = error_queue.get(timeout=5)
+    assert str(err) == "test message"
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_InfiniteProcess_start__accepts_multiprocessing_queue_as_error_queue():
+    error_queue = multiprocessing.Queue()
+    p = InfiniteProcess(error_queue)
+    p.start()
+    hard_stop_results = p.hard_stop()
+    p.join()
+    assert hard_stop_results["fatal_error_reporter"] == []
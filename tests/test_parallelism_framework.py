@@ -12,6 +12,7 @@ from stdlib_utils import is_queue_eventually_not_empty
 from stdlib_utils import NANOSECONDS_PER_CENTIMILLISECOND
 from stdlib_utils import parallelism_framework
 from stdlib_utils import SimpleMultiprocessingQueue
+from stdlib_utils import VirtualClock
 
 
 def generic_infinite_looper():
@@ -42,6 +43,22 @@ def simple_infinite_looper():
     return p
 
 
+def virtual_time_infinite_looper(clock, minimum_iteration_duration_seconds=0.01):
+    p = InfiniteLoopingParallelismMixIn(
+        queue.Queue(),
+        logging.INFO,
+        threading.Event(),
+        threading.Event(),
+        threading.Event(),
+        threading.Event(),
+        threading.Event(),
+        minimum_iteration_duration_seconds=minimum_iteration_duration_seconds,
+        clock_ns=clock.perf_counter_ns,
+        sleeper=clock.sleep,
+    )
+    return p
+
+
 def test_InfiniteLoopingParallelismMixIn__sleeps_during_loop_for_time_remaining_if_minimum_iteration_duration_not_met(
     mocker,
 ):
@@ -337,3 +354,67 @@ def test_InfiniteLoopingParallelismMixIn__correctly_stores_time_since_initialize
     # after setup
     expected_dur_since_init = (expected_poll_time - expected_init_time) // NANOSECONDS_PER_CENTIMILLISECOND
     assert p.get_cms_since_init() == expected_dur_since_init
+
+
+def test_VirtualClock__only_moves_forward_when_advanced_or_slept():
+    clock = VirtualClock(start_timepoint_ns=100)
+    assert clock.perf_counter_ns() == 100
+    clock.advance(50)
+    assert clock.perf_counter_ns() == 150
+    clock.sleep(0.25)
+    assert clock.perf_counter_ns() == 150 + 250 * 10**6
+    assert clock.get_total_sleep_ns() == 250 * 10**6
+
+
+def test_VirtualClock__advance__raises_error_if_duration_is_negative():
+    clock = VirtualClock()
+    with pytest.raises(ValueError, match="-1"):
+        clock.advance(-1)
+    assert clock.perf_counter_ns() == 0
+
+
+def test_InfiniteLoopingParallelismMixIn__uses_injected_clock_and_sleeper_instead_of_time_module(mocker):
+    mocked_perf_counter_ns = mocker.patch.object(time, "perf_counter_ns", autospec=True)
+    mocked_sleep = mocker.patch.object(time, "sleep", autospec=True)
+    clock = VirtualClock()
+    p = virtual_time_infinite_looper(clock)
+
+    p.run(num_iterations=3)
+
+    assert mocked_perf_counter_ns.call_count == 0
+    assert mocked_sleep.call_count == 0
+    assert clock.get_total_sleep_ns() == 2 * 10**7
+    assert p.get_current_timepoint_ns() == clock.perf_counter_ns()
+
+
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_InfiniteLoopingParallelismMixIn__reports_simulated_performance_metrics_for_many_iterations_in_virtual_time():
+    clock = VirtualClock()
+    p = virtual_time_infinite_looper(clock)
+    dur_of_each_iter_ns = 2 * 10**6
+    p._commands_for_each_run_iteration = lambda: clock.advance(dur_of_each_iter_ns)
+    num_iterations = 5000
+
+    p.run(num_iterations=num_iterations)
+
+    expected_idle_time_ns = (num_iterations - 1) * (10**7 - dur_of_each_iter_ns)
+    expected_elapsed_time_ns = num_iterations * dur_of_each_iter_ns + expected_idle_time_ns
+    assert clock.perf_counter_ns() == expected_elapsed_time_ns
+    assert p.get_cms_since_init() == expected_elapsed_time_ns // NANOSECONDS_PER_CENTIMILLISECOND
+    performance_metrics = p.reset_performance_tracker()
+    assert performance_metrics["idle_iteration_time_ns"] == expected_idle_time_ns
+    assert performance_metrics["percent_use"] == 100 * (1 - expected_idle_time_ns / expected_elapsed_time_ns)
+    assert performance_metrics["longest_iterations"] == [dur_of_each_iter_ns] * 5
+    assert performance_metrics["periods_between_iterations"]["min"] == 10**7
+    assert performance_metrics["periods_between_iterations"]["max"] == 10**7
+    assert performance_metrics["sleep_durations"] == {"max": 0.008, "min": 0.008, "mean": 0.008}
+
+
+def test_InfiniteLoopingParallelismMixIn__reset_performance_tracker__reports_full_use_when_no_virtual_time_has_passed():
+    clock = VirtualClock()
+    p = virtual_time_infinite_looper(clock, minimum_iteration_duration_seconds=0)
+    p.run(num_iterations=100)
+    assert clock.perf_counter_ns() == 0
+    performance_metrics = p.reset_performance_tracker()
+    assert performance_metrics["idle_iteration_time_ns"] == 0
+    assert performance_metrics["percent_use"] == 100
@@ -1,18 +1,31 @@
 # -*- coding: utf-8 -*-
 import logging
 import multiprocessing
+import os
 import queue
+import re
+import sys
 import time
 
 import pytest
+from stdlib_utils import BoundedMultiprocessingQueue
 from stdlib_utils import confirm_parallelism_is_stopped
+from stdlib_utils import decode_log_communication
 from stdlib_utils import InfiniteProcess
 from stdlib_utils import InfiniteThread
+from stdlib_utils import install_log_collector_handler
 from stdlib_utils import invoke_process_run_and_check_errors
+from stdlib_utils import LogCollectorProcess
+from stdlib_utils import LOG_BATCH_COMMUNICATION_TAG
+from stdlib_utils import LOG_COMMUNICATION_TAG
+from stdlib_utils import LogCollectorQueueHandler
+from stdlib_utils import LogMessageBuffer
 from stdlib_utils import ParallelFrameworkStillNotStoppedError
 from stdlib_utils import parallelism_utils
 from stdlib_utils import put_log_message_into_queue
+from stdlib_utils import QUEUE_CHECK_TIMEOUT_SECONDS
 from stdlib_utils import SimpleMultiprocessingQueue
+from stdlib_utils import VirtualClock
 
 from .fixtures_parallelism import InfiniteProcessThatCountsIterations
 from .fixtures_parallelism import InfiniteProcessThatRaisesError
@@ -121,6 +134,34 @@ def test_put_log_message_into_queue__does_not_put_message_in_when_below_threshol
     assert q.empty() is True
 
 
+def test_put_log_message_into_queue__puts_compact_tuple_in():
+    q = queue.Queue()
+    put_log_message_into_queue(logging.WARNING, "hey", q, logging.INFO, compact=True)
+    the_comm = q.get_nowait()
+    assert the_comm == (LOG_COMMUNICATION_TAG, logging.WARNING, "hey")
+    assert decode_log_communication(the_comm) == [
+        {"communication_type": "log", "log_level": logging.WARNING, "message": "hey"}
+    ]
+
+
+@pytest.mark.parametrize(
+    "communication,test_description",
+    [
+        ({"communication_type": "command", "command": "stop"}, "other dict"),
+        (("command", "stop"), "other tuple"),
+        (tuple(), "empty tuple"),
+        ("log", "string"),
+    ],
+)
+def test_decode_log_communication__returns_none_for_other_communications(communication, test_description):
+    assert decode_log_communication(communication) is None
+
+
+def test_decode_log_communication__returns_dict_communications_unchanged():
+    comm = {"communication_type": "log", "log_level": logging.INFO, "message": "hey"}
+    assert decode_log_communication(comm) == [comm]
+
+
 def test_put_log_message_into_queue__sleeps_after_putting_message_into_regular_queue(
     mocker,
 ):
@@ -231,3 +272,309 @@ def test_confirm_parallelism_is_stopped__successfully_returns_if_framework_becom
     confirm_parallelism_is_stopped(test_framework, timeout_seconds=10)
 
     assert mocked_sleep.call_count == 2  # confirm that it did sleep in between checking
+
+
+@pytest.fixture(scope="function", name="restore_root_logger")
+def fixture_restore_root_logger():
+    root_logger = logging.getLogger()
+    original_handlers = list(root_logger.handlers)
+    original_level = root_logger.level
+    yield root_logger
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    for handler in original_handlers:
+        root_logger.addHandler(handler)
+    root_logger.setLevel(original_level)
+
+
+def _create_log_record(message, process_name="worker_1", level=logging.INFO):
+    record = logging.LogRecord("test_logger", level, "worker.py", 10, message, None, None)
+    record.processName = process_name
+    return record
+
+
+def test_install_log_collector_handler__replaces_root_handlers(restore_root_logger):
+    log_queue = BoundedMultiprocessingQueue(10)
+    restore_root_logger.addHandler(logging.StreamHandler())
+    handler = install_log_collector_handler(log_queue, logging_level=logging.DEBUG)
+    assert restore_root_logger.handlers == [handler]
+    assert restore_root_logger.level == logging.DEBUG
+    logging.getLogger("worker").debug("value %d", 5)
+    record = log_queue.get(timeout=QUEUE_CHECK_TIMEOUT_SECONDS)
+    assert record.getMessage() == "value 5"
+    assert record.args is None
+    assert record.num_dropped_log_records == 0
+
+
+def test_LogCollectorQueueHandler__drops_records_when_queue_is_full_and_reports_count_with_next_record():
+    log_queue = BoundedMultiprocessingQueue(1)
+    handler = LogCollectorQueueHandler(log_queue)
+    for i in range(3):
+        handler.handle(_create_log_record(f"message {i}"))
+    assert handler.get_num_dropped() == 2
+    assert log_queue.get(timeout=QUEUE_CHECK_TIMEOUT_SECONDS).getMessage() == "message 0"
+    handler.handle(_create_log_record("message 3"))
+    assert handler.get_num_dropped() == 0
+    record = log_queue.get(timeout=QUEUE_CHECK_TIMEOUT_SECONDS)
+    assert record.getMessage() == "message 3"
+    assert record.num_dropped_log_records == 2
+
+
+def _put_records_into_collector(collector, records):
+    for record in records:
+        collector.get_log_queue().put(record)
+
+
+def test_LogCollectorProcess__writes_batches_of_records_and_counts_messages_per_worker(tmp_path):
+    log_file_path = str(tmp_path / "collected.txt")
+    error_queue = SimpleMultiprocessingQueue()
+    collector = LogCollectorProcess(
+        error_queue, log_file_path=log_file_path, stats_reporting_period_seconds=0
+    )
+    assert collector.get_log_file_path() == log_file_path
+    dropped_record = _create_log_record("after drops", process_name="worker_2")
+    dropped_record.num_dropped_log_records = 3
+    _put_records_into_collector(
+        collector, [_create_log_record("first"), dropped_record, _create_log_record("second")]
+    )
+    invoke_process_run_and_check_errors(collector, perform_setup_before_loop=True)
+
+    with open(log_file_path) as log_file:
+        lines = log_file.read().splitlines()
+    assert len(lines) == 3
+    assert re.fullmatch(r"\[[\d\-: ,]+ UTC\] test_logger-\{worker.py:10\} INFO - first", lines[0])
+    assert lines[1].endswith("INFO - after drops")
+    assert collector.get_worker_stats() == {
+        "worker_1": {"num_messages": 2, "num_dropped": 0},
+        "worker_2": {"num_messages": 1, "num_dropped": 3},
+    }
+    collector._teardown_after_loop()
+    assert collector.is_teardown_complete() is True
+
+
+def test_LogCollectorProcess__limits_records_per_write_and_writes_the_rest_during_teardown(tmp_path, mocker):
+    log_file_path = str(tmp_path / "collected.txt")
+    collector = LogCollectorProcess(
+        SimpleMultiprocessingQueue(), log_file_path=log_file_path, max_records_per_write=2
+    )
+    spied_write_records = mocker.spy(collector, "_write_records")
+    _put_records_into_collector(collector, [_create_log_record(f"message {i}") for i in range(5)])
+    collector.soft_stop()
+    invoke_process_run_and_check_errors(collector, perform_setup_before_loop=True)
+    assert collector.is_stopped() is False
+    assert spied_write_records.call_count == 1
+
+    invoke_process_run_and_check_errors(collector, perform_teardown_after_loop=True)
+    assert spied_write_records.call_count == 3
+    with open(log_file_path) as log_file:
+        assert len(log_file.read().splitlines()) == 5
+    assert collector.get_worker_stats() == {"worker_1": {"num_messages": 5, "num_dropped": 0}}
+
+
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_LogCollectorProcess__keeps_only_most_recent_worker_stats_until_retrieved(tmp_path):
+    collector = LogCollectorProcess(
+        SimpleMultiprocessingQueue(),
+        log_file_path=str(tmp_path / "collected.txt"),
+        stats_reporting_period_seconds=0,
+    )
+    invoke_process_run_and_check_errors(collector, perform_setup_before_loop=True)
+    # the reports grow with the number of workers, and keeping all of them would fill the pipe
+    for i in range(1000):
+        _put_records_into_collector(collector, [_create_log_record("hello", process_name=f"worker_{i}")])
+        invoke_process_run_and_check_errors(collector)
+    invoke_process_run_and_check_errors(collector, perform_teardown_after_loop=True)
+    worker_stats = collector.get_worker_stats()
+    assert len(worker_stats) == 1000
+    assert worker_stats["worker_999"] == {"num_messages": 1, "num_dropped": 0}
+
+
+def test_LogCollectorProcess__defaults_to_file_from_configure_logging(mocker):
+    mocker.patch.object(parallelism_utils, "get_log_file_path", autospec=True, return_value="my_log.txt")
+    collector = LogCollectorProcess(SimpleMultiprocessingQueue())
+    assert collector.get_log_file_path() == "my_log.txt"
+
+
+def test_LogCollectorProcess__writes_to_stdout_if_no_log_file_and_uses_custom_formatter(mocker, capsys):
+    mocker.patch.object(parallelism_utils, "get_log_file_path", autospec=True, return_value=None)
+    collector = LogCollectorProcess(
+        SimpleMultiprocessingQueue(), logging_formatter=logging.Formatter("%(processName)s: %(message)s")
+    )
+    _put_records_into_collector(collector, [_create_log_record("hello")])
+    invoke_process_run_and_check_errors(
+        collector, perform_setup_before_loop=True, perform_teardown_after_loop=True
+    )
+    assert capsys.readouterr().out == "worker_1: hello\n"
+    assert sys.stdout.closed is False
+
+
+def test_LogCollectorProcess__does_not_write_when_no_records_are_available(tmp_path, mocker):
+    collector = LogCollectorProcess(
+        SimpleMultiprocessingQueue(), log_file_path=str(tmp_path / "collected.txt")
+    )
+    spied_write_records = mocker.spy(collector, "_write_records")
+    invoke_process_run_and_check_errors(collector, perform_setup_before_loop=True)
+    assert spied_write_records.call_count == 0
+    collector._teardown_after_loop()
+
+
+def test_LogCollectorProcess_teardown_after_loop__only_sets_event_in_process_that_did_not_run_collector(
+    mocker,
+):
+    collector = LogCollectorProcess(SimpleMultiprocessingQueue(), log_file_path="unused.txt")
+    spied_report = mocker.spy(collector, "_report_worker_stats")
+    collector._teardown_after_loop()
+    assert spied_report.call_count == 0
+    assert collector.is_teardown_complete() is True
+
+
+def test_LogCollectorProcess_write_records__raises_error_if_log_file_is_not_open():
+    collector = LogCollectorProcess(SimpleMultiprocessingQueue(), log_file_path="unused.txt")
+    with pytest.raises(NotImplementedError, match="log file"):
+        collector._write_records([_create_log_record("hello")])
+
+
+def _log_messages_from_worker(log_queue, num_messages):
+    install_log_collector_handler(log_queue)
+    for i in range(num_messages):
+        logging.info("message %d", i)
+
+
+@pytest.mark.timeout(20)  # set a timeout because the test can hang as a failure mode
+def test_LogCollectorProcess__collects_records_from_multiple_worker_processes(tmp_path):
+    log_file_path = str(tmp_path / "collected.txt")
+    error_queue = SimpleMultiprocessingQueue()
+    collector = LogCollectorProcess(error_queue, log_file_path=log_file_path)
+    collector.start()
+    workers = [
+        multiprocessing.Process(
+            target=_log_messages_from_worker, args=(collector.get_log_queue(), 100), name=f"worker_{i}"
+        )
+        for i in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    collector.soft_stop()
+    collector.join()
+    assert error_queue.empty() is True
+    with open(log_file_path) as log_file:
+        lines = log_file.read().splitlines()
+    assert len(lines) == 200
+    assert sum(line.endswith("INFO - message 99") for line in lines) == 2
+    assert collector.get_worker_stats() == {
+        "worker_0": {"num_messages": 100, "num_dropped": 0},
+        "worker_1": {"num_messages": 100, "num_dropped": 0},
+    }
+    assert os.path.isfile(log_file_path)
+
+
+def test_LogMessageBuffer__sends_messages_in_batches_at_flush_interval():
+    clock = VirtualClock()
+    q = queue.Queue()
+    log_buffer = LogMessageBuffer(q, logging.INFO, flush_interval_seconds=1, clock_ns=clock.perf_counter_ns)
+    log_buffer.put(logging.DEBUG, "discarded")
+    log_buffer.put(logging.INFO, "first")
+    clock.advance(999999999)
+    log_buffer.put(logging.ERROR, {"detail": "second"})
+    assert log_buffer.get_num_buffered() == 2
+    assert q.empty() is True
+
+    clock.advance(1)
+    log_buffer.put(logging.WARNING, "third")
+    assert log_buffer.get_num_buffered() == 0
+    the_comm = q.get_nowait()
+    assert the_comm[0] == LOG_BATCH_COMMUNICATION_TAG
+    assert decode_log_communication(the_comm) == [
+        {"communication_type": "log", "log_level": logging.INFO, "message": "first"},
+        {"communication_type": "log", "log_level": logging.ERROR, "message": {"detail": "second"}},
+        {"communication_type": "log", "log_level": logging.WARNING, "message": "third"},
+    ]
+    assert q.empty() is True
+
+
+def test_LogMessageBuffer_flush__does_not_put_empty_batches():
+    q = queue.Queue()
+    log_buffer = LogMessageBuffer(q, logging.INFO)
+    log_buffer.flush()
+    assert q.empty() is True
+    log_buffer.put(logging.INFO, "hey")
+    log_buffer.flush()
+    assert decode_log_communication(q.get_nowait())[0]["message"] == "hey"
+
+
+def test_LogMessageBuffer__batches_can_be_sent_through_multiprocessing_queue():
+    q = SimpleMultiprocessingQueue()
+    log_buffer = LogMessageBuffer(q, logging.INFO)
+    log_buffer.put(logging.INFO, "hey")
+    log_buffer.close()
+    assert decode_log_communication(q.get(timeout=QUEUE_CHECK_TIMEOUT_SECONDS)) == [
+        {"communication_type": "log", "log_level": logging.INFO, "message": "hey"}
+    ]
+
+
+def test_LogMessageBuffer__rate_limits_messages_per_key_and_sends_summary_after_period():
+    clock = VirtualClock()
+    q = queue.Queue()
+    log_buffer = LogMessageBuffer(
+        q,
+        logging.INFO,
+        flush_interval_seconds=10,
+        max_messages_per_key=2,
+        rate_limit_period_seconds=1,
+        clock_ns=clock.perf_counter_ns,
+    )
+    for i in range(4):
+        log_buffer.put(logging.WARNING, f"read error {i}", message_key="read_error")
+    log_buffer.put(logging.ERROR, "read error 4", message_key="read_error")
+    log_buffer.put(logging.INFO, "not limited")
+    log_buffer.put(logging.INFO, "other key", message_key="other")
+    assert log_buffer.get_num_suppressed() == 3
+
+    clock.advance(10**9)
+    log_buffer.put(logging.WARNING, "read error 5", message_key="read_error")
+    log_buffer.flush()
+    messages = decode_log_communication(q.get_nowait())
+    assert [message["message"] for message in messages] == [
+        "read error 0",
+        "read error 1",
+        "not limited",
+        "other key",
+        "Suppressed 3 log messages with key 'read_error'",
+        "read error 5",
+    ]
+    assert messages[4] == {
+        "communication_type": "log",
+        "log_level": logging.ERROR,
+        "message": "Suppressed 3 log messages with key 'read_error'",
+        "message_key": "read_error",
+        "num_suppressed": 3,
+    }
+
+
+def test_LogMessageBuffer_flush__sends_summaries_for_periods_that_have_ended():
+    clock = VirtualClock()
+    q = queue.Queue()
+    log_buffer = LogMessageBuffer(
+        q, logging.INFO, flush_interval_seconds=10, max_messages_per_key=1, clock_ns=clock.perf_counter_ns
+    )
+    log_buffer.put(logging.INFO, "a", message_key="a")
+    log_buffer.put(logging.INFO, "a", message_key="a")
+    clock.advance(5 * 10**8)
+    log_buffer.put(logging.INFO, "b", message_key="b")
+    log_buffer.put(logging.INFO, "b", message_key="b")
+    clock.advance(5 * 10**8)
+    log_buffer.flush()
+    messages = decode_log_communication(q.get_nowait())
+    assert [message["message"] for message in messages] == [
+        "a",
+        "b",
+        "Suppressed 1 log messages with key 'a'",
+    ]
+
+    log_buffer.close()
+    messages = decode_log_communication(q.get_nowait())
+    assert [message["message"] for message in messages] == ["Suppressed 1 log messages with key 'b'"]
+    log_buffer.close()
+    assert q.empty() is True
@@ -1,19 +1,40 @@
 # -*- coding: utf-8 -*-
+import array
+import asyncio
 from collections import deque
 import multiprocessing
+import os
+import pickle
 import queue
 from queue import Empty
 from queue import Queue
 import sys
+import tempfile
+import threading
 import time
 
 import pytest
+from stdlib_utils import AsyncQueueAdapter
+from stdlib_utils import BoundedMultiprocessingQueue
+from stdlib_utils import BoundedQueue
 from stdlib_utils import confirm_queue_is_eventually_empty
 from stdlib_utils import confirm_queue_is_eventually_of_size
+from stdlib_utils import DEFAULT_PICKLE_SERIALIZER
+from stdlib_utils import DiskSpillingQueue
 from stdlib_utils import drain_queue
+from stdlib_utils import drain_queue_nowait
+from stdlib_utils import HIGHEST_PROTOCOL_PICKLE_SERIALIZER
+from stdlib_utils import InstrumentedQueue
 from stdlib_utils import is_queue_eventually_empty
 from stdlib_utils import is_queue_eventually_not_empty
 from stdlib_utils import is_queue_eventually_of_size
+from stdlib_utils import iter_queue_nowait
+from stdlib_utils import MARSHAL_SERIALIZER
+from stdlib_utils import MultiprocessingPriorityQueue
+from stdlib_utils import OVERFLOW_POLICY_BLOCK
+from stdlib_utils import OVERFLOW_POLICY_DROP_NEWEST
+from stdlib_utils import OVERFLOW_POLICY_DROP_OLDEST
+from stdlib_utils import OVERFLOW_POLICY_KEEP_EVERY_NTH
 from stdlib_utils import put_object_into_queue_and_raise_error_if_eventually_still_empty
 from stdlib_utils import QUEUE_CHECK_TIMEOUT_SECONDS
 from stdlib_utils import queue_utils
@@ -23,7 +44,11 @@ from stdlib_utils import QueueStillEmptyError
 from stdlib_utils import safe_get
 from stdlib_utils import SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
 from stdlib_utils import SimpleMultiprocessingQueue
+from stdlib_utils import StructRecordQueue
+from stdlib_utils import StructSerializer
 from stdlib_utils import TestingQueue
+from stdlib_utils import UnrecognizedOverflowPolicyError
+from stdlib_utils import wait_for_any
 
 # Eli (10/23/20): had to drop support for MacOS because they don't adequately support Multiprocessing queues yet
 #     def qsize(self):
@@ -59,6 +84,235 @@ def test_SimpleMultiprocessingQueue__get_nowait__raises_error_if_empty():
         test_queue.get_nowait()
 
 
+@pytest.mark.timeout(2)  # set a timeout because the test can hang as a failure mode
+def test_SimpleMultiprocessingQueue__get_nowait__does_not_block_if_another_consumer_emptied_the_queue_after_checking_empty(
+    mocker,
+):
+    test_queue = SimpleMultiprocessingQueue()
+    mocker.patch.object(test_queue, "empty", autospec=True, return_value=False)
+    with pytest.raises(queue.Empty):
+        test_queue.get_nowait()
+
+
+@pytest.mark.timeout(2)  # set a timeout because the test can hang as a failure mode
+def test_SimpleMultiprocessingQueue__get_nowait__raises_error_if_another_consumer_is_reading():
+    test_queue = SimpleMultiprocessingQueue()
+    test_queue.put("blah")
+    test_queue._rlock.acquire()  # pylint: disable=protected-access
+    with pytest.raises(queue.Empty):
+        test_queue.get_nowait()
+    test_queue._rlock.release()  # pylint: disable=protected-access
+    assert test_queue.get_nowait() == "blah"
+
+
+def test_SimpleMultiprocessingQueue__get__raises_error_if_still_empty_after_timeout():
+    test_queue = SimpleMultiprocessingQueue()
+    start = time.perf_counter()
+    with pytest.raises(queue.Empty):
+        test_queue.get(timeout=0.05)
+    assert time.perf_counter() - start >= 0.05
+
+
+def test_SimpleMultiprocessingQueue__get__raises_error_if_block_is_false_and_empty():
+    with pytest.raises(queue.Empty):
+        SimpleMultiprocessingQueue().get(block=False)
+
+
+def test_SimpleMultiprocessingQueue__get__returns_object_put_before_timeout():
+    test_queue = SimpleMultiprocessingQueue()
+    threading.Timer(0.01, test_queue.put, args=("blah",)).start()
+    assert test_queue.get(timeout=5) == "blah"
+
+
+def test_SimpleMultiprocessingQueue__get_batch__waits_for_first_object_then_returns_all_available():
+    test_queue = SimpleMultiprocessingQueue()
+    threading.Timer(0.01, test_queue.put_many, args=([1, 2, 3],)).start()
+    assert test_queue.get_batch(timeout=5) == [1, 2, 3]
+
+
+def test_SimpleMultiprocessingQueue__get_batch__returns_no_more_than_max_items():
+    test_queue = SimpleMultiprocessingQueue()
+    test_queue.put_many([1, 2, 3])
+    assert test_queue.get_batch(max_items=2, timeout=0) == [1, 2]
+    assert test_queue.get_batch(max_items=2, timeout=0) == [3]
+
+
+def test_SimpleMultiprocessingQueue__get_batch__returns_empty_list_after_timeout():
+    assert SimpleMultiprocessingQueue().get_batch(timeout=0.01) == []
+
+
+def _put_many_into_queue(the_queue, items):
+    the_queue.put_many(items)
+
+
+def _get_one_then_many_from_queue(the_queue, result_queue):
+    first_item = the_queue.get(timeout=5)
+    result_queue.put((first_item, the_queue.get_many()))
+
+
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_SimpleMultiprocessingQueue__put_many__delivers_whole_batch_to_the_process_that_reads_it():
+    test_queue = SimpleMultiprocessingQueue()
+    result_queue = SimpleMultiprocessingQueue()
+    test_queue.put_many([1, 2, 3])
+    p = multiprocessing.Process(target=_get_one_then_many_from_queue, args=(test_queue, result_queue))
+    p.start()
+    assert result_queue.get(timeout=5) == (1, [2, 3])
+    p.join()
+    # the other objects of the batch were only available to the child process
+    assert test_queue.empty() is True
+
+
+def test_SimpleMultiprocessingQueue__put_many__writes_a_single_message_to_the_pipe(mocker):
+    test_queue = SimpleMultiprocessingQueue()
+    spied_send_bytes = mocker.spy(test_queue._writer, "send_bytes")  # pylint: disable=protected-access
+    test_queue.put_many(["a", "b", "c"])
+    assert spied_send_bytes.call_count == 1
+
+
+def test_SimpleMultiprocessingQueue__put_many__does_not_write_to_the_pipe_if_no_items_given(mocker):
+    test_queue = SimpleMultiprocessingQueue()
+    spied_send_bytes = mocker.spy(test_queue._writer, "send_bytes")  # pylint: disable=protected-access
+    test_queue.put_many(iter([]))
+    spied_send_bytes.assert_not_called()
+    assert test_queue.empty() is True
+
+
+def test_SimpleMultiprocessingQueue__get__returns_items_from_put_many_individually_and_in_order():
+    test_queue = SimpleMultiprocessingQueue()
+    test_queue.put("first")
+    test_queue.put_many(["second", None, {"fourth": 4}])
+    test_queue.put("fifth")
+    actual = [test_queue.get() for _ in range(5)]
+    assert actual == ["first", "second", None, {"fourth": 4}, "fifth"]
+    assert test_queue.empty() is True
+
+
+def test_SimpleMultiprocessingQueue__empty__is_false_while_items_from_a_batch_remain_unread():
+    test_queue = SimpleMultiprocessingQueue()
+    test_queue.put_many([1, 2])
+    assert test_queue.get_nowait() == 1
+    assert test_queue.empty() is False
+    assert test_queue.get_nowait() == 2
+    assert test_queue.empty() is True
+
+
+def test_SimpleMultiprocessingQueue__get_many__returns_all_available_items_without_blocking():
+    test_queue = SimpleMultiprocessingQueue()
+    assert test_queue.get_many() == []
+    test_queue.put_many([1, 2, 3])
+    test_queue.put(4)
+    assert test_queue.get_many() == [1, 2, 3, 4]
+    assert test_queue.get_many() == []
+
+
+def test_SimpleMultiprocessingQueue__get_many__keeps_remaining_items_of_batch_when_max_items_reached():
+    test_queue = SimpleMultiprocessingQueue()
+    test_queue.put_many([1, 2, 3])
+    test_queue.put(4)
+    assert test_queue.get_many(max_items=2) == [1, 2]
+    assert test_queue.get() == 3
+    assert test_queue.get_many(max_items=2) == [4]
+
+
+def test_SimpleMultiprocessingQueue__put__works_without_write_lock_as_on_windows():
+    test_queue = SimpleMultiprocessingQueue()
+    test_queue._wlock = None  # pylint: disable=protected-access
+    test_queue.put_many([1, 2])
+    assert test_queue.get_many() == [1, 2]
+
+
+def test_SimpleMultiprocessingQueue__setstate__initializes_unpacked_items_when_unpickled_in_another_process():
+    test_queue = SimpleMultiprocessingQueue()
+    unpickled_queue = SimpleMultiprocessingQueue.__new__(SimpleMultiprocessingQueue)
+    unpickled_queue.__setstate__(
+        (
+            test_queue._reader,  # pylint: disable=protected-access
+            test_queue._writer,  # pylint: disable=protected-access
+            test_queue._rlock,  # pylint: disable=protected-access
+            test_queue._wlock,  # pylint: disable=protected-access
+            test_queue.get_serializer(),
+        )
+    )
+    test_queue.put_many([1, 2])
+    assert unpickled_queue.get() == 1
+    assert unpickled_queue.empty() is False
+    assert unpickled_queue.get_many() == [2]
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_SimpleMultiprocessingQueue__put_many__items_are_received_from_another_process():
+    test_queue = SimpleMultiprocessingQueue()
+    expected = list(range(100))
+    p = multiprocessing.Process(target=_put_many_into_queue, args=(test_queue, expected))
+    p.start()
+    actual = [test_queue.get() for _ in range(len(expected))]
+    p.join()
+    assert actual == expected
+
+
+def test_SimpleMultiprocessingQueue__uses_default_pickle_serializer_if_none_given():
+    assert SimpleMultiprocessingQueue().get_serializer() is DEFAULT_PICKLE_SERIALIZER
+
+
+@pytest.mark.parametrize(
+    "serializer,items,test_description",
+    [
+        (HIGHEST_PROTOCOL_PICKLE_SERIALIZER, [{"a": 1}, ValueError], "highest protocol pickle"),
+        (MARSHAL_SERIALIZER, [{"a": [1, 2.5]}, b"blah"], "marshal"),
+        (StructSerializer("<qd"), [(1, 0.5), (2, 1.5)], "struct"),
+    ],
+)
+def test_SimpleMultiprocessingQueue__sends_single_items_and_batches_with_given_serializer(
+    serializer, items, test_description
+):
+    test_queue = SimpleMultiprocessingQueue(serializer=serializer)
+    assert test_queue.get_serializer() is serializer
+    test_queue.put(items[0])
+    test_queue.put_many(items)
+    assert test_queue.get_many() == [items[0]] + items
+
+
+def test_SimpleMultiprocessingQueue__compresses_large_messages_if_threshold_given():
+    test_queue = SimpleMultiprocessingQueue(
+        serializer=MARSHAL_SERIALIZER, compression_threshold_bytes=1024, compression_level=1
+    )
+    serializer = test_queue.get_serializer()
+    assert serializer.get_serializer() is MARSHAL_SERIALIZER
+    assert serializer.get_level() == 1
+    large_message = "a" * 10000
+    test_queue.put("small")
+    test_queue.put(large_message)
+    test_queue.put_many([large_message, "small"])
+    assert test_queue.get_many() == ["small", large_message, large_message, "small"]
+    stats = serializer.get_stats()
+    assert stats["num_compressed"] == 2
+    assert stats["num_decompressed"] == 2
+
+
+def test_SimpleMultiprocessingQueue__getstate__includes_serializer_when_pickled_for_another_process(mocker):
+    # pickling a queue is only allowed while spawning a process
+    mocker.patch.object(multiprocessing.queues.context, "assert_spawning", autospec=True)
+    serializer = StructSerializer("<qd")
+    test_queue = SimpleMultiprocessingQueue(serializer=serializer)
+    unpickled_queue = SimpleMultiprocessingQueue.__new__(SimpleMultiprocessingQueue)
+    unpickled_queue.__setstate__(test_queue.__getstate__())
+    assert unpickled_queue.get_serializer() is serializer
+    test_queue.put((1, 0.5))
+    assert unpickled_queue.get() == (1, 0.5)
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_SimpleMultiprocessingQueue__serializer_is_used_in_another_process():
+    test_queue = SimpleMultiprocessingQueue(serializer=StructSerializer("<qd"))
+    expected = [(i, i / 2) for i in range(10)]
+    p = multiprocessing.Process(target=_put_many_into_queue, args=(test_queue, expected))
+    p.start()
+    actual = [test_queue.get() for _ in range(len(expected))]
+    p.join()
+    assert actual == expected
+
+
 @pytest.mark.parametrize(
     ",".join(("test_queue", "test_size", "expected", "test_description")),
     [
@@ -153,20 +407,9 @@ def test_is_queue_eventually_of_size__given_empty_queue__when_called_with_1__ret
     mocked_qsize = mocker.patch.object(
         test_queue, "qsize", autospec=True, return_value=0
     )  # Eli (10/23/20: Mocking instead of spying on qsize so that this can be run on a Mac to check code coverage. As of today, MacOS has not implemented qsize().
+    mocker.patch.object(queue_utils, "_wait_for_queue_update", autospec=True, return_value=0.001)
     mocker.patch.object(
-        queue_utils,
-        "process_time",
-        autospec=True,
-        side_effect=[
-            0,
-            0.1,
-            0.15 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 1,
-            0.2 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 2,
-            0.3 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 3,
-            0.35 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 4,
-            0.4 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 5,
-            0.45 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 6,
-        ],
+        queue_utils, "perf_counter", autospec=True, side_effect=[0, 0.1, 0.2, 0.3, 0.35, 0.4, 0.45]
     )
     assert is_queue_eventually_of_size(test_queue, 1, timeout_seconds=0.41) is False
     assert mocked_qsize.call_count == 6
@@ -203,22 +446,10 @@ def test_is_queue_eventually_empty__returns_false_with_not_empty_threading_queue
 ):
     q = queue.Queue()
     mocked_empty = mocker.patch.object(q, "empty", autospec=True, return_value=False)
-    mocker.patch.object(
-        queue_utils,
-        "process_time",
-        autospec=True,
-        side_effect=[
-            0,
-            0.1,
-            0.15 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 1,
-            0.2 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 2,
-            0.3 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 3,
-            0.35 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 4,
-            0.4 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 5,
-        ],
-    )
+    mocker.patch.object(queue_utils, "_wait_for_queue_update", autospec=True, return_value=0.001)
+    mocker.patch.object(queue_utils, "perf_counter", autospec=True, side_effect=[0, 0.1, 0.2, 0.3, 0.4])
     assert is_queue_eventually_empty(q, timeout_seconds=0.36) is False
-    assert mocked_empty.call_count == 5
+    assert mocked_empty.call_count == 4
 
 
 def test_is_queue_eventually_empty__returns_true_after_multiple_attempts_with_eventually_empty_threading_queue(
@@ -265,18 +496,8 @@ def test_is_queue_eventually_not_empty__returns_false_with_empty_threading_queue
 ):
     q = queue.Queue()
     spied_empty = mocker.spy(q, "empty")
-    mocker.patch.object(
-        queue_utils,
-        "process_time",
-        autospec=True,
-        side_effect=[
-            0,
-            0.1,
-            0.15 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 1,
-            0.2 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 2,
-            0.3 - SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE * 3,
-        ],
-    )
+    mocker.patch.object(queue_utils, "_wait_for_queue_update", autospec=True, return_value=0.001)
+    mocker.patch.object(queue_utils, "perf_counter", autospec=True, side_effect=[0, 0.1, 0.2, 0.3])
     assert is_queue_eventually_not_empty(q, timeout_seconds=0.25) is False
     assert spied_empty.call_count == 3
 
@@ -290,6 +511,123 @@ def test_is_queue_eventually_not_empty__returns_true_after_multiple_attempts_wit
     assert mocked_empty.call_count == 4
 
 
+def test_is_queue_eventually_not_empty__returns_as_soon_as_threading_queue_is_populated_by_another_thread():
+    q = queue.Queue()
+    threading.Timer(0.01, q.put, args=("bob",)).start()
+    start = time.perf_counter()
+    assert is_queue_eventually_not_empty(q, timeout_seconds=5) is True
+    assert time.perf_counter() - start < SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
+
+
+def test_is_queue_eventually_empty__returns_as_soon_as_threading_queue_is_emptied_by_another_thread():
+    q = queue.Queue()
+    q.put("bill")
+    threading.Timer(0.01, q.get).start()
+    start = time.perf_counter()
+    assert is_queue_eventually_empty(q, timeout_seconds=5) is True
+    assert time.perf_counter() - start < SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
+
+
+@skip_on_mac
+def test_is_queue_eventually_of_size__returns_as_soon_as_multiprocessing_queue_is_populated():
+    q = multiprocessing.Queue()
+    threading.Timer(0.01, q.put, args=("bob",)).start()
+    assert is_queue_eventually_of_size(q, 1, timeout_seconds=5) is True
+
+
+def test_is_queue_eventually_empty__uses_wall_clock_time_for_timeout(mocker):
+    q = queue.Queue()
+    mocker.patch.object(q, "empty", autospec=True, return_value=False)
+    start = time.perf_counter()
+    assert is_queue_eventually_empty(q, timeout_seconds=0.1) is False
+    assert 0.1 <= time.perf_counter() - start < 0.1 + SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
+
+
+def _start_daemon_thread(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_is_queue_eventually_not_empty__does_not_prevent_thread_blocked_in_get_from_receiving_object(mocker):
+    # make sure the helper is waiting for the whole test, so it would be first in line for any notification
+    mocker.patch.object(queue_utils, "SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE", 5)
+    q = queue.Queue()
+    _start_daemon_thread(is_queue_eventually_not_empty, q, 1)
+    time.sleep(0.05)
+    received = list()
+    consumer = _start_daemon_thread(lambda: received.append(q.get()))
+    time.sleep(0.05)
+    q.put("blah")
+    consumer.join(2)
+    assert received == ["blah"]
+
+
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_is_queue_eventually_empty__does_not_prevent_thread_blocked_in_put_from_finishing(mocker):
+    # make sure the helper is waiting for the whole test, so it would be first in line for any notification
+    mocker.patch.object(queue_utils, "SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE", 5)
+    q = queue.Queue(maxsize=1)
+    q.put("first")
+    _start_daemon_thread(is_queue_eventually_empty, q, 1)
+    time.sleep(0.05)
+    producer = _start_daemon_thread(q.put, "second")
+    time.sleep(0.05)
+    assert q.get() == "first"
+    producer.join(2)
+    assert producer.is_alive() is False
+    assert q.get_nowait() == "second"
+
+
+@pytest.mark.parametrize(
+    ",".join(("test_queue", "test_description")),
+    [
+        (multiprocessing.Queue(), "multiprocessing queue"),
+        (SimpleMultiprocessingQueue(), "simple multiprocessing queue"),
+    ],
+)
+def test_wait_for_queue_update__polls_reader_of_empty_multiprocessing_queue_when_waiting_for_put(
+    test_queue, test_description, mocker
+):
+    mocked_poll = mocker.patch.object(
+        test_queue._reader, "poll", autospec=True  # pylint: disable=protected-access
+    )
+    actual = queue_utils._wait_for_queue_update(  # pylint: disable=protected-access
+        test_queue, True, True, 0.01, 0.002
+    )
+    assert actual == 0.002
+    mocked_poll.assert_called_once_with(0.01)
+
+
+@pytest.mark.parametrize(
+    ",".join(("test_queue", "is_waiting_for_put", "is_queue_empty", "test_description")),
+    [
+        (multiprocessing.Queue(), False, False, "multiprocessing queue waiting for a get"),
+        (multiprocessing.Queue(), True, False, "multiprocessing queue that already has data"),
+        (TestingQueue(), True, True, "TestingQueue"),
+        (queue.Queue(), True, True, "threading queue waiting for a put"),
+        (queue.Queue(), False, False, "threading queue waiting for a get"),
+    ],
+)
+def test_wait_for_queue_update__falls_back_to_sleeping_with_exponential_backoff(
+    test_queue, is_waiting_for_put, is_queue_empty, test_description, mocker
+):
+    mocked_sleep = mocker.patch.object(time, "sleep", autospec=True)
+    actual = queue_utils._wait_for_queue_update(  # pylint: disable=protected-access
+        test_queue, is_waiting_for_put, is_queue_empty, 5, 0.002
+    )
+    assert actual == 0.004
+    mocked_sleep.assert_called_once_with(0.002)
+
+    mocked_sleep.reset_mock()
+    actual = queue_utils._wait_for_queue_update(  # pylint: disable=protected-access
+        test_queue, is_waiting_for_put, is_queue_empty, 0.001, SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
+    )
+    assert actual == SECONDS_TO_SLEEP_BETWEEN_CHECKING_QUEUE_SIZE
+    mocked_sleep.assert_called_once_with(0.001)
+
+
 def test_safe_get__returns_expected_items():
     expected_items = ["item1", "item2", "item3"]
     actual_items = []
@@ -345,6 +683,88 @@ def test_drain_queue__used_default_queue_get_timeout_if_timeout_seconds_not_give
     assert spied_get.call_args[1]["timeout"] == QUEUE_CHECK_TIMEOUT_SECONDS
 
 
+@pytest.mark.parametrize(
+    ",".join(("test_queue", "test_description")),
+    [
+        (queue.Queue(), "threading queue"),
+        (multiprocessing.Queue(), "multiprocessing queue"),
+        (SimpleMultiprocessingQueue(), "simple multiprocessing queue"),
+        (TestingQueue(), "TestingQueue"),
+    ],
+)
+def test_drain_queue_nowait__returns_all_items_including_None(test_queue, test_description):
+    expected_items = [1, None, "three"]
+    for item in expected_items:
+        test_queue.put(item)
+    time.sleep(0.1)  # make sure the feeder thread of a multiprocessing queue has flushed all the objects
+    assert drain_queue_nowait(test_queue) == expected_items
+    assert test_queue.empty() is True
+
+
+def test_drain_queue_nowait__does_not_call_get_on_threading_queue(mocker):
+    q = queue.Queue()
+    for i in range(10):
+        q.put(i)
+    spied_get = mocker.spy(q, "get")
+    assert drain_queue_nowait(q) == list(range(10))
+    spied_get.assert_not_called()
+
+
+def test_drain_queue_nowait__preserves_ordering_of_priority_queue():
+    q = queue.PriorityQueue()
+    for i in (3, 1, 2):
+        q.put(i)
+    assert drain_queue_nowait(q) == [1, 2, 3]
+
+
+def test_drain_queue_nowait__notifies_threads_waiting_to_put_into_full_threading_queue():
+    q = queue.Queue(maxsize=1)
+    q.put("first")
+    putting_thread = threading.Thread(target=q.put, args=("second",))
+    putting_thread.start()
+    assert drain_queue_nowait(q) == ["first"]
+    putting_thread.join(timeout=1)
+    assert putting_thread.is_alive() is False
+    assert q.get_nowait() == "second"
+
+
+@pytest.mark.parametrize(
+    ",".join(("test_queue", "test_description")),
+    [
+        (queue.Queue(), "threading queue"),
+        (TestingQueue(), "TestingQueue"),
+    ],
+)
+def test_drain_queue_nowait__returns_no_more_than_max_items(test_queue, test_description):
+    for i in range(5):
+        test_queue.put(i)
+    assert drain_queue_nowait(test_queue, max_items=3) == [0, 1, 2]
+    assert drain_queue_nowait(test_queue, max_items=3) == [3, 4]
+
+
+def test_drain_queue_nowait__returns_immediately_if_queue_is_empty(mocker):
+    spied_is_queue_eventually_not_empty = mocker.spy(queue_utils, "is_queue_eventually_not_empty")
+    assert drain_queue_nowait(multiprocessing.Queue()) == []
+    spied_is_queue_eventually_not_empty.assert_not_called()
+
+
+def test_drain_queue_nowait__waits_for_items_to_arrive_during_settle_time():
+    q = multiprocessing.Queue()
+    q.put("first")
+    threading.Timer(0.05, q.put, args=("second",)).start()
+    assert drain_queue_nowait(q, settle_seconds=2) == ["first", "second"]
+
+
+def test_iter_queue_nowait__is_a_generator_that_gets_items_lazily():
+    q = TestingQueue()
+    q.put(1)
+    q.put(2)
+    items = iter_queue_nowait(q)
+    assert next(items) == 1
+    assert q.qsize() == 1
+    assert list(items) == [2]
+
+
 def test_put_object_into_queue_and_raise_error_if_eventually_still_empty__puts_object_into_queue():
     expected = "bob"
     q = Queue()
@@ -631,3 +1051,839 @@ def test_TestingQueue_empty__returns_correct_values():
     assert tq.empty() is False
     tq.get()
     assert tq.empty() is True
+
+
+def test_TestingQueue_put_many__adds_all_items_in_order():
+    tq = TestingQueue()
+    tq.put_many(iter([1, 2, 3]))
+    assert [tq.get_nowait() for _ in range(3)] == [1, 2, 3]
+
+
+def test_TestingQueue_get_many__returns_up_to_max_items():
+    tq = TestingQueue()
+    tq.put_many([1, 2, 3])
+    assert tq.get_many(max_items=2) == [1, 2]
+    assert tq.get_many() == [3]
+    assert tq.get_many() == []
+
+
+@pytest.mark.parametrize(
+    "wrapped_queue,test_description",
+    [
+        (Queue(), "threading queue"),
+        (multiprocessing.Queue(), "multiprocessing queue"),
+        (SimpleMultiprocessingQueue(), "SimpleMultiprocessingQueue"),
+        (TestingQueue(), "TestingQueue"),
+    ],
+)
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_InstrumentedQueue__passes_objects_through_wrapped_queue_and_counts_them(
+    wrapped_queue, test_description
+):
+    iq = InstrumentedQueue(wrapped_queue)
+    assert iq.get_wrapped_queue() is wrapped_queue
+    iq.put("a")
+    iq.put_nowait("b")
+    iq.put("c")
+    assert is_queue_eventually_not_empty(iq) is True
+    assert iq.get() == "a"
+    assert iq.get(timeout=1) == "b"
+    assert is_queue_eventually_not_empty(iq) is True
+    assert iq.get_nowait() == "c"
+    assert iq.empty() is True
+    snapshot = iq.snapshot()
+    assert snapshot["num_puts"] == 3
+    assert snapshot["num_gets"] == 3
+    assert snapshot["high_water_depth"] == 3
+    assert snapshot["residence_time_ns"]["min"] >= 0
+
+
+def test_InstrumentedQueue_put__passes_block_and_timeout_to_wrapped_queue():
+    wrapped_queue = Queue(maxsize=1)
+    iq = InstrumentedQueue(wrapped_queue)
+    iq.put(1, timeout=1)
+    with pytest.raises(queue.Full):
+        iq.put(2, block=False)
+    assert iq.qsize() == 1
+
+
+def test_InstrumentedQueue_snapshot__reports_rates_and_residence_time_percentiles_then_resets(mocker):
+    mocked_perf_counter_ns = mocker.patch.object(queue_utils.time, "perf_counter_ns", autospec=True)
+    mocked_perf_counter_ns.return_value = 0
+    iq = InstrumentedQueue(TestingQueue())
+    for _ in range(100):
+        iq.put_nowait("blah")
+    for i in range(100):
+        mocked_perf_counter_ns.return_value = (i + 1) * 1000
+        iq.get_nowait()
+    mocked_perf_counter_ns.return_value = 2 * 10**9
+
+    snapshot = iq.snapshot()
+    assert snapshot["start_timepoint_of_measurements"] == 0
+    assert snapshot["num_puts"] == 100
+    assert snapshot["num_gets"] == 100
+    assert snapshot["puts_per_second"] == 50
+    assert snapshot["gets_per_second"] == 50
+    assert snapshot["high_water_depth"] == 100
+    assert snapshot["residence_time_ns"] == {
+        "max": 100000,
+        "min": 1000,
+        "mean": 50500,
+        "p50": 50000,
+        "p90": 90000,
+        "p99": 99000,
+    }
+
+    mocked_perf_counter_ns.return_value = 3 * 10**9
+    snapshot = iq.snapshot()
+    assert snapshot["start_timepoint_of_measurements"] == 2 * 10**9
+    assert snapshot["num_puts"] == 0
+    assert snapshot["high_water_depth"] == 0
+    assert "residence_time_ns" not in snapshot
+
+
+def test_InstrumentedQueue__keeps_only_most_recent_residence_times():
+    iq = InstrumentedQueue(TestingQueue(), max_residence_time_samples=2)
+    for item in range(3):
+        iq.put(item)
+    for _ in range(3):
+        iq.get()
+    assert len(iq._residence_times_ns) == 2  # pylint: disable=protected-access
+
+
+def test_InstrumentedQueue__estimates_depth_from_local_counts_if_wrapped_queue_has_no_qsize(mocker):
+    wrapped_queue = multiprocessing.Queue()
+    mocker.patch.object(wrapped_queue, "qsize", autospec=True, side_effect=NotImplementedError)
+    iq = InstrumentedQueue(wrapped_queue)
+    iq.put(1)
+    iq.put(2)
+    iq.get(timeout=1)
+    iq.put(3)
+    assert iq.snapshot()["high_water_depth"] == 2
+    drain_queue(wrapped_queue)
+
+
+def test_InstrumentedQueue__resets_metrics_when_pickled():
+    iq = InstrumentedQueue(TestingQueue(), max_residence_time_samples=5)
+    iq.put(1)
+    unpickled_iq = pickle.loads(pickle.dumps(iq))
+    assert unpickled_iq.get() == 1
+    snapshot = unpickled_iq.snapshot()
+    assert snapshot["num_puts"] == 0
+    assert snapshot["num_gets"] == 1
+    assert unpickled_iq._max_residence_time_samples == 5  # pylint: disable=protected-access
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_InstrumentedQueue__measures_residence_time_of_objects_put_by_another_process():
+    iq = InstrumentedQueue(SimpleMultiprocessingQueue())
+    p = multiprocessing.Process(target=_put_many_into_queue_one_by_one, args=(iq, [1, 2]))
+    p.start()
+    assert [iq.get(timeout=5) for _ in range(2)] == [1, 2]
+    p.join()
+    snapshot = iq.snapshot()
+    assert snapshot["num_puts"] == 0
+    assert snapshot["num_gets"] == 2
+    assert snapshot["residence_time_ns"]["min"] >= 0
+
+
+def _put_many_into_queue_one_by_one(the_queue, items):
+    for item in items:
+        the_queue.put(item)
+
+
+def test_SimpleMultiprocessingQueue_get_reader_connection__returns_readable_connection_after_put():
+    test_queue = SimpleMultiprocessingQueue()
+    reader = test_queue.get_reader_connection()
+    assert reader.poll(0) is False
+    test_queue.put(1)
+    assert reader.poll(1) is True
+
+
+def test_MultiprocessingPriorityQueue__returns_highest_priority_object_available_first():
+    test_queue = MultiprocessingPriorityQueue(num_priority_levels=3)
+    assert test_queue.get_num_priority_levels() == 3
+    test_queue.put("data 1", priority=2)
+    test_queue.put("data 2", priority=2)
+    test_queue.put_nowait("reconfigure", priority=1)
+    test_queue.put("stop")
+    assert test_queue.qsize() == 4
+    assert test_queue.qsize_of_priority_level(2) == 2
+    assert [test_queue.get_nowait() for _ in range(4)] == ["stop", "reconfigure", "data 1", "data 2"]
+    assert test_queue.qsize() == 0
+    assert test_queue.empty() is True
+
+
+def test_MultiprocessingPriorityQueue_get_nowait__raises_error_if_empty():
+    with pytest.raises(queue.Empty):
+        MultiprocessingPriorityQueue().get_nowait()
+
+
+def test_MultiprocessingPriorityQueue_get__raises_error_if_not_blocking_and_empty():
+    with pytest.raises(queue.Empty):
+        MultiprocessingPriorityQueue().get(block=False)
+
+
+def test_MultiprocessingPriorityQueue_get__raises_error_if_still_empty_after_timeout():
+    test_queue = MultiprocessingPriorityQueue()
+    start = time.perf_counter()
+    with pytest.raises(queue.Empty):
+        test_queue.get(timeout=0.05)
+    assert time.perf_counter() - start >= 0.05
+
+
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_MultiprocessingPriorityQueue_get__waits_for_object_put_into_any_level():
+    test_queue = MultiprocessingPriorityQueue(num_priority_levels=2)
+    threading.Timer(0.01, test_queue.put, args=("blah",), kwargs={"priority": 1}).start()
+    assert test_queue.get() == "blah"
+
+
+def test_MultiprocessingPriorityQueue__uses_given_serializer():
+    test_queue = MultiprocessingPriorityQueue(serializer=MARSHAL_SERIALIZER)
+    test_queue.put({"a": 1}, priority=1)
+    assert test_queue.get(timeout=1) == {"a": 1}
+
+
+def test_MultiprocessingPriorityQueue_put__does_not_count_object_that_cannot_be_serialized():
+    test_queue = MultiprocessingPriorityQueue()
+    with pytest.raises(TypeError, match="pickle"):
+        test_queue.put(threading.Lock(), priority=1)
+    assert test_queue.qsize() == 0
+    assert test_queue.qsize_of_priority_level(1) == 0
+    assert is_queue_eventually_of_size(test_queue, 0, timeout_seconds=0) is True
+
+
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_MultiprocessingPriorityQueue__is_compatible_with_queue_utils_helpers():
+    test_queue = MultiprocessingPriorityQueue()
+    assert is_queue_eventually_empty(test_queue) is True
+    threading.Timer(0.01, test_queue.put, args=("blah",)).start()
+    assert is_queue_eventually_not_empty(test_queue) is True
+    test_queue.put("low", priority=1)
+    assert is_queue_eventually_of_size(test_queue, 2) is True
+    assert drain_queue(test_queue, timeout_seconds=0.01) == ["blah", "low"]
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_MultiprocessingPriorityQueue__receives_objects_from_another_process():
+    test_queue = MultiprocessingPriorityQueue()
+    p = multiprocessing.Process(target=_put_data_then_command_into_priority_queue, args=(test_queue,))
+    p.start()
+    p.join()
+    assert test_queue.qsize() == 11
+    assert test_queue.get(timeout=5) == "stop"
+    assert drain_queue_nowait(test_queue) == list(range(10))
+
+
+def _put_data_then_command_into_priority_queue(the_queue):
+    for i in range(10):
+        the_queue.put(i, priority=1)
+    the_queue.put("stop", priority=0)
+
+
+@pytest.mark.parametrize("queue_class", [BoundedQueue, BoundedMultiprocessingQueue])
+def test_bounded_queues__raise_error_if_overflow_policy_not_recognized(queue_class):
+    with pytest.raises(UnrecognizedOverflowPolicyError, match="fake_policy"):
+        queue_class(1, overflow_policy="fake_policy")
+
+
+@pytest.mark.parametrize("queue_class", [BoundedQueue, BoundedMultiprocessingQueue])
+def test_bounded_queues__raise_error_if_maxsize_is_not_positive(queue_class):
+    with pytest.raises(ValueError, match="must be positive, not 0"):
+        queue_class(0)
+
+
+@pytest.mark.parametrize(
+    "overflow_policy,expected_items,expected_num_dropped,test_description",
+    [
+        (OVERFLOW_POLICY_DROP_NEWEST, [0, 1, 2], 7, "keeps the first items"),
+        (OVERFLOW_POLICY_DROP_OLDEST, [7, 8, 9], 7, "keeps the last items"),
+        (
+            OVERFLOW_POLICY_KEEP_EVERY_NTH,
+            [2, 5, 8],
+            7,
+            "replaces the oldest item with every 3rd overflowing item",
+        ),
+    ],
+)
+@pytest.mark.parametrize("queue_class", [BoundedQueue, BoundedMultiprocessingQueue])
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_bounded_queues__handle_overflow_according_to_policy(
+    queue_class, overflow_policy, expected_items, expected_num_dropped, test_description
+):
+    test_queue = queue_class(3, overflow_policy=overflow_policy, keep_every_nth=3)
+    assert test_queue.get_overflow_policy() == overflow_policy
+    for item in range(10):
+        test_queue.put(item)
+    assert test_queue.qsize() == 3
+    assert test_queue.get_num_dropped() == expected_num_dropped
+    assert [test_queue.get(timeout=1) for _ in range(3)] == expected_items
+    assert test_queue.empty() is True
+
+
+@pytest.mark.parametrize("queue_class", [BoundedQueue, BoundedMultiprocessingQueue])
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_bounded_queues__block_policy_raises_error_if_full(queue_class):
+    test_queue = queue_class(1)
+    assert test_queue.get_overflow_policy() == OVERFLOW_POLICY_BLOCK
+    test_queue.put(1)
+    with pytest.raises(queue.Full):
+        test_queue.put_nowait(2)
+    with pytest.raises(queue.Full):
+        test_queue.put(2, timeout=0.01)
+    assert test_queue.get_num_dropped() == 0
+    assert test_queue.get_nowait() == 1
+
+
+@pytest.mark.parametrize("queue_class", [BoundedQueue, BoundedMultiprocessingQueue])
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_bounded_queues__block_policy_waits_for_space(queue_class):
+    test_queue = queue_class(1)
+    test_queue.put(1)
+    threading.Timer(0.01, test_queue.get).start()
+    test_queue.put(2)
+    assert test_queue.get(timeout=1) == 2
+
+
+def test_BoundedQueue__discarded_items_do_not_count_towards_join():
+    test_queue = BoundedQueue(1, overflow_policy=OVERFLOW_POLICY_DROP_OLDEST)
+    test_queue.put(1)
+    test_queue.put(2)
+    test_queue.get()
+    test_queue.task_done()
+    test_queue.join()
+
+
+def test_BoundedMultiprocessingQueue__get_maxsize__returns_value_from_init():
+    assert BoundedMultiprocessingQueue(5).get_maxsize() == 5
+
+
+def test_BoundedMultiprocessingQueue__does_not_drop_anything_if_consumer_retrieves_oldest_item_first(mocker):
+    test_queue = BoundedMultiprocessingQueue(1, overflow_policy=OVERFLOW_POLICY_DROP_OLDEST)
+    test_queue.put(1)
+    original_get = test_queue._queue.get  # pylint: disable=protected-access
+
+    def get_as_if_a_consumer_retrieved_the_item_first(*args, **kwargs):
+        assert original_get(block=False) == 1
+        test_queue._release_space()  # pylint: disable=protected-access
+        return original_get(*args, **kwargs)
+
+    mocker.patch.object(
+        test_queue._queue,  # pylint: disable=protected-access
+        "get",
+        autospec=True,
+        side_effect=get_as_if_a_consumer_retrieved_the_item_first,
+    )
+    test_queue.put(2)
+    assert test_queue.get_num_dropped() == 0
+    assert test_queue.qsize() == 1
+    mocker.stopall()
+    assert test_queue.get_nowait() == 2
+
+
+def test_BoundedMultiprocessingQueue__waits_for_oldest_item_still_being_put_by_another_producer(mocker):
+    test_queue = BoundedMultiprocessingQueue(1, overflow_policy=OVERFLOW_POLICY_DROP_OLDEST)
+    test_queue.put(1)
+    original_get = test_queue._queue.get  # pylint: disable=protected-access
+    mocked_get = mocker.patch.object(
+        test_queue._queue,  # pylint: disable=protected-access
+        "get",
+        autospec=True,
+        side_effect=[queue.Empty(), original_get(block=False)],
+    )
+    test_queue.put(2)
+    assert mocked_get.call_count == 2
+    assert test_queue.get_num_dropped() == 1
+    mocker.stopall()
+    assert test_queue.get_nowait() == 2
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_BoundedMultiprocessingQueue__shares_counters_with_another_process():
+    test_queue = BoundedMultiprocessingQueue(2, overflow_policy=OVERFLOW_POLICY_DROP_NEWEST)
+    p = multiprocessing.Process(target=_put_many_into_queue_one_by_one, args=(test_queue, list(range(5))))
+    p.start()
+    p.join()
+    assert test_queue.get_num_dropped() == 3
+    assert test_queue.qsize() == 2
+    assert drain_queue_nowait(test_queue) == [0, 1]
+
+
+skip_on_windows = pytest.mark.skipif(
+    sys.platform.startswith("win"), reason="Windows event loops do not support add_reader with pipes"
+)
+
+
+@skip_on_windows
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_AsyncQueueAdapter_get__returns_object_already_in_queue_without_registering_reader():
+    test_queue = SimpleMultiprocessingQueue()
+    adapter = AsyncQueueAdapter(test_queue)
+    assert adapter.get_wrapped_queue() is test_queue
+    test_queue.put("blah")
+    assert asyncio.run(adapter.get()) == "blah"
+    assert adapter._loop is None  # pylint: disable=protected-access
+
+
+@skip_on_windows
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_AsyncQueueAdapter_get__resolves_when_object_is_put_by_another_process():
+    test_queue = SimpleMultiprocessingQueue()
+    adapter = AsyncQueueAdapter(test_queue)
+
+    async def get_from_other_process():
+        p = multiprocessing.Process(target=_put_many_into_queue_one_by_one, args=(test_queue, ["a", "b"]))
+        p.start()
+        items = [await adapter.get(), await adapter.get()]
+        p.join()
+        return items
+
+    assert asyncio.run(get_from_other_process()) == ["a", "b"]
+    assert adapter._loop is None  # pylint: disable=protected-access
+    assert adapter.empty() is True
+
+
+@skip_on_windows
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_AsyncQueueAdapter_get__wakes_all_waiting_coroutines():
+    test_queue = SimpleMultiprocessingQueue()
+    adapter = AsyncQueueAdapter(test_queue)
+
+    async def get_concurrently():
+        tasks = [asyncio.ensure_future(adapter.get()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        test_queue.put_many([1, 2, 3])
+        return await asyncio.gather(*tasks)
+
+    assert sorted(asyncio.run(get_concurrently())) == [1, 2, 3]
+
+
+@skip_on_windows
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_AsyncQueueAdapter_get__unregisters_reader_when_cancelled():
+    test_queue = SimpleMultiprocessingQueue()
+    adapter = AsyncQueueAdapter(test_queue)
+
+    async def get_with_timeout():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(adapter.get(), timeout=0.01)
+
+    asyncio.run(get_with_timeout())
+    assert adapter._loop is None  # pylint: disable=protected-access
+    test_queue.put("blah")
+    assert adapter.get_nowait() == "blah"
+
+
+@skip_on_windows
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_AsyncQueueAdapter_get__keeps_reader_registered_while_other_coroutines_are_waiting():
+    test_queue = SimpleMultiprocessingQueue()
+    adapter = AsyncQueueAdapter(test_queue)
+
+    async def cancel_one_of_two_waiters():
+        cancelled_task = asyncio.ensure_future(adapter.get())
+        remaining_task = asyncio.ensure_future(adapter.get())
+        await asyncio.sleep(0.01)
+        cancelled_task.cancel()
+        await asyncio.sleep(0.01)
+        assert adapter._loop is not None  # pylint: disable=protected-access
+        test_queue.put("blah")
+        return await remaining_task
+
+    assert asyncio.run(cancel_one_of_two_waiters()) == "blah"
+
+
+@skip_on_windows
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_AsyncQueueAdapter__does_not_wake_waiter_that_was_already_cancelled():
+    test_queue = SimpleMultiprocessingQueue()
+    adapter = AsyncQueueAdapter(test_queue)
+
+    async def cancel_waiter_then_make_readable():
+        task = asyncio.ensure_future(adapter.get())
+        await asyncio.sleep(0.01)
+        adapter._waiters[0].cancel()  # pylint: disable=protected-access
+        adapter._on_readable()  # pylint: disable=protected-access
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_waiter_then_make_readable())
+
+
+def test_AsyncQueueAdapter__raises_error_if_removing_reader_that_was_not_registered():
+    adapter = AsyncQueueAdapter(SimpleMultiprocessingQueue())
+    with pytest.raises(NotImplementedError, match="should always be registered"):
+        adapter._remove_reader()  # pylint: disable=protected-access
+
+
+def test_wait_for_any__raises_error_if_no_queues_given():
+    with pytest.raises(ValueError, match="At least one queue"):
+        wait_for_any([])
+
+
+@pytest.mark.parametrize(
+    "queues,test_description",
+    [
+        ([Queue(), Queue()], "threading queues"),
+        ([multiprocessing.Queue(), SimpleMultiprocessingQueue()], "multiprocessing queues"),
+        (
+            [MultiprocessingPriorityQueue(), BoundedMultiprocessingQueue(2)],
+            "queues with multiple connections",
+        ),
+        ([Queue(), multiprocessing.Queue(), TestingQueue()], "mixed queues"),
+        ([TestingQueue()], "a queue that can only be polled"),
+        ([Queue()], "a single threading queue"),
+    ],
+)
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_wait_for_any__returns_empty_list_after_timeout_if_all_queues_are_empty(queues, test_description):
+    start = time.perf_counter()
+    assert wait_for_any(queues, timeout_seconds=0.05) == []
+    assert time.perf_counter() - start >= 0.05
+
+
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_wait_for_any__returns_immediately_with_all_queues_that_are_not_empty():
+    queues = [Queue(), SimpleMultiprocessingQueue(), TestingQueue(), multiprocessing.Queue()]
+    queues[1].put(1)
+    queues[2].put(2)
+    assert wait_for_any(queues) == [queues[1], queues[2]]
+
+
+@pytest.mark.parametrize(
+    "timeout_seconds,put_object,expected_index,test_description",
+    [
+        (None, True, 1, "a queue is already not empty"),
+        (0, False, None, "the timeout is zero"),
+    ],
+)
+def test_wait_for_any__does_not_wait_when_no_wait_is_needed(
+    timeout_seconds, put_object, expected_index, test_description, mocker
+):
+    mocked_sleep = mocker.patch.object(time, "sleep", autospec=True)
+    queues = [Queue(), TestingQueue(), Queue()]
+    if put_object:
+        queues[1].put(1)
+    expected = [] if expected_index is None else [queues[expected_index]]
+    assert wait_for_any(queues, timeout_seconds=timeout_seconds) == expected
+    mocked_sleep.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "queues,index_to_put_into,test_description",
+    [
+        ([Queue(), Queue()], 1, "second of two threading queues"),
+        ([Queue()], 0, "a single threading queue"),
+        ([SimpleMultiprocessingQueue(), multiprocessing.Queue()], 1, "multiprocessing queue"),
+        ([Queue(), SimpleMultiprocessingQueue()], 0, "threading queue mixed with a multiprocessing queue"),
+        ([Queue(), SimpleMultiprocessingQueue()], 1, "multiprocessing queue mixed with a threading queue"),
+        ([Queue(), TestingQueue()], 1, "queue that can only be polled"),
+        ([TestingQueue()], 0, "only a queue that can only be polled"),
+    ],
+)
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_wait_for_any__returns_queue_that_an_object_is_put_into_while_waiting(
+    queues, index_to_put_into, test_description
+):
+    threading.Timer(0.02, queues[index_to_put_into].put, args=("blah",)).start()
+    assert wait_for_any(queues, timeout_seconds=2) == [queues[index_to_put_into]]
+    assert queues[index_to_put_into].get(timeout=1) == "blah"
+
+
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_wait_for_any__keeps_waiting_if_another_consumer_empties_a_threading_queue_first():
+    contested_queue = Queue()
+    other_queue = Queue()
+
+    def put_then_get_before_caller_and_put_into_other_queue():
+        contested_queue.put("taken")
+        contested_queue.get()
+        time.sleep(0.02)
+        other_queue.put("blah")
+
+    threading.Timer(0.02, put_then_get_before_caller_and_put_into_other_queue).start()
+    assert wait_for_any([contested_queue, other_queue], timeout_seconds=2) == [other_queue]
+
+
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_wait_for_any__wakes_up_threads_already_blocked_on_the_queue_when_finished():
+    threading_queue = Queue()
+    mp_queue = SimpleMultiprocessingQueue()
+    received = list()
+    consumer = threading.Thread(target=lambda: received.append(threading_queue.get()))
+    consumer.start()
+    mp_queue.put(1)
+    assert wait_for_any([threading_queue, mp_queue]) == [mp_queue]
+    threading_queue.put("blah")
+    consumer.join()
+    assert received == ["blah"]
+
+
+@pytest.mark.parametrize(
+    "num_queues,test_description",
+    [(1, "a single threading queue"), (2, "several threading queues")],
+)
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_wait_for_any__does_not_prevent_thread_blocked_in_get_from_receiving_object(
+    num_queues, test_description
+):
+    queues = [Queue() for _ in range(num_queues)]
+    threading.Thread(target=wait_for_any, args=(queues, 1), daemon=True).start()
+    time.sleep(0.05)
+    received = list()
+    consumer = threading.Thread(target=lambda: received.append(queues[0].get()), daemon=True)
+    consumer.start()
+    time.sleep(0.05)
+    queues[0].put("blah")
+    consumer.join(2)
+    assert received == ["blah"]
+
+
+@pytest.mark.timeout(5)  # set a timeout because the test can hang as a failure mode
+def test_wait_for_any__polls_threading_queue_with_exponential_backoff(mocker):
+    test_queue = Queue()
+    mocker.patch.object(test_queue, "empty", autospec=True, side_effect=[True, True, False])
+    mocked_sleep = mocker.patch.object(time, "sleep", autospec=True)
+    assert wait_for_any([test_queue]) == [test_queue]
+    assert [call.args[0] for call in mocked_sleep.call_args_list] == [0.001, 0.002]
+
+
+def test_StructRecordQueue__puts_and_gets_individual_records():
+    q = StructRecordQueue("<qhd")
+    assert q.get_struct_format() == "<qhd"
+    assert q.get_record_size() == 18
+    q.put((1000, 3, 0.5))
+    q.put_many([(2000, 4, 1.5), (3000, 5, 2.5)])
+    assert q.get(timeout=QUEUE_CHECK_TIMEOUT_SECONDS) == (1000, 3, 0.5)
+    assert q.get_many() == [(2000, 4, 1.5), (3000, 5, 2.5)]
+    assert q.empty() is True
+
+
+def test_StructRecordQueue_get_buffer__returns_a_whole_message_of_packed_records():
+    q = StructRecordQueue("<qhd")
+    q.put_many([(1000, 3, 0.5), (2000, 4, 1.5)])
+    buffer = q.get_buffer(timeout=QUEUE_CHECK_TIMEOUT_SECONDS)
+    assert isinstance(buffer, memoryview)
+    assert buffer.nbytes == 36
+    assert list(StructSerializer("<qhd").loads_many(buffer)) == [(1000, 3, 0.5), (2000, 4, 1.5)]
+
+
+def test_StructRecordQueue_get_buffer__returns_records_remaining_from_partially_consumed_message_first():
+    q = StructRecordQueue("<qq")
+    q.put_many([(1, 10), (2, 20), (3, 30)])
+    q.put_many([(4, 40)])
+    assert q.get(timeout=QUEUE_CHECK_TIMEOUT_SECONDS) == (1, 10)
+    assert StructSerializer("<qq").loads_many(q.get_buffer()) == [(2, 20), (3, 30)]
+    assert StructSerializer("<qq").loads_many(q.get_buffer(timeout=QUEUE_CHECK_TIMEOUT_SECONDS)) == [(4, 40)]
+
+
+def test_StructRecordQueue_get_buffer__raises_error_if_no_records_are_available():
+    q = StructRecordQueue("<qq")
+    with pytest.raises(queue.Empty):
+        q.get_buffer(block=False)
+    with pytest.raises(queue.Empty):
+        q.get_buffer(timeout=0.01)
+
+
+def test_StructRecordQueue_put_packed__sends_array_and_get_array__returns_fields_of_all_records():
+    q = StructRecordQueue("<3d")
+    assert q.get_array_typecode() == "d"
+    readings = array.array("d", [0.0, 1, 0.5, 1.0, 2, 1.5, 2.0, 3, 2.5])
+    q.put_packed(readings)
+    actual = q.get_array(timeout=QUEUE_CHECK_TIMEOUT_SECONDS)
+    assert actual == readings
+    assert actual[2::3] == array.array("d", [0.5, 1.5, 2.5])
+
+
+def test_StructRecordQueue_put_packed__accepts_bytes_and_ignores_empty_buffers():
+    q = StructRecordQueue("<qq")
+    q.put_packed(b"")
+    assert q.empty() is True
+    q.put_packed(StructSerializer("<qq").dumps_many([(1, 2), (3, 4)]))
+    assert q.get_many() == [(1, 2), (3, 4)]
+
+
+def test_StructRecordQueue_put_packed__raises_error_if_buffer_contains_partial_record():
+    q = StructRecordQueue("<qq")
+    with pytest.raises(ValueError, match="records of 16 bytes, but it is 24 bytes"):
+        q.put_packed(array.array("q", [1, 2, 3]))
+    assert q.empty() is True
+
+
+def test_StructRecordQueue_get_array__swaps_bytes_of_non_native_byte_order():
+    non_native_byte_order = ">" if sys.byteorder == "little" else "<"
+    q = StructRecordQueue(f"{non_native_byte_order}2d")
+    q.put_many([(0.5, 1.5), (2.5, 3.5)])
+    assert q.get_array(timeout=QUEUE_CHECK_TIMEOUT_SECONDS) == array.array("d", [0.5, 1.5, 2.5, 3.5])
+
+
+def test_StructRecordQueue_get_array__raises_error_if_fields_are_different_types():
+    q = StructRecordQueue("<qhd")
+    assert q.get_array_typecode() is None
+    q.put((1, 2, 3.0))
+    with pytest.raises(ValueError, match="'<qhd' cannot be converted to an array"):
+        q.get_array(block=False)
+    assert q.get_nowait() == (1, 2, 3.0)
+
+
+@pytest.mark.parametrize(
+    "struct_format,expected,test_description",
+    [
+        ("<qqq", ("q", False), "repeated field"),
+        ("2q", ("q", False), "native byte order"),
+        ("=4H", ("H", False), "native byte order with standard sizes"),
+        ("<qhd", (None, False), "different fields"),
+        ("<l", (None, False), "standard size does not match array item size"),
+        ("<?", (None, False), "no matching array typecode"),
+        ("!i", ("i", sys.byteorder == "little"), "network byte order"),
+    ],
+)
+def test_get_array_typecode_of_struct_format__returns_typecode_and_whether_bytes_must_be_swapped(
+    struct_format, expected, test_description
+):
+    assert queue_utils._get_array_typecode_of_struct_format(struct_format) == expected
+
+
+def test_StructRecordQueue__setstate__restores_record_layout_when_pickled_for_another_process(mocker):
+    # pickling a queue is only allowed while spawning a process
+    mocker.patch.object(multiprocessing.queues.context, "assert_spawning", autospec=True)
+    q = StructRecordQueue("<2q")
+    unpickled_queue = StructRecordQueue.__new__(StructRecordQueue)
+    unpickled_queue.__setstate__(q.__getstate__())
+    assert unpickled_queue.get_record_size() == 16
+    assert unpickled_queue.get_array_typecode() == "q"
+    q.put_packed(array.array("q", [1, 2]))
+    assert unpickled_queue.get_array(timeout=QUEUE_CHECK_TIMEOUT_SECONDS) == array.array("q", [1, 2])
+
+
+def _put_packed_readings_into_queue(the_queue, num_records):
+    the_queue.put_packed(array.array("q", range(num_records * 2)))
+
+
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_StructRecordQueue__can_send_records_from_another_process():
+    q = StructRecordQueue("<qq")
+    p = multiprocessing.Process(target=_put_packed_readings_into_queue, args=(q, 100000))
+    p.start()
+    actual = q.get_array(timeout=10)
+    p.join()
+    assert actual == array.array("q", range(200000))
+    assert q.get_record_size() == 16
+    assert q.get_array_typecode() == "q"
+
+
+def test_DiskSpillingQueue__keeps_objects_in_memory_below_threshold(tmp_path):
+    q = DiskSpillingQueue(max_items_in_memory=3, spill_folder=str(tmp_path))
+    assert q.get_max_items_in_memory() == 3
+    assert q.get_spill_folder() == str(tmp_path)
+    for i in range(3):
+        q.put(i)
+    assert q.qsize() == 3
+    assert q.get_segment_file_paths() == []
+    assert q.get_spill_stats()["num_spilled"] == 0
+    assert drain_queue_nowait(q) == [0, 1, 2]
+
+
+def test_DiskSpillingQueue__spills_objects_beyond_threshold_to_disk_and_retrieves_them_in_order(tmp_path):
+    q = DiskSpillingQueue(max_items_in_memory=2, spill_folder=str(tmp_path))
+    for i in range(10):
+        q.put_nowait({"index": i})
+    assert q.qsize() == 10
+    segment_file_paths = q.get_segment_file_paths()
+    assert len(segment_file_paths) == 1
+    assert os.path.dirname(segment_file_paths[0]) == str(tmp_path)
+    stats = q.get_spill_stats()
+    assert stats["num_spilled"] == 8
+    assert stats["num_items_on_disk"] == 8
+    assert stats["spilled_bytes"] == 8 * len(HIGHEST_PROTOCOL_PICKLE_SERIALIZER.dumps({"index": 0}))
+    assert stats["disk_bytes_in_use"] == 2**26
+
+    assert [q.get(timeout=QUEUE_CHECK_TIMEOUT_SECONDS) for _ in range(10)] == [
+        {"index": i} for i in range(10)
+    ]
+    assert q.empty() is True
+    assert os.listdir(tmp_path) == []
+    stats = q.get_spill_stats()
+    assert stats["num_items_on_disk"] == 0
+    assert stats["disk_bytes_in_use"] == 0
+    assert stats["num_segments_created"] == 1
+    assert stats["num_segments_reclaimed"] == 1
+    assert set(stats["disk_read_latency_ns"].keys()) == {"max", "min", "mean", "p50", "p90", "p99"}
+
+
+def test_DiskSpillingQueue__keeps_spilling_until_disk_is_drained_so_order_is_preserved(tmp_path):
+    q = DiskSpillingQueue(max_items_in_memory=2, spill_folder=str(tmp_path), serializer=MARSHAL_SERIALIZER)
+    for i in range(4):
+        q.put(i)
+    assert q.get_nowait() == 0
+    q.put(4)  # there is space in memory again, but 2 and 3 are still on disk
+    assert q.get_spill_stats()["num_spilled"] == 3
+    assert drain_queue_nowait(q) == [1, 2, 3, 4]
+    q.put(5)
+    assert q.get_spill_stats()["num_spilled"] == 3
+    assert q.get_nowait() == 5
+
+
+def test_DiskSpillingQueue__starts_new_segments_when_full_and_reclaims_each_once_read(tmp_path):
+    record_size = len(MARSHAL_SERIALIZER.dumps(b"a" * 100))
+    q = DiskSpillingQueue(
+        max_items_in_memory=1,
+        spill_folder=str(tmp_path),
+        segment_size_bytes=2 * (4 + record_size),
+        serializer=MARSHAL_SERIALIZER,
+    )
+    for _ in range(7):
+        q.put(b"a" * 100)
+    assert len(os.listdir(tmp_path)) == 3
+    assert q.get_spill_stats()["num_segments_created"] == 3
+    for _ in range(4):
+        q.get_nowait()
+    assert len(os.listdir(tmp_path)) == 2
+    assert q.get_spill_stats()["num_segments_reclaimed"] == 1
+    assert len(drain_queue_nowait(q)) == 3
+    assert os.listdir(tmp_path) == []
+
+
+def test_DiskSpillingQueue__writes_object_larger_than_segment_size_to_its_own_segment(tmp_path):
+    q = DiskSpillingQueue(max_items_in_memory=1, spill_folder=str(tmp_path), segment_size_bytes=64)
+    large_object = b"a" * 1000
+    q.put(1)
+    q.put(2)
+    q.put(large_object)
+    stats = q.get_spill_stats()
+    assert stats["num_segments_created"] == 2
+    assert stats["disk_bytes_in_use"] == 64 + 4 + len(HIGHEST_PROTOCOL_PICKLE_SERIALIZER.dumps(large_object))
+    assert drain_queue_nowait(q) == [1, 2, large_object]
+
+
+def test_DiskSpillingQueue_close__deletes_segment_files(tmp_path):
+    q = DiskSpillingQueue(max_items_in_memory=1, spill_folder=str(tmp_path))
+    for i in range(3):
+        q.put(i)
+    q.close()
+    assert os.listdir(tmp_path) == []
+    assert q.qsize() == 1
+    assert q.get_nowait() == 0
+
+
+def test_DiskSpillingQueue__defaults_to_temporary_folder():
+    q = DiskSpillingQueue()
+    assert q.get_spill_folder() == tempfile.gettempdir()
+    assert q.get_max_items_in_memory() == 10000
+
+
+def test_DiskSpillingQueue__raises_error_if_threshold_is_not_positive():
+    with pytest.raises(ValueError, match="must be positive, not 0"):
+        DiskSpillingQueue(max_items_in_memory=0)
+
+
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_DiskSpillingQueue__absorbs_burst_from_producer_thread(tmp_path):
+    q = DiskSpillingQueue(max_items_in_memory=100, spill_folder=str(tmp_path), segment_size_bytes=4096)
+    producer = threading.Thread(target=_put_many_into_queue_one_by_one, args=(q, list(range(5000))))
+    producer.start()
+    actual = [q.get(timeout=5) for _ in range(5000)]
+    producer.join()
+    assert actual == list(range(5000))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import json
+import pickle
+
+import pytest
+from stdlib_utils import CompressingSerializer
+from stdlib_utils import DEFAULT_PICKLE_SERIALIZER
+from stdlib_utils import HIGHEST_PROTOCOL_PICKLE_SERIALIZER
+from stdlib_utils import MARSHAL_SERIALIZER
+from stdlib_utils import MarshalSerializer
+from stdlib_utils import PickleSerializer
+from stdlib_utils import Serializer
+from stdlib_utils import StructSerializer
+
+
+def test_Serializer__dumps_and_loads_must_be_implemented_by_subclasses():
+    serializer = Serializer()
+    with pytest.raises(NotImplementedError, match="dumps"):
+        serializer.dumps(1)
+    with pytest.raises(NotImplementedError, match="loads"):
+        serializer.loads(b"")
+
+
+def test_Serializer__get_name__defaults_to_class_name():
+    class MySerializer(Serializer):
+        pass
+
+    assert MySerializer().get_name() == "MySerializer"
+
+
+@pytest.mark.parametrize(
+    "serializer,expected_protocol,expected_name,test_description",
+    [
+        (DEFAULT_PICKLE_SERIALIZER, pickle.DEFAULT_PROTOCOL, "pickle", "default"),
+        (HIGHEST_PROTOCOL_PICKLE_SERIALIZER, pickle.HIGHEST_PROTOCOL, "pickle", "highest protocol"),
+        (MARSHAL_SERIALIZER, None, "marshal", "marshal"),
+    ],
+)
+def test_built_in_serializers__round_trip_plain_data(
+    serializer, expected_protocol, expected_name, test_description
+):
+    obj = {"command": "start", "values": [1, 2.5, None, True], "raw": b"\x00\xff", "nested": {"a": (1, 2)}}
+    assert serializer.loads(serializer.dumps(obj)) == obj
+    assert serializer.loads_many(serializer.dumps_many([obj, 1])) == [obj, 1]
+    assert serializer.get_name().startswith(expected_name)
+    if expected_protocol is not None:
+        assert serializer.get_protocol() == expected_protocol
+
+
+def test_PickleSerializer__uses_given_protocol():
+    serializer = PickleSerializer(protocol=2)
+    assert serializer.get_protocol() == 2
+    assert serializer.get_name() == "pickle (protocol 2)"
+    assert bytes(serializer.dumps("blah"))[:2] == b"\x80\x02"
+
+
+def test_PickleSerializer__handles_exceptions():
+    serialized = DEFAULT_PICKLE_SERIALIZER.dumps(ValueError("blah"))
+    assert str(DEFAULT_PICKLE_SERIALIZER.loads(serialized)) == "blah"
+
+
+def test_MarshalSerializer__raises_error_for_objects_that_are_not_plain_data():
+    with pytest.raises(ValueError):
+        MARSHAL_SERIALIZER.dumps(ValueError("blah"))
+
+
+def test_StructSerializer__round_trips_tuples():
+    serializer = StructSerializer("<qd")
+    assert serializer.get_struct_format() == "<qd"
+    assert serializer.get_name() == "struct (<qd)"
+    serialized = serializer.dumps((5, 1.5))
+    assert len(serialized) == 16
+    assert serializer.loads(serialized) == (5, 1.5)
+
+
+def test_StructSerializer__packs_batches_as_consecutive_records():
+    serializer = StructSerializer("<qd")
+    serialized = serializer.dumps_many([(1, 0.5), (2, 1.5), (3, 2.5)])
+    assert len(serialized) == 48
+    assert serializer.loads_many(memoryview(serialized)) == [(1, 0.5), (2, 1.5), (3, 2.5)]
+
+
+def test_StructSerializer__can_be_pickled():
+    serializer = pickle.loads(pickle.dumps(StructSerializer("<Ih")))
+    assert serializer.get_struct_format() == "<Ih"
+    assert serializer.loads(serializer.dumps((7, -1))) == (7, -1)
+
+
+def _create_compressible_message():
+    return json.dumps([{"well_index": i, "value": 0.5, "status": "ok"} for i in range(1000)])
+
+
+def test_CompressingSerializer__defaults_to_pickling():
+    serializer = CompressingSerializer()
+    assert serializer.get_serializer() is DEFAULT_PICKLE_SERIALIZER
+    assert serializer.can_serialize_any_picklable_object() is True
+    assert serializer.get_threshold_bytes() == 2**16
+    assert serializer.get_level() == 6
+
+
+def test_CompressingSerializer__does_not_compress_messages_below_threshold():
+    serializer = CompressingSerializer(threshold_bytes=1024)
+    message = "a" * 100
+    serialized = serializer.dumps(message)
+    assert len(serialized) == len(DEFAULT_PICKLE_SERIALIZER.dumps(message)) + 1
+    assert serializer.loads(serialized) == message
+    assert serializer.get_stats() == {
+        "num_compressed": 0,
+        "num_decompressed": 0,
+        "uncompressed_bytes": 0,
+        "compressed_bytes": 0,
+        "compression_ratio": 0,
+        "compression_cpu_seconds": 0,
+        "decompression_cpu_seconds": 0,
+    }
+
+
+def test_CompressingSerializer__compresses_messages_at_or_above_threshold_and_records_stats():
+    message = _create_compressible_message()
+    uncompressed_size = len(MARSHAL_SERIALIZER.dumps(message))
+    serializer = CompressingSerializer(MARSHAL_SERIALIZER, threshold_bytes=uncompressed_size, level=9)
+    assert serializer.get_name() == f"marshal + zlib (level 9, threshold {uncompressed_size} bytes)"
+    assert serializer.can_serialize_any_picklable_object() is False
+    serialized = serializer.dumps(message)
+    assert serializer.loads(serialized) == message
+    stats = serializer.get_stats()
+    assert stats["num_compressed"] == 1
+    assert stats["num_decompressed"] == 1
+    assert stats["uncompressed_bytes"] == uncompressed_size
+    assert stats["compressed_bytes"] == len(serialized) - 1
+    assert stats["compression_ratio"] == uncompressed_size / (len(serialized) - 1)
+    assert stats["compression_ratio"] > 10
+    assert stats["compression_cpu_seconds"] >= 0
+    assert stats["decompression_cpu_seconds"] >= 0
+
+
+def test_CompressingSerializer__compresses_batches_with_wrapped_serializer():
+    serializer = CompressingSerializer(StructSerializer("<qd"), threshold_bytes=100)
+    records = [(i, 0.5) for i in range(100)]
+    serialized = serializer.dumps_many(records)
+    assert len(serialized) < 1600
+    assert serializer.loads_many(serialized) == records
+
+
+def test_CompressingSerializer__resets_stats_when_pickled():
+    serializer = CompressingSerializer(MarshalSerializer(), threshold_bytes=1, level=1)
+    serializer.dumps("blah")
+    unpickled_serializer = pickle.loads(pickle.dumps(serializer))
+    assert unpickled_serializer.get_threshold_bytes() == 1
+    assert unpickled_serializer.get_level() == 1
+    assert unpickled_serializer.get_serializer().get_name() == "marshal"
+    assert unpickled_serializer.get_stats()["num_compressed"] == 0
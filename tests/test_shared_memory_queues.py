@@ -0,0 +1,591 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import pickle
+import queue
+import random
+import sys
+import threading
+
+import pytest
+from stdlib_utils import drain_queue_nowait
+from stdlib_utils import InfiniteProcess
+from stdlib_utils import invoke_process_run_and_check_errors
+from stdlib_utils import is_queue_eventually_not_empty
+from stdlib_utils import is_queue_eventually_of_size
+from stdlib_utils import MARSHAL_SERIALIZER
+from stdlib_utils import PayloadTooLargeForQueueError
+from stdlib_utils import SharedMemoryBroadcastChannel
+from stdlib_utils import SharedMemoryQueue
+from stdlib_utils import SharedMemoryRingBuffer
+from stdlib_utils import StructSerializer
+from stdlib_utils import SubscriberOverrunError
+from stdlib_utils import TooManySubscribersError
+
+from .fixtures_parallelism import InfiniteProcessThatRaisesError
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 8), reason="multiprocessing.shared_memory was added in Python 3.8"
+)
+
+
+@pytest.fixture(scope="function", name="ring_buffer")
+def fixture_ring_buffer():
+    rb = SharedMemoryRingBuffer(capacity_bytes=256)
+    yield rb
+    rb.unlink()
+
+
+@pytest.fixture(scope="function", name="shared_memory_queue")
+def fixture_shared_memory_queue():
+    q = SharedMemoryQueue(max_record_bytes=128, num_slots=4)
+    yield q
+    q.unlink()
+
+
+@pytest.fixture(scope="function", name="broadcast_channel")
+def fixture_broadcast_channel():
+    channel = SharedMemoryBroadcastChannel(max_record_bytes=128, num_slots=4, max_subscribers=2)
+    yield channel
+    channel.unlink()
+
+
+def _put_objects_into_queue(the_queue, producer_id, num_objects):
+    for i in range(num_objects):
+        the_queue.put((producer_id, i), timeout=5)
+    the_queue.close()
+
+
+def _put_frames_into_ring_buffer(ring_buffer, num_frames):
+    for i in range(num_frames):
+        ring_buffer.put(bytes([i % 256]) * 100, timeout=5)
+    ring_buffer.close()
+
+
+def test_SharedMemoryRingBuffer__rounds_capacity_up_to_multiple_of_8():
+    rb = SharedMemoryRingBuffer(capacity_bytes=61)
+    assert rb.get_capacity_bytes() == 64
+    rb.unlink()
+
+
+def test_SharedMemoryRingBuffer__is_initially_empty(ring_buffer):
+    assert ring_buffer.empty() is True
+    assert ring_buffer.qsize() == 0
+
+
+def test_SharedMemoryRingBuffer__get_nowait__raises_error_if_empty(ring_buffer):
+    with pytest.raises(queue.Empty):
+        ring_buffer.get_nowait()
+
+
+@pytest.mark.parametrize(
+    ",".join(("test_payload", "test_description")),
+    [
+        (b"frame", "bytes"),
+        (bytearray(b"frame"), "bytearray"),
+        (memoryview(b"frame"), "memoryview"),
+        (b"", "empty payload"),
+    ],
+)
+def test_SharedMemoryRingBuffer__get_nowait__returns_copy_of_payload(
+    ring_buffer, test_payload, test_description
+):
+    ring_buffer.put_nowait(test_payload)
+    assert ring_buffer.empty() is False
+    assert ring_buffer.qsize() == 1
+    actual = ring_buffer.get_nowait()
+    assert isinstance(actual, bytes)
+    assert actual == bytes(test_payload)
+    assert ring_buffer.empty() is True
+
+
+def test_SharedMemoryRingBuffer__put_nowait__accepts_non_byte_memoryviews(ring_buffer):
+    test_payload = memoryview(bytes(range(16))).cast("I")
+    ring_buffer.put_nowait(test_payload)
+    assert ring_buffer.get_nowait() == test_payload.tobytes()
+
+
+def test_SharedMemoryRingBuffer__put_nowait__raises_error_if_full(ring_buffer):
+    for _ in range(4):
+        ring_buffer.put_nowait(bytes(56))
+    with pytest.raises(queue.Full):
+        ring_buffer.put_nowait(b"1")
+    assert ring_buffer.qsize() == 4
+
+
+def test_SharedMemoryRingBuffer__put_nowait__raises_error_if_payload_can_never_fit(ring_buffer):
+    with pytest.raises(PayloadTooLargeForQueueError, match="capacity of 256 bytes"):
+        ring_buffer.put_nowait(bytes(249))
+
+
+def test_SharedMemoryRingBuffer__payloads_wrapping_around_the_end_of_the_buffer_are_kept_contiguous(
+    ring_buffer,
+):
+    ring_buffer.put_nowait(bytes(100))
+    ring_buffer.put_nowait(bytes(100))
+    ring_buffer.get_nowait()
+    # only 40 bytes remain before the end, so this payload must be written at the start
+    ring_buffer.put_nowait(b"x" * 80)
+    ring_buffer.get_nowait()
+    with ring_buffer.get_view_nowait() as view:
+        assert view.tobytes() == b"x" * 80
+    assert ring_buffer.empty() is True
+
+
+def test_SharedMemoryRingBuffer__maintains_order_and_content_of_many_payloads_of_varying_sizes(ring_buffer):
+    rng = random.Random(42)
+    expected = list()
+    actual = list()
+    for i in range(2000):
+        payload = bytes([i % 256]) * rng.randint(0, 120)
+        while True:
+            try:
+                ring_buffer.put_nowait(payload)
+                break
+            except queue.Full:
+                actual.append(ring_buffer.get_nowait())
+        expected.append(payload)
+    actual.extend(drain_queue_nowait(ring_buffer))
+    assert actual == expected
+
+
+def test_SharedMemoryRingBuffer__get_view_nowait__provides_read_only_view_until_context_exits(ring_buffer):
+    ring_buffer.put_nowait(b"frame")
+    with ring_buffer.get_view_nowait() as view:
+        assert view.readonly is True
+        assert view == b"frame"
+        assert ring_buffer.qsize() == 1
+    assert ring_buffer.qsize() == 0
+    with pytest.raises(ValueError):
+        view.tobytes()
+
+
+def test_SharedMemoryRingBuffer__get_view_nowait__raises_error_if_empty(ring_buffer):
+    with pytest.raises(queue.Empty):
+        with ring_buffer.get_view_nowait():
+            pass  # pragma: no cover
+
+
+def test_SharedMemoryRingBuffer__put__raises_error_if_still_full_after_timeout(ring_buffer):
+    ring_buffer.put_nowait(bytes(240))
+    with pytest.raises(queue.Full):
+        ring_buffer.put(bytes(100), timeout=0.02)
+
+
+def test_SharedMemoryRingBuffer__put__waits_for_space_to_become_available(ring_buffer):
+    ring_buffer.put_nowait(bytes(240))
+    threading.Timer(0.01, ring_buffer.get_nowait).start()
+    ring_buffer.put(b"frame", timeout=5)
+    assert ring_buffer.get_nowait() == b"frame"
+
+
+def test_SharedMemoryRingBuffer__put__does_not_wait_if_block_is_false(ring_buffer):
+    ring_buffer.put_nowait(bytes(240))
+    with pytest.raises(queue.Full):
+        ring_buffer.put(b"frame", block=False)
+
+
+def test_SharedMemoryRingBuffer__get__raises_error_if_still_empty_after_timeout(ring_buffer):
+    with pytest.raises(queue.Empty):
+        ring_buffer.get(timeout=0.02)
+
+
+def test_SharedMemoryRingBuffer__get__does_not_wait_if_block_is_false(ring_buffer):
+    with pytest.raises(queue.Empty):
+        ring_buffer.get(block=False)
+
+
+def test_SharedMemoryRingBuffer__get__waits_for_payload_to_arrive(ring_buffer):
+    threading.Timer(0.01, ring_buffer.put_nowait, args=(b"frame",)).start()
+    assert ring_buffer.get() == b"frame"
+
+
+def test_SharedMemoryRingBuffer__can_be_pickled_and_attached_to_by_name(ring_buffer):
+    attached_ring_buffer = pickle.loads(pickle.dumps(ring_buffer))
+    assert attached_ring_buffer.get_name() == ring_buffer.get_name()
+    assert attached_ring_buffer.get_capacity_bytes() == ring_buffer.get_capacity_bytes()
+    ring_buffer.put_nowait(b"frame")
+    assert attached_ring_buffer.get_nowait() == b"frame"
+    assert ring_buffer.empty() is True
+    attached_ring_buffer.close()
+
+
+def test_SharedMemoryRingBuffer__is_compatible_with_queue_utils_helpers(ring_buffer):
+    assert is_queue_eventually_not_empty(ring_buffer, timeout_seconds=0.01) is False
+    ring_buffer.put_nowait(b"frame")
+    assert is_queue_eventually_not_empty(ring_buffer) is True
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_SharedMemoryRingBuffer__transfers_payloads_from_another_process(ring_buffer):
+    num_frames = 50
+    p = multiprocessing.Process(target=_put_frames_into_ring_buffer, args=(ring_buffer, num_frames))
+    p.start()
+    actual = [ring_buffer.get(timeout=5) for _ in range(num_frames)]
+    p.join()
+    assert actual == [bytes([i]) * 100 for i in range(num_frames)]
+
+
+def test_SharedMemoryQueue__is_initially_empty(shared_memory_queue):
+    assert shared_memory_queue.empty() is True
+    assert shared_memory_queue.qsize() == 0
+    assert shared_memory_queue.get_max_record_bytes() == 128
+    assert shared_memory_queue.get_num_slots() == 4
+
+
+def test_SharedMemoryQueue__get_nowait__returns_objects_in_order(shared_memory_queue):
+    expected = [{"communication_type": "log", "message": "hey"}, None, (ValueError("bad"), "trace")]
+    for obj in expected:
+        shared_memory_queue.put_nowait(obj)
+    assert shared_memory_queue.empty() is False
+    assert shared_memory_queue.qsize() == 3
+    actual = [shared_memory_queue.get_nowait() for _ in range(3)]
+    assert actual[:2] == expected[:2]
+    assert isinstance(actual[2][0], ValueError)
+    assert actual[2][1] == "trace"
+    assert shared_memory_queue.empty() is True
+
+
+def test_SharedMemoryQueue__get_nowait__raises_error_if_empty(shared_memory_queue):
+    with pytest.raises(queue.Empty):
+        shared_memory_queue.get_nowait()
+
+
+def test_SharedMemoryQueue__put_nowait__raises_error_if_all_slots_are_full(shared_memory_queue):
+    for i in range(4):
+        shared_memory_queue.put_nowait(i)
+    with pytest.raises(queue.Full):
+        shared_memory_queue.put_nowait(4)
+    assert shared_memory_queue.qsize() == 4
+
+
+def test_SharedMemoryQueue__put__raises_error_if_pickled_object_is_too_large(shared_memory_queue):
+    with pytest.raises(PayloadTooLargeForQueueError, match="maximum record size of 128 bytes"):
+        shared_memory_queue.put(bytes(128))
+    assert shared_memory_queue.empty() is True
+
+
+def test_SharedMemoryQueue__put__raises_error_if_still_full_after_timeout(shared_memory_queue):
+    for i in range(4):
+        shared_memory_queue.put_nowait(i)
+    with pytest.raises(queue.Full):
+        shared_memory_queue.put(4, timeout=0.02)
+
+
+def test_SharedMemoryQueue__put__waits_for_a_slot_to_become_free(shared_memory_queue):
+    for i in range(4):
+        shared_memory_queue.put_nowait(i)
+    threading.Timer(0.01, shared_memory_queue.get_nowait).start()
+    shared_memory_queue.put(4, timeout=5)
+    assert drain_queue_nowait(shared_memory_queue) == [1, 2, 3, 4]
+
+
+def test_SharedMemoryQueue__get__raises_error_if_still_empty_after_timeout(shared_memory_queue):
+    with pytest.raises(queue.Empty):
+        shared_memory_queue.get(timeout=0.02)
+
+
+def test_SharedMemoryQueue__get__waits_for_an_object_to_be_put(shared_memory_queue):
+    threading.Timer(0.01, shared_memory_queue.put_nowait, args=("obj",)).start()
+    assert shared_memory_queue.get(timeout=5) == "obj"
+
+
+def test_SharedMemoryQueue__reuses_slots_many_times(shared_memory_queue):
+    actual = list()
+    for i in range(100):
+        shared_memory_queue.put_nowait(i)
+        if i % 3 == 2:
+            actual.extend(drain_queue_nowait(shared_memory_queue))
+    actual.extend(drain_queue_nowait(shared_memory_queue))
+    assert actual == list(range(100))
+
+
+def test_SharedMemoryQueue__setstate__attaches_to_the_same_shared_memory_and_synchronization_primitives(
+    shared_memory_queue,
+):
+    attached_queue = SharedMemoryQueue.__new__(SharedMemoryQueue)
+    attached_queue.__setstate__(shared_memory_queue.__getstate__())
+    assert attached_queue.get_num_slots() == 4
+    shared_memory_queue.put_nowait("obj")
+    assert attached_queue.get_nowait() == "obj"
+    assert shared_memory_queue.empty() is True
+    attached_queue.close()
+
+
+def test_SharedMemoryQueue__is_compatible_with_queue_utils_helpers(shared_memory_queue):
+    shared_memory_queue.put_nowait("obj")
+    assert is_queue_eventually_not_empty(shared_memory_queue) is True
+    assert is_queue_eventually_of_size(shared_memory_queue, 1) is True
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_SharedMemoryQueue__receives_objects_from_multiple_producer_processes():
+    num_objects_per_producer = 50
+    test_queue = SharedMemoryQueue(num_slots=8)
+    producers = [
+        multiprocessing.Process(
+            target=_put_objects_into_queue, args=(test_queue, i, num_objects_per_producer)
+        )
+        for i in range(3)
+    ]
+    for producer in producers:
+        producer.start()
+    actual = [test_queue.get(timeout=5) for _ in range(3 * num_objects_per_producer)]
+    for producer in producers:
+        producer.join()
+    test_queue.unlink()
+
+    for producer_id in range(3):
+        assert [i for p_id, i in actual if p_id == producer_id] == list(range(num_objects_per_producer))
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_SharedMemoryQueue__delivers_each_object_to_exactly_one_of_multiple_consumers(shared_memory_queue):
+    num_objects = 200
+    received = [list(), list()]
+
+    def consume(received_objects):
+        while True:
+            obj = shared_memory_queue.get(timeout=5)
+            if obj is None:
+                return
+            received_objects.append(obj)
+
+    consumers = [threading.Thread(target=consume, args=(received_objects,)) for received_objects in received]
+    for consumer in consumers:
+        consumer.start()
+    for i in range(num_objects):
+        shared_memory_queue.put(i, timeout=5)
+    for _ in consumers:
+        shared_memory_queue.put(None, timeout=5)
+    for consumer in consumers:
+        consumer.join()
+    assert sorted(received[0] + received[1]) == list(range(num_objects))
+
+
+@pytest.mark.parametrize(
+    "serializer,obj,test_description",
+    [
+        (MARSHAL_SERIALIZER, {"a": [1, 2.5], "b": None}, "marshal"),
+        (StructSerializer("<qd"), (1, 0.5), "struct"),
+    ],
+)
+def test_SharedMemoryQueue__uses_given_serializer(serializer, obj, test_description):
+    q = SharedMemoryQueue(max_record_bytes=64, num_slots=2, serializer=serializer)
+    assert q.get_serializer() is serializer
+    q.put(obj)
+    assert q.get() == obj
+    q.unlink()
+
+
+def test_SharedMemoryQueue__compresses_objects_that_would_otherwise_be_too_large():
+    q = SharedMemoryQueue(
+        max_record_bytes=128, num_slots=2, compression_threshold_bytes=64, compression_level=9
+    )
+    assert q.get_serializer().get_level() == 9
+    large_object = "a" * 10000
+    q.put(large_object)
+    assert q.get() == large_object
+    assert q.get_serializer().get_stats()["num_compressed"] == 1
+    q.unlink()
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_SharedMemoryQueue__serializer_is_used_in_another_process():
+    q = SharedMemoryQueue(max_record_bytes=64, num_slots=16, serializer=StructSerializer("<qd"))
+    p = multiprocessing.Process(target=_put_struct_records_into_queue, args=(q,))
+    p.start()
+    actual = [q.get(timeout=5) for _ in range(3)]
+    p.join()
+    q.unlink()
+    assert actual == [(0, 0.0), (1, 0.5), (2, 1.0)]
+
+
+def _put_struct_records_into_queue(the_queue):
+    for i in range(3):
+        the_queue.put((i, i / 2))
+    the_queue.close()
+
+
+def test_SharedMemoryQueue__can_be_used_as_fatal_error_reporter_of_InfiniteProcess(mocker):
+    mocker.patch("builtins.print", autospec=True)  # don't print the error message to stdout
+    error_queue = SharedMemoryQueue(max_record_bytes=2**16)
+    p = InfiniteProcessThatRaisesError(error_queue)
+    with pytest.raises(ValueError, match="test message"):
+        invoke_process_run_and_check_errors(p)
+    assert error_queue.empty() is True
+    error_queue.unlink()
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_SharedMemoryQueue__can_be_used_as_fatal_error_reporter_of_started_InfiniteProcess():
+    error_queue = SharedMemoryQueue(max_record_bytes=2**16)
+    p = InfiniteProcess(error_queue)
+    p.start()
+    hard_stop_results = p.hard_stop()
+    p.join()
+    assert hard_stop_results["fatal_error_reporter"] == []
+    error_queue.unlink()
+
+
+def test_SharedMemoryBroadcastChannel__subscriber_is_initially_empty(broadcast_channel):
+    subscriber = broadcast_channel.subscribe()
+    assert subscriber.get_channel() is broadcast_channel
+    assert subscriber.empty() is True
+    with pytest.raises(queue.Empty):
+        subscriber.get_nowait()
+    assert broadcast_channel.get_num_published() == 0
+
+
+def test_SharedMemoryBroadcastChannel__serializes_each_object_once_and_delivers_it_to_every_subscriber(
+    broadcast_channel, mocker
+):
+    spied_dumps = mocker.spy(broadcast_channel.get_serializer(), "dumps")
+    subscribers = [broadcast_channel.subscribe() for _ in range(2)]
+    broadcast_channel.put({"reading": 1})
+    broadcast_channel.put_nowait({"reading": 2})
+    assert spied_dumps.call_count == 2
+    for subscriber in subscribers:
+        assert subscriber.empty() is False
+        assert subscriber.get_nowait() == {"reading": 1}
+        assert subscriber.get_nowait() == {"reading": 2}
+        assert subscriber.empty() is True
+    assert broadcast_channel.get_num_published() == 2
+
+
+def test_SharedMemoryBroadcastChannel__subscriber_only_receives_objects_put_after_subscribing(
+    broadcast_channel,
+):
+    broadcast_channel.put("before")
+    subscriber = broadcast_channel.subscribe()
+    broadcast_channel.put("after")
+    assert drain_queue_nowait(subscriber) == ["after"]
+
+
+def test_SharedMemoryBroadcastChannel__subscribers_have_independent_cursors_and_report_their_lag(
+    broadcast_channel,
+):
+    fast_subscriber = broadcast_channel.subscribe()
+    slow_subscriber = broadcast_channel.subscribe()
+    for i in range(3):
+        broadcast_channel.put(i)
+    assert drain_queue_nowait(fast_subscriber) == [0, 1, 2]
+    assert slow_subscriber.get_nowait() == 0
+    assert fast_subscriber.get_lag() == 0
+    assert slow_subscriber.get_lag() == 2
+    assert broadcast_channel.get_subscriber_stats() == {
+        fast_subscriber.get_subscriber_index(): {"lag": 0, "num_missed": 0},
+        slow_subscriber.get_subscriber_index(): {"lag": 2, "num_missed": 0},
+    }
+
+
+def test_SharedMemoryBroadcastChannel__slow_subscriber_skips_overwritten_objects_and_counts_them(
+    broadcast_channel,
+):
+    subscriber = broadcast_channel.subscribe()
+    for i in range(7):
+        broadcast_channel.put(i)
+    assert subscriber.get_lag() == 7
+    assert subscriber.empty() is False
+    assert subscriber.get_nowait() == 3
+    assert subscriber.get_num_missed() == 3
+    assert drain_queue_nowait(subscriber) == [4, 5, 6]
+    assert broadcast_channel.get_subscriber_stats()[subscriber.get_subscriber_index()] == {
+        "lag": 0,
+        "num_missed": 3,
+    }
+
+
+def test_SharedMemoryBroadcastChannel__subscriber_can_raise_error_when_it_has_missed_objects(
+    broadcast_channel,
+):
+    subscriber = broadcast_channel.subscribe(raise_error_on_overrun=True)
+    for i in range(6):
+        broadcast_channel.put(i)
+    with pytest.raises(SubscriberOverrunError, match="missed 2 objects"):
+        subscriber.get_nowait()
+    assert subscriber.get_num_missed() == 2
+    assert subscriber.get_nowait() == 2
+
+
+def test_SharedMemoryBroadcastChannel__subscribe__raises_error_if_there_are_too_many_subscribers(
+    broadcast_channel,
+):
+    broadcast_channel.subscribe()
+    subscriber = broadcast_channel.subscribe()
+    with pytest.raises(TooManySubscribersError, match="maximum of 2 subscribers"):
+        broadcast_channel.subscribe()
+    subscriber.unsubscribe()
+    assert list(broadcast_channel.get_subscriber_stats().keys()) == [0]
+    assert broadcast_channel.subscribe().get_subscriber_index() == 1
+
+
+def test_SharedMemoryBroadcastChannel__put__raises_error_if_serialized_object_is_too_large(broadcast_channel):
+    assert broadcast_channel.get_max_record_bytes() == 128
+    with pytest.raises(PayloadTooLargeForQueueError, match="maximum record size of 128 bytes"):
+        broadcast_channel.put(b"a" * 200)
+    assert broadcast_channel.get_num_published() == 0
+
+
+def test_SharedMemoryBroadcastChannel__read_record__returns_none_if_slot_is_overwritten_while_being_copied(
+    broadcast_channel, mocker
+):
+    subscriber = broadcast_channel.subscribe()
+    broadcast_channel.put("obj")
+    mocker.patch.object(broadcast_channel, "_is_published", autospec=True, side_effect=[True, False])
+    assert broadcast_channel._read_record(0) is None
+    mocker.stopall()
+    assert subscriber.get_nowait() == "obj"
+
+
+def test_BroadcastSubscriber_get__raises_error_if_still_empty_after_timeout(broadcast_channel):
+    subscriber = broadcast_channel.subscribe()
+    with pytest.raises(queue.Empty):
+        subscriber.get(timeout=0.01)
+    with pytest.raises(queue.Empty):
+        subscriber.get(block=False)
+
+
+@pytest.mark.timeout(10)  # set a timeout because the test can hang as a failure mode
+def test_BroadcastSubscriber_get__waits_for_an_object_to_be_put(broadcast_channel):
+    subscriber = broadcast_channel.subscribe()
+    threading.Timer(0.05, broadcast_channel.put, args=("obj",)).start()
+    assert subscriber.get(timeout=5) == "obj"
+
+
+def test_SharedMemoryBroadcastChannel__setstate__attaches_to_the_same_shared_memory(broadcast_channel):
+    attached_channel = SharedMemoryBroadcastChannel.__new__(SharedMemoryBroadcastChannel)
+    attached_channel.__setstate__(broadcast_channel.__getstate__())
+    assert attached_channel.get_num_slots() == 4
+    assert attached_channel.get_max_subscribers() == 2
+    subscriber = attached_channel.subscribe()
+    broadcast_channel.put("obj")
+    assert subscriber.get_nowait() == "obj"
+    subscriber.close()
+
+
+def _get_objects_from_subscriber(subscriber, num_objects, output_queue):
+    output_queue.put([subscriber.get(timeout=5) for _ in range(num_objects)])
+    subscriber.close()
+
+
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_SharedMemoryBroadcastChannel__delivers_every_object_to_subscribers_in_other_processes():
+    channel = SharedMemoryBroadcastChannel(num_slots=1024, serializer=MARSHAL_SERIALIZER)
+    output_queue = multiprocessing.Queue()
+    consumers = [
+        multiprocessing.Process(
+            target=_get_objects_from_subscriber, args=(channel.subscribe(), 500, output_queue)
+        )
+        for _ in range(2)
+    ]
+    for consumer in consumers:
+        consumer.start()
+    for i in range(500):
+        channel.put({"index": i})
+    expected = [{"index": i} for i in range(500)]
+    assert output_queue.get(timeout=10) == expected
+    assert output_queue.get(timeout=10) == expected
+    for consumer in consumers:
+        consumer.join()
+    assert all(stats["lag"] == 0 for stats in channel.get_subscriber_stats().values())
+    channel.unlink()
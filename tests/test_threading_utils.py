@@ -9,7 +9,9 @@ from stdlib_utils import BadQueueTypeError
 from stdlib_utils import get_formatted_stack_trace
 from stdlib_utils import InfiniteLoopingParallelismMixIn
 from stdlib_utils import InfiniteThread
+from stdlib_utils import NANOSECONDS_PER_CENTIMILLISECOND
 from stdlib_utils import TestingQueue
+from stdlib_utils import VirtualClock
 
 from .fixtures_parallelism import InfiniteThreadThatCannotBeSoftStopped
 from .fixtures_parallelism import InfiniteThreadThatCountsIterations
@@ -43,6 +45,8 @@ def test_InfiniteThread__init__calls_InfiniteLoopingParallelismMixIn_super(mocke
         error_queue,
         *init_test_args_InfiniteLoopingParallelismMixIn,
         minimum_iteration_duration_seconds=0.01,
+        clock_ns=None,
+        sleeper=None,
     )
 
 
@@ -201,3 +205,21 @@ def test_InfiniteThread_start__raises_error_if_error_queue_is_incorrect_queue_ty
         match=f"_fatal_error_reporter must be a queue.Queue if starting this thread, not {type(error_queue)}",
     ):
         t.start()
+
+
+@pytest.mark.timeout(15)  # set a timeout because the test can hang as a failure mode
+def test_InfiniteThread__runs_at_cpu_speed_when_given_a_virtual_clock():
+    error_queue = queue.Queue()
+    clock = VirtualClock()
+    t = InfiniteThreadThatCountsIterations(
+        error_queue, minimum_iteration_duration_seconds=1, clock_ns=clock.perf_counter_ns, sleeper=clock.sleep
+    )
+    t.start()
+    while t.get_num_iterations() < 1000:
+        time.sleep(0.01)
+    t.stop()
+    t.join()
+    assert error_queue.empty() is True
+    # each iteration would have taken a second in real time
+    assert clock.perf_counter_ns() >= 999 * 10**9
+    assert t.get_cms_since_init() == clock.perf_counter_ns() // NANOSECONDS_PER_CENTIMILLISECOND